@@ -1,19 +1,35 @@
 from flask import Flask, request, jsonify, render_template, redirect, url_for
 import numpy as np
 import os
+import re
+import shutil
+import calendar
+import itertools
+import bisect
 import json
 import time
 import uuid
+import base64
 import hmac
 import hashlib
-from datetime import datetime
-from functools import wraps
+from datetime import datetime, timedelta, timezone
+from functools import wraps, lru_cache
 import sqlite3
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import threading
 import logging
+import csv
+import io
+import zlib
+import atexit
+import click
+from collections import OrderedDict, deque
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from contextlib import contextmanager
+import queue
 from flask import current_app
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField
@@ -25,7 +41,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from wtforms.validators import DataRequired, Email, Length
 from wtforms import StringField, PasswordField
 from flask_wtf.csrf import CSRFProtect
-from flask import session
+from flask import session, g, Response
 
 # Configure logging
 logging.basicConfig(
@@ -36,6 +52,7 @@ logging.basicConfig(
         logging.StreamHandler()
     ]
 )
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your_random_secret_key_here'
@@ -57,12 +74,210 @@ EMAIL_SUBJECT_PREFIX = os.environ.get('EMAIL_SUBJECT_PREFIX', '[Fiber Optic Aler
 
 # Notification settings
 NOTIFICATION_COOLDOWN = int(os.environ.get('NOTIFICATION_COOLDOWN', '3600'))  # seconds
-last_notification_time = {}  # device_id -> timestamp
+# Per fault type cooldown overrides in seconds, e.g. '{"Fiber Break": 600}'
+NOTIFICATION_COOLDOWNS = json.loads(os.environ.get('NOTIFICATION_COOLDOWNS', '{}'))
+COOLDOWN_STORE = os.environ.get('COOLDOWN_STORE', 'sqlite').lower()  # 'sqlite' (shared by workers) or 'memory'
+# Alert once N of the last M readings show a fault: fault type (or "default") -> [N, M]; devices can override.
+# The default alerts on every faulty reading, as before debouncing existed. Votes are counted per worker process.
+ALERT_DEBOUNCE = json.loads(os.environ.get('ALERT_DEBOUNCE', '{"default": [1, 1]}'))
+ALERT_DEBOUNCE_MAX_WINDOW = 32  # largest M, the per-device ring buffer length
+ALERT_STATE_MAX_DEVICES = int(os.environ.get('ALERT_STATE_MAX_DEVICES', '50000'))  # devices tracked by the debouncer
+NOTIFICATION_QUEUE_SIZE = int(os.environ.get('NOTIFICATION_QUEUE_SIZE', '1000'))  # pending alerts
+NOTIFICATION_COALESCE_WINDOW = float(os.environ.get('NOTIFICATION_COALESCE_WINDOW', '5'))  # seconds
+NOTIFICATION_MAX_DIGEST = int(os.environ.get('NOTIFICATION_MAX_DIGEST', '50'))  # alerts per digest email
+SMTP_TIMEOUT = float(os.environ.get('SMTP_TIMEOUT', '30'))  # seconds
+SMTP_IDLE_TIMEOUT = float(os.environ.get('SMTP_IDLE_TIMEOUT', '60'))  # close idle SMTP sessions after
+
+# Device registry settings
+DEVICE_CACHE_TTL = float(os.environ.get('DEVICE_CACHE_TTL', '60'))  # seconds a cached device record stays valid
+
+# Live dashboard stream settings
+STREAM_QUEUE_SIZE = int(os.environ.get('STREAM_QUEUE_SIZE', '256'))  # events buffered per subscriber
+STREAM_HEARTBEAT = float(os.environ.get('STREAM_HEARTBEAT', '15'))  # seconds between keep-alive comments
+
+# Ingestion settings
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '1000'))  # readings per batch request
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+# Write-behind ingestion settings
+WRITE_BEHIND = os.environ.get('WRITE_BEHIND', 'false').lower() == 'true'  # group-commit readings from a writer thread
+WRITE_BEHIND_QUEUE_SIZE = int(os.environ.get('WRITE_BEHIND_QUEUE_SIZE', '20000'))  # readings queued before requests get 503
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', '2000'))  # readings per group commit
+WRITE_BEHIND_FLUSH_MS = float(os.environ.get('WRITE_BEHIND_FLUSH_MS', '10'))  # longest a reading waits for its group to fill
+WRITE_BEHIND_SYNCHRONOUS = os.environ.get('WRITE_BEHIND_SYNCHRONOUS', 'FULL').upper()  # writer connection; one fsync per group
+WRITE_BEHIND_RETRY_AFTER = int(os.environ.get('WRITE_BEHIND_RETRY_AFTER', '1'))  # seconds, sent with 503 responses
+
+# Pagination settings
+DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', '100'))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', '1000'))
+
+# Export settings
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', '2000'))  # rows fetched per round trip
+EXPORT_COLUMNS = ('id', 'device_id', 'timestamp', 'signal_power', 'attenuation', 'distance',
+                  'fault_type', 'confidence', 'notification_sent')
+
+# Chart series settings
+SERIES_BUCKETS = {  # bucket -> (strftime format, seconds, rollup table covering retired raw rows)
+    'minute': ('%Y-%m-%d %H:%M:00', 60, None),
+    'hour': ('%Y-%m-%d %H:00:00', 3600, 'measurement_rollups_hourly'),
+    'day': ('%Y-%m-%d 00:00:00', 86400, 'measurement_rollups_daily'),
+}
+SERIES_METRICS = ('signal_power', 'attenuation')
+MAX_SERIES_POINTS = int(os.environ.get('MAX_SERIES_POINTS', '2000'))  # points per returned series
+
+# Database connection settings
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))  # idle connections kept open
+DB_BUSY_TIMEOUT = float(os.environ.get('DB_BUSY_TIMEOUT', '5'))  # seconds to wait on a locked database
+DB_SYNCHRONOUS = os.environ.get('DB_SYNCHRONOUS', 'NORMAL').upper()  # NORMAL is durable enough under WAL
+DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', '20000'))  # page cache per connection
+DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', str(256 * 1024 * 1024)))  # bytes
+QUERY_PLAN_CHECK = os.environ.get('QUERY_PLAN_CHECK', 'true').lower() == 'true'  # log full scans at startup
+
+# Retention settings
+RETENTION_DAYS = int(os.environ.get('RETENTION_DAYS', '0'))  # roll up raw measurements older than this; 0 keeps all
+RETENTION_INTERVAL = int(os.environ.get('RETENTION_INTERVAL', '3600'))  # seconds between background runs
+RETENTION_BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE', '5000'))  # raw rows removed per transaction
+RETENTION_BATCH_PAUSE = float(os.environ.get('RETENTION_BATCH_PAUSE', '0.05'))  # seconds to yield to writers between batches
+ROLLUP_TABLES = {  # rollup table -> bucket format
+    'measurement_rollups_hourly': '%Y-%m-%d %H:00:00',
+    'measurement_rollups_daily': '%Y-%m-%d 00:00:00',
+}
+
+# Partition settings
+PARTITION_DIR = os.environ.get('PARTITION_DIR', '')  # directory of sealed monthly files; empty disables partitioning
+PARTITION_HOT_MONTHS = int(os.environ.get('PARTITION_HOT_MONTHS', '2'))  # months (including the current one) kept in the main table
+
+# Columnar archive settings
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archive')  # one directory of .npy columns per archived month
+ARCHIVE_SCORE_CHUNK = int(os.environ.get('ARCHIVE_SCORE_CHUNK', '1000000'))  # rows classified per step when scoring
+
+# Re-scoring settings
+RESCORE_CHUNK_SIZE = int(os.environ.get('RESCORE_CHUNK_SIZE', '20000'))  # measurements classified per transaction
+
+# Anomaly detection settings
+ANOMALY_DETECTION = os.environ.get('ANOMALY_DETECTION', 'true').lower() == 'true'
+ANOMALY_MAX_DEVICES = int(os.environ.get('ANOMALY_MAX_DEVICES', '50000'))  # device states kept; least recently seen are evicted
+ANOMALY_ALPHA = float(os.environ.get('ANOMALY_ALPHA', '0.05'))  # EWMA weight of each new reading
+ANOMALY_WARMUP = int(os.environ.get('ANOMALY_WARMUP', '20'))  # readings before a device's baseline is trusted
+ANOMALY_CUSUM_SLACK = float(os.environ.get('ANOMALY_CUSUM_SLACK', '0.5'))  # standard deviations of tolerated shift
+ANOMALY_CUSUM_LIMIT = float(os.environ.get('ANOMALY_CUSUM_LIMIT', '5'))  # cumulative deviations that signal drift
+ANOMALY_SPIKE_Z = float(os.environ.get('ANOMALY_SPIKE_Z', '4'))  # z-score of an outlying reading
+ANOMALY_SPIKE_CONFIRM = int(os.environ.get('ANOMALY_SPIKE_CONFIRM', '2'))  # consecutive outliers before a fault alert goes out
+ANOMALY_REBUILD_READINGS = int(os.environ.get('ANOMALY_REBUILD_READINGS', '200'))  # recent readings replayed per device at startup
+
+# Route correlation settings
+ROUTE_CORRELATION_WINDOW = float(os.environ.get('ROUTE_CORRELATION_WINDOW', '300'))  # seconds fault reports stay correlatable
+ROUTE_CLUSTER_RADIUS = float(os.environ.get('ROUTE_CLUSTER_RADIUS', '250'))  # metres between estimates of the same fault
+ROUTE_MIN_DEVICES = int(os.environ.get('ROUTE_MIN_DEVICES', '2'))  # devices that must agree before an incident is raised
+ROUTE_CACHE_TTL = float(os.environ.get('ROUTE_CACHE_TTL', '60'))  # seconds before route membership is reloaded
+
+# Incident settings
+INCIDENT_RESOLVE_READINGS = int(os.environ.get('INCIDENT_RESOLVE_READINGS', '3'))  # consecutive readings without the fault that resolve it
+INCIDENT_RESOLVE_AFTER = float(os.environ.get('INCIDENT_RESOLVE_AFTER', '3600'))  # seconds without the fault before it times out
+INCIDENT_SWEEP_INTERVAL = float(os.environ.get('INCIDENT_SWEEP_INTERVAL', '60'))  # seconds between timeout checks
+
+# Classifier settings
+# Noise modes: 'random' (global np.random state), 'seeded' (per-app Generator, reproducible run to run),
+# 'hashed' (derived from the input triple, so classification is a pure function) or 'off'
+CLASSIFIER_NOISE_MODES = ('random', 'seeded', 'hashed', 'off')
+CLASSIFIER_NOISE = os.environ.get('CLASSIFIER_NOISE', 'random').lower()
+CLASSIFIER_SEED = int(os.environ.get('CLASSIFIER_SEED', '0'))
+if CLASSIFIER_NOISE not in CLASSIFIER_NOISE_MODES:
+    logger.warning(f"Unknown CLASSIFIER_NOISE '{CLASSIFIER_NOISE}', falling back to 'random'")
+    CLASSIFIER_NOISE = 'random'
+classifier_rng = np.random.default_rng(CLASSIFIER_SEED)
+classifier_rng_lock = threading.Lock()  # np.random.Generator is not thread-safe
+# Classification cache, used only while the classifier is deterministic
+CLASSIFIER_CACHE_SIZE = int(os.environ.get('CLASSIFIER_CACHE_SIZE', '10000'))  # entries, 0 disables
+CLASSIFIER_CACHE_QUANTUM = float(os.environ.get('CLASSIFIER_CACHE_QUANTUM', '0.01'))  # reporting resolution; finer readings bypass the cache
+CLASSIFIER_BACKEND = os.environ.get('CLASSIFIER_BACKEND', 'rules').lower()  # 'rules' or 'mlp'
+MODEL_DIR = os.environ.get('MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+FEATURE_SCALER_PATH = os.path.join(MODEL_DIR, 'feature_scaler.npz')
+FEATURE_SCALER_PICKLE = os.path.join(MODEL_DIR, 'feature_scaler.pkl')  # source for `flask convert-scaler`
+MLP_WEIGHTS_PATH = os.path.join(MODEL_DIR, 'fault_mlp.npz')
+MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', '10'))  # seconds between artifact checks; 0 disables
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')  # X-Admin-Token for admin endpoints; empty disables them
+
+# Database connections
+def get_db_connection():
+    """Connect to the SQLite database and return the connection."""
+    # Connections are long-lived and handed between threads by the pool
+    conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT, check_same_thread=False)
+    conn.row_factory = sqlite3.Row  # This allows us to access columns by name (e.g., user['email'])
+    # Lets the retention job hand freed pages back to the filesystem; only takes effect
+    # on new databases (before WAL writes the header) or after a full VACUUM
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    # WAL lets dashboard readers run alongside the ingestion writer
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(f'PRAGMA synchronous={DB_SYNCHRONOUS}')
+    conn.execute(f'PRAGMA cache_size=-{DB_CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size={DB_MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+class ConnectionPool:
+    """Pool of long-lived SQLite connections shared by request and background threads"""
+
+    def __init__(self, factory, size):
+        self.factory = factory
+        self.size = size
+        self._idle = queue.LifoQueue()
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self.factory()
+
+    def release(self, conn):
+        try:
+            # Never hand out a connection with a half-finished transaction
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logger.warning(f"Discarding broken database connection: {e}")
+            conn.close()
+            return
+        if self._idle.qsize() < self.size:
+            self._idle.put_nowait(conn)
+        else:
+            conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+db_pool = ConnectionPool(get_db_connection, DB_POOL_SIZE)
+
+def get_db():
+    """Return the pooled connection bound to the current app context"""
+    if 'db' not in g:
+        g.db = db_pool.acquire()
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exception):
+    """Return the app context's connection to the pool"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        db_pool.release(conn)
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection outside of a request, e.g. from background threads"""
+    conn = db_pool.acquire()
+    try:
+        yield conn
+    finally:
+        db_pool.release(conn)
 
 # Database setup
 def init_db():
     """Initialize the SQLite database"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS devices (
@@ -116,242 +331,3080 @@ def init_db():
         ''')
     
     conn.commit()
+
+    migrate_db(conn)
+    if QUERY_PLAN_CHECK:
+        check_query_plans(conn)
     conn.close()
     # logger.info("Database initialized")
 
+# Materialized dashboard statistics, maintained by triggers as rows are written
+STATS_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS stats_totals (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS stats_fault_totals (
+        fault_type TEXT PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS stats_hourly (
+        hour TEXT NOT NULL,
+        device_id TEXT NOT NULL,
+        fault_type TEXT NOT NULL,
+        measurement_count INTEGER NOT NULL DEFAULT 0,
+        notification_count INTEGER NOT NULL DEFAULT 0,
+        sum_signal_power REAL NOT NULL DEFAULT 0,
+        sum_attenuation REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (hour, device_id, fault_type)
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_stats_hourly_device_hour ON stats_hourly (device_id, hour)',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_measurement_insert AFTER INSERT ON measurements
+    BEGIN
+        UPDATE stats_totals SET value = value + 1 WHERE name = 'measurements';
+        INSERT INTO stats_fault_totals (fault_type, count) VALUES (NEW.fault_type, 1)
+            ON CONFLICT (fault_type) DO UPDATE SET count = count + 1;
+        INSERT INTO stats_hourly (hour, device_id, fault_type, measurement_count, sum_signal_power, sum_attenuation)
+            VALUES (strftime('%Y-%m-%d %H:00:00', NEW.timestamp), NEW.device_id, NEW.fault_type, 1,
+                    NEW.signal_power, NEW.attenuation)
+            ON CONFLICT (hour, device_id, fault_type) DO UPDATE SET
+                measurement_count = measurement_count + 1,
+                sum_signal_power = sum_signal_power + excluded.sum_signal_power,
+                sum_attenuation = sum_attenuation + excluded.sum_attenuation;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_notification_insert AFTER INSERT ON notifications
+    BEGIN
+        UPDATE stats_totals SET value = value + 1 WHERE name = 'notifications';
+        INSERT INTO stats_hourly (hour, device_id, fault_type, notification_count)
+            VALUES (strftime('%Y-%m-%d %H:00:00', NEW.timestamp), NEW.device_id, NEW.fault_type, 1)
+            ON CONFLICT (hour, device_id, fault_type) DO UPDATE SET
+                notification_count = notification_count + 1;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_device_insert AFTER INSERT ON devices
+    BEGIN
+        UPDATE stats_totals SET value = value + 1 WHERE name = 'devices';
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_stats_device_delete AFTER DELETE ON devices
+    BEGIN
+        UPDATE stats_totals SET value = value - 1 WHERE name = 'devices';
+    END
+    ''',
+]
+
+def rebuild_stats(conn):
+    """Recompute the materialized statistics from the base tables"""
+    # Measurements removed by the retention job only survive in the hourly rollups
+    hours = '''
+    SELECT strftime('%Y-%m-%d %H:00:00', timestamp) AS hour, device_id, fault_type,
+           COUNT(*) AS n, SUM(signal_power) AS sp, SUM(attenuation) AS att
+    FROM measurements
+    GROUP BY 1, 2, 3
+    '''
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'measurement_rollups_hourly'").fetchone():
+        hours += '''
+    UNION ALL
+    SELECT bucket, device_id, fault_type, measurement_count, sum_signal_power, sum_attenuation
+    FROM measurement_rollups_hourly
+    '''
+    conn.execute('DELETE FROM stats_totals')
+    conn.execute(f'''
+    WITH hours AS ({hours})
+    INSERT INTO stats_totals (name, value)
+    SELECT 'devices', COUNT(*) FROM devices
+    UNION ALL SELECT 'measurements', COALESCE(SUM(n), 0) FROM hours
+    UNION ALL SELECT 'notifications', COUNT(*) FROM notifications
+    ''')
+    conn.execute('DELETE FROM stats_fault_totals')
+    conn.execute(f'''
+    WITH hours AS ({hours})
+    INSERT INTO stats_fault_totals (fault_type, count)
+    SELECT fault_type, SUM(n) FROM hours GROUP BY fault_type
+    ''')
+    conn.execute('DELETE FROM stats_hourly')
+    conn.execute(f'''
+    WITH hours AS ({hours})
+    INSERT INTO stats_hourly (hour, device_id, fault_type, measurement_count, sum_signal_power, sum_attenuation)
+    SELECT hour, device_id, fault_type, SUM(n), SUM(sp), SUM(att)
+    FROM hours
+    GROUP BY 1, 2, 3
+    ''')
+    conn.execute('''
+    INSERT INTO stats_hourly (hour, device_id, fault_type, notification_count)
+    SELECT strftime('%Y-%m-%d %H:00:00', timestamp), device_id, fault_type, COUNT(*)
+    FROM notifications
+    WHERE true
+    GROUP BY 1, 2, 3
+    ON CONFLICT (hour, device_id, fault_type) DO UPDATE SET notification_count = excluded.notification_count
+    ''')
+
+# Schema migrations
+# Each entry upgrades the schema by one version (tracked in PRAGMA user_version)
+# and is a list of SQL statements or callables taking the connection.
+SCHEMA_MIGRATIONS = [
+    # 1: indexes for the hot access paths
+    [
+        'CREATE INDEX IF NOT EXISTS idx_measurements_device_timestamp ON measurements (device_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_measurements_timestamp ON measurements (timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_measurements_fault_type ON measurements (fault_type)',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_devices_api_key ON devices (api_key)',
+        'CREATE INDEX IF NOT EXISTS idx_notifications_timestamp ON notifications (timestamp)',
+    ],
+    # 2: materialized dashboard statistics, backfilled from existing rows
+    STATS_SCHEMA + [rebuild_stats],
+    # 3: alert cooldowns shared by all worker processes
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS alert_cooldowns (
+            device_id TEXT NOT NULL,
+            fault_type TEXT NOT NULL,
+            last_alert_sent REAL NOT NULL,
+            PRIMARY KEY (device_id, fault_type)
+        ) WITHOUT ROWID
+        ''',
+    ],
+    # 4: hourly and daily rollups of raw measurements removed by the retention job
+    [
+        f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            device_id TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            fault_type TEXT NOT NULL,
+            measurement_count INTEGER NOT NULL,
+            min_signal_power REAL NOT NULL,
+            max_signal_power REAL NOT NULL,
+            sum_signal_power REAL NOT NULL,
+            min_attenuation REAL NOT NULL,
+            max_attenuation REAL NOT NULL,
+            sum_attenuation REAL NOT NULL,
+            PRIMARY KEY (device_id, bucket, fault_type)
+        ) WITHOUT ROWID
+        '''
+        for table in ROLLUP_TABLES
+    ],
+    # 5: re-scoring results, checkpoints, and stats kept in step with re-classified rows
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS measurement_scores (
+            version TEXT NOT NULL,
+            measurement_id INTEGER NOT NULL,
+            fault_type TEXT NOT NULL,
+            confidence REAL NOT NULL,
+            PRIMARY KEY (version, measurement_id)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS rescore_checkpoints (
+            job TEXT PRIMARY KEY,
+            version TEXT NOT NULL,
+            last_id INTEGER NOT NULL,
+            rows INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_measurement_rescore AFTER UPDATE OF fault_type ON measurements
+        WHEN OLD.fault_type IS NOT NEW.fault_type
+        BEGIN
+            UPDATE stats_fault_totals SET count = count - 1 WHERE fault_type = OLD.fault_type;
+            DELETE FROM stats_fault_totals WHERE fault_type = OLD.fault_type AND count = 0;
+            INSERT INTO stats_fault_totals (fault_type, count) VALUES (NEW.fault_type, 1)
+                ON CONFLICT (fault_type) DO UPDATE SET count = count + 1;
+            UPDATE stats_hourly SET
+                measurement_count = measurement_count - 1,
+                sum_signal_power = sum_signal_power - OLD.signal_power,
+                sum_attenuation = sum_attenuation - OLD.attenuation
+            WHERE hour = strftime('%Y-%m-%d %H:00:00', OLD.timestamp)
+              AND device_id = OLD.device_id AND fault_type = OLD.fault_type;
+            DELETE FROM stats_hourly
+            WHERE hour = strftime('%Y-%m-%d %H:00:00', OLD.timestamp)
+              AND device_id = OLD.device_id AND fault_type = OLD.fault_type
+              AND measurement_count = 0 AND notification_count = 0;
+            INSERT INTO stats_hourly (hour, device_id, fault_type, measurement_count, sum_signal_power, sum_attenuation)
+                VALUES (strftime('%Y-%m-%d %H:00:00', NEW.timestamp), NEW.device_id, NEW.fault_type, 1,
+                        NEW.signal_power, NEW.attenuation)
+                ON CONFLICT (hour, device_id, fault_type) DO UPDATE SET
+                    measurement_count = measurement_count + 1,
+                    sum_signal_power = sum_signal_power + excluded.sum_signal_power,
+                    sum_attenuation = sum_attenuation + excluded.sum_attenuation;
+        END
+        ''',
+    ],
+    # 6: per-device N-of-M alert debouncing (JSON, NULL uses ALERT_DEBOUNCE)
+    [
+        'ALTER TABLE devices ADD COLUMN alert_debounce TEXT',
+    ],
+    # 7: fiber routes, device positions along them, and faults located by correlating several devices
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS routes (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            length_m REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS route_devices (
+            device_id TEXT PRIMARY KEY,
+            route_id TEXT NOT NULL,
+            position_m REAL NOT NULL,
+            direction INTEGER NOT NULL DEFAULT 1 CHECK (direction IN (-1, 1)),
+            FOREIGN KEY (device_id) REFERENCES devices (id),
+            FOREIGN KEY (route_id) REFERENCES routes (id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_route_devices_route ON route_devices (route_id, position_m)',
+        '''
+        CREATE TABLE IF NOT EXISTS route_incidents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            route_id TEXT NOT NULL,
+            fault_type TEXT NOT NULL,
+            location_m REAL NOT NULL,
+            spread_m REAL NOT NULL,
+            segment_start_device TEXT,
+            segment_end_device TEXT,
+            devices TEXT NOT NULL,
+            measurement_id INTEGER NOT NULL,
+            opened_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (route_id) REFERENCES routes (id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_route_incidents_route ON route_incidents (route_id, opened_at)',
+    ],
+    # 8: incidents grouping consecutive faulty readings per device and fault type
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS incidents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            device_id TEXT NOT NULL,
+            fault_type TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'open',
+            opened_at TIMESTAMP NOT NULL,
+            updated_at TIMESTAMP NOT NULL,
+            resolved_at TIMESTAMP,
+            resolution TEXT,
+            first_measurement_id INTEGER NOT NULL,
+            last_measurement_id INTEGER NOT NULL,
+            measurement_count INTEGER NOT NULL DEFAULT 1,
+            max_confidence REAL NOT NULL,
+            min_signal_power REAL NOT NULL,
+            max_attenuation REAL NOT NULL,
+            FOREIGN KEY (device_id) REFERENCES devices (id)
+        )
+        ''',
+        # At most one open incident per device and fault type, even across worker processes
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_incidents_open ON incidents (device_id, fault_type) WHERE status = 'open'",
+        'CREATE INDEX IF NOT EXISTS idx_incidents_status_opened ON incidents (status, opened_at)',
+        'CREATE INDEX IF NOT EXISTS idx_incidents_device_opened ON incidents (device_id, opened_at)',
+        'CREATE INDEX IF NOT EXISTS idx_incidents_opened ON incidents (opened_at)',
+    ],
+]
+
+def migrate_db(conn):
+    """Apply pending schema migrations, one transaction per version"""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for target, steps in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"Database migration to schema version {target} failed")
+            raise
+        logger.info(f"Database migrated to schema version {target}")
+    # Refresh planner statistics for new indexes
+    conn.execute('PRAGMA optimize')
+
+# Queries on the request path whose plans are checked at startup
+HOT_QUERIES = {
+    'require_api_key': ('SELECT id, name FROM devices WHERE api_key = ?', ('',)),
+    'get_measurements': ('''
+        SELECT * FROM measurements
+        WHERE device_id = ?
+        ORDER BY timestamp DESC, id DESC
+        LIMIT ? OFFSET ?
+        ''', ('', 100, 0)),
+    'get_measurements.cursor': ('''
+        SELECT * FROM measurements
+        WHERE device_id = ? AND (timestamp, id) < (?, ?)
+        ORDER BY timestamp DESC, id DESC
+        LIMIT ? OFFSET ?
+        ''', ('', '', 0, 101, 0)),
+    'get_recent_data': ('''
+        SELECT m.*, d.name as device_name
+        FROM measurements m
+        JOIN devices d ON m.device_id = d.id
+        ORDER BY m.timestamp DESC, m.id DESC
+        LIMIT ?
+        ''', (100,)),
+    'get_recent_data.cursor': ('''
+        SELECT m.*, d.name as device_name
+        FROM measurements m
+        JOIN devices d ON m.device_id = d.id
+        WHERE (m.timestamp, m.id) < (?, ?)
+        ORDER BY m.timestamp DESC, m.id DESC
+        LIMIT ? OFFSET ?
+        ''', ('', 0, 101, 0)),
+    'export_data': ('''
+        SELECT * FROM measurements
+        WHERE device_id = ? AND timestamp >= ? AND timestamp < ?
+        ORDER BY timestamp, id
+        ''', ('', '', '')),
+    'get_stats.hourly': ('''
+        SELECT * FROM stats_hourly
+        WHERE device_id = ? AND hour >= ?
+        ORDER BY hour
+        ''', ('', '')),
+    'get_stats.recent_alerts': ('''
+        SELECT COUNT(*) as count FROM notifications
+        WHERE timestamp > datetime('now', '-1 day')
+        ''', ()),
+    'notifications_list': ('''
+        SELECT n.*, d.name as device_name
+        FROM notifications n
+        JOIN devices d ON n.device_id = d.id
+        ORDER BY n.timestamp DESC
+        LIMIT 100
+        ''', ()),
+    'list_incidents': ('''
+        SELECT * FROM incidents
+        WHERE status = ? AND (opened_at, id) < (?, ?)
+        ORDER BY opened_at DESC, id DESC
+        LIMIT ?
+        ''', ('open', '', 0, 100)),
+    'list_incidents.device': ('''
+        SELECT * FROM incidents
+        WHERE device_id = ?
+        ORDER BY opened_at DESC, id DESC
+        LIMIT ?
+        ''', ('', 100)),
+}
+
+def check_query_plans(conn):
+    """Log hot queries whose plan needs a full table scan or a temporary sort"""
+    problems = 0
+    for name, (sql, params) in HOT_QUERIES.items():
+        details = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+        for detail in details:
+            full_scan = detail.startswith('SCAN') and ' USING ' not in detail
+            if full_scan or 'USE TEMP B-TREE' in detail:
+                logger.warning(f"Query plan for {name}: {detail}")
+                problems += 1
+    if not problems:
+        logger.info(f"Query plans OK for {len(HOT_QUERIES)} hot queries")
+    return problems
+
+# Retention
+ROLLUP_SQL = '''
+INSERT INTO {table} (device_id, bucket, fault_type, measurement_count,
+                     min_signal_power, max_signal_power, sum_signal_power,
+                     min_attenuation, max_attenuation, sum_attenuation)
+SELECT device_id, strftime(?, timestamp), fault_type, COUNT(*),
+       MIN(signal_power), MAX(signal_power), SUM(signal_power),
+       MIN(attenuation), MAX(attenuation), SUM(attenuation)
+FROM measurements
+WHERE id IN (SELECT id FROM temp.retention_batch)
+GROUP BY 1, 2, 3
+ON CONFLICT (device_id, bucket, fault_type) DO UPDATE SET
+    measurement_count = measurement_count + excluded.measurement_count,
+    min_signal_power = MIN(min_signal_power, excluded.min_signal_power),
+    max_signal_power = MAX(max_signal_power, excluded.max_signal_power),
+    sum_signal_power = sum_signal_power + excluded.sum_signal_power,
+    min_attenuation = MIN(min_attenuation, excluded.min_attenuation),
+    max_attenuation = MAX(max_attenuation, excluded.max_attenuation),
+    sum_attenuation = sum_attenuation + excluded.sum_attenuation
+'''
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+def retention_cutoff(days):
+    """Timestamp before which raw measurements are rolled up"""
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+def retire_measurements(conn, select_ids, params=(), batch_size=RETENTION_BATCH_SIZE, pause=RETENTION_BATCH_PAUSE):
+    """Fold measurements into the rollup tables and delete them, one short transaction per batch
+
+    `select_ids` is a query returning the ids of the next batch, ending in LIMIT ?
+    """
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS retention_batch (id INTEGER PRIMARY KEY)')
+    retired = 0
+    while True:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM temp.retention_batch')
+            conn.execute(f'INSERT INTO temp.retention_batch {select_ids}', (*params, batch_size))
+            count = conn.execute('SELECT COUNT(*) FROM temp.retention_batch').fetchone()[0]
+            if count:
+                for table, bucket_format in ROLLUP_TABLES.items():
+                    conn.execute(ROLLUP_SQL.format(table=table), (bucket_format,))
+                # No delete trigger on measurements, so the dashboard totals keep these rows
+                conn.execute('DELETE FROM measurements WHERE id IN (SELECT id FROM temp.retention_batch)')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        retired += count
+        if count < batch_size:
+            break
+        time.sleep(pause)
+    return retired
+
+def release_free_pages(conn):
+    """Run an incremental vacuum and return the number of bytes handed back to the filesystem"""
+    free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    # executescript steps the pragma to completion; execute() would free a single page
+    conn.executescript('PRAGMA incremental_vacuum')
+    released_pages = free_pages - conn.execute('PRAGMA freelist_count').fetchone()[0]
+    return released_pages * conn.execute('PRAGMA page_size').fetchone()[0]
+
+def run_retention(conn, cutoff, batch_size=RETENTION_BATCH_SIZE, pause=RETENTION_BATCH_PAUSE):
+    """Roll raw measurements older than cutoff into the rollup tables, deleting them in short transactions"""
+    rolled_up = retire_measurements(
+        conn, 'SELECT id FROM measurements WHERE timestamp < ? ORDER BY timestamp LIMIT ?', (cutoff,),
+        batch_size, pause
+    )
+    return {
+        'cutoff': cutoff,
+        'rolled_up_rows': rolled_up,
+        'released_bytes': release_free_pages(conn)
+    }
+
+def retention_report(conn, cutoff):
+    """Dry run: how many raw rows a retention run would remove and roughly how much space it frees"""
+    total_rows = conn.execute('SELECT COUNT(*) FROM measurements').fetchone()[0]
+    eligible_rows = conn.execute('SELECT COUNT(*) FROM measurements WHERE timestamp < ?', (cutoff,)).fetchone()[0]
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+    free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    auto_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+
+    # Size of the table and its indexes from dbstat when compiled in, else the whole file as an upper bound
+    try:
+        measurements_bytes = conn.execute('''
+        SELECT SUM(pgsize) FROM dbstat
+        WHERE name = 'measurements'
+           OR name IN (SELECT name FROM sqlite_master WHERE tbl_name = 'measurements' AND type = 'index')
+        ''').fetchone()[0] or 0
+        estimate = 'dbstat'
+    except sqlite3.OperationalError:
+        measurements_bytes = (page_count - free_pages) * page_size
+        estimate = 'upper bound'
+
+    return {
+        'cutoff': cutoff,
+        'total_rows': total_rows,
+        'eligible_rows': eligible_rows,
+        'database_bytes': page_count * page_size,
+        'measurements_bytes': measurements_bytes,
+        'estimated_reclaim_bytes': int(measurements_bytes * eligible_rows / total_rows) if total_rows else 0,
+        'free_bytes': free_pages * page_size,
+        'estimate': estimate,
+        'auto_vacuum': AUTO_VACUUM_MODES.get(auto_vacuum, auto_vacuum)
+    }
+
+# Measurement partitions
+# Completed months are sealed out of the main table into read-only files named
+# measurements_YYYY_MM.db, which readers ATTACH only when a query reaches them.
+MEASUREMENT_COLUMNS = ('id', 'device_id', 'timestamp', 'signal_power', 'attenuation', 'distance',
+                       'fault_type', 'confidence', 'notification_sent')
+PARTITION_FILE_PATTERN = re.compile(r'^measurements_(\d{4})_(\d{2})\.db$')
+PARTITION_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS {schema}.measurements (
+        id INTEGER PRIMARY KEY,
+        device_id TEXT NOT NULL,
+        timestamp TIMESTAMP,
+        signal_power REAL NOT NULL,
+        attenuation REAL NOT NULL,
+        distance REAL NOT NULL,
+        fault_type TEXT NOT NULL,
+        confidence REAL NOT NULL,
+        notification_sent BOOLEAN DEFAULT 0
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS {schema}.idx_measurements_device_timestamp ON measurements (device_id, timestamp)',
+    'CREATE INDEX IF NOT EXISTS {schema}.idx_measurements_timestamp ON measurements (timestamp)',
+]
+_partition_cache = {'mtime': None, 'partitions': []}
+
+def month_bounds(month):
+    """Return the [start, end) timestamps of a 'YYYY-MM' month"""
+    year, month_number = (int(part) for part in month.split('-'))
+    end_year, end_month = (year + 1, 1) if month_number == 12 else (year, month_number + 1)
+    return f'{year:04d}-{month_number:02d}-01 00:00:00', f'{end_year:04d}-{end_month:02d}-01 00:00:00'
+
+def partition_path(month):
+    return os.path.join(PARTITION_DIR, f"measurements_{month.replace('-', '_')}.db")
+
+def list_partitions():
+    """Sealed partitions as dicts with month, start, end and path, newest first"""
+    if not PARTITION_DIR or not os.path.isdir(PARTITION_DIR):
+        return []
+    mtime = os.stat(PARTITION_DIR).st_mtime_ns
+    if _partition_cache['mtime'] != mtime:
+        partitions = []
+        for name in os.listdir(PARTITION_DIR):
+            match = PARTITION_FILE_PATTERN.match(name)
+            if match:
+                month = f'{match.group(1)}-{match.group(2)}'
+                start, end = month_bounds(month)
+                partitions.append({'month': month, 'start': start, 'end': end,
+                                   'path': os.path.join(PARTITION_DIR, name)})
+        partitions.sort(key=lambda partition: partition['start'], reverse=True)
+        _partition_cache.update(mtime=mtime, partitions=partitions)
+    return _partition_cache['partitions']
+
+def query_measurements(conn, sql, params, limit, offset=0, since=None, until=None):
+    """Run a newest-first measurements query over the main table and the sealed partitions it reaches
+
+    `sql` reads from `{measurements}`, orders by timestamp DESC, id DESC and ends in LIMIT ? OFFSET ?.
+    Partitions outside [since, until] are never opened.
+    """
+    partitions = [partition for partition in list_partitions()
+                  if (until is None or partition['start'] <= until) and (since is None or partition['end'] > since)]
+    if not partitions:
+        return conn.execute(sql.format(measurements='measurements'), (*params, limit, offset)).fetchall()
+
+    wanted = offset + limit
+    rows = conn.execute(sql.format(measurements='measurements'), (*params, wanted, 0)).fetchall()
+    for partition in partitions:
+        # Partitions hold whole months: once enough newer rows are found, older months can't contribute
+        if len(rows) >= wanted and rows[wanted - 1]['timestamp'] >= partition['end']:
+            break
+        conn.execute('ATTACH DATABASE ? AS sealed', (f"file:{partition['path']}?mode=ro",))
+        try:
+            rows += conn.execute(sql.format(measurements='sealed.measurements'), (*params, wanted, 0)).fetchall()
+        finally:
+            conn.execute('DETACH DATABASE sealed')
+        # A month being sealed can briefly be in both places
+        unique = {row['id']: row for row in rows}
+        rows = sorted(unique.values(), key=lambda row: (row['timestamp'], row['id']), reverse=True)[:wanted]
+    return rows[offset:]
+
+def measurement_segments(since=None, until=None):
+    """Split [since, until) into oldest-first (partition, source, params) pieces
+
+    Each source is a subquery over one stretch of time: a sealed month (together with any late rows
+    for it still in the main table) or the main table between two sealed months. Rows that are in
+    both while a month is being sealed are skipped on the main side by id, which avoids the sort a
+    plain UNION would need to drop duplicates.
+    """
+    segments, lower = [], since
+    for partition in reversed(list_partitions()):
+        if (until is not None and partition['start'] >= until) or (since is not None and partition['end'] <= since):
+            continue
+        segments.append((None, *main_measurements(lower, partition['start'])))
+        segments.append((partition, '''(
+            SELECT * FROM sealed.measurements WHERE timestamp >= ? AND timestamp < ?
+            UNION ALL
+            SELECT * FROM main.measurements m WHERE timestamp >= ? AND timestamp < ?
+                AND NOT EXISTS (SELECT 1 FROM sealed.measurements s WHERE s.id = m.id)
+        )''', (partition['start'], partition['end']) * 2))
+        lower = partition['end']
+    segments.append((None, *main_measurements(lower, until)))
+    return segments
+
+def main_measurements(since, until):
+    """Subquery and params for main-table measurements in [since, until), either bound optional"""
+    conditions, params = [], []
+    if since is not None:
+        conditions.append('timestamp >= ?')
+        params.append(since)
+    if until is not None:
+        conditions.append('timestamp < ?')
+        params.append(until)
+    if not conditions:
+        return 'main.measurements', ()
+    return f"(SELECT * FROM main.measurements WHERE {' AND '.join(conditions)})", tuple(params)
+
+def iter_measurements(conn, sql, params, since=None, until=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield chunks of an oldest-first measurements query across the main table and sealed partitions
+
+    `sql` reads from `{measurements}` and orders by timestamp, id; each segment is queried in turn,
+    so rows come out in order without ever loading more than a chunk.
+    """
+    for partition, source, source_params in measurement_segments(since, until):
+        if partition:
+            conn.execute('ATTACH DATABASE ? AS sealed', (f"file:{partition['path']}?mode=ro",))
+        try:
+            cursor = conn.execute(sql.format(measurements=source), (*source_params, *params))
+            try:
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cursor.close()
+        finally:
+            if partition:
+                conn.execute('DETACH DATABASE sealed')
+
+def seal_partition(conn, month):
+    """Move one month of measurements out of the main table into its read-only partition file"""
+    start, end = month_bounds(month)
+    path = partition_path(month)
+    os.makedirs(PARTITION_DIR, exist_ok=True)
+    if os.path.exists(path):
+        os.chmod(path, 0o644)  # late rows for an already sealed month are merged in
+        target = path
+    else:
+        # A new month is built under a name list_partitions() skips, so readers never
+        # attach a partition file before its table exists
+        target = path + '.tmp'
+        if os.path.exists(target):
+            os.remove(target)
+    conn.execute('ATTACH DATABASE ? AS seal', (target,))
+    try:
+        conn.execute('PRAGMA seal.journal_mode=DELETE')
+        # Copy first, so the rows are durable in the partition before they leave the main table
+        conn.execute('BEGIN')
+        try:
+            for statement in PARTITION_SCHEMA:
+                conn.execute(statement.format(schema='seal'))
+            columns = ', '.join(MEASUREMENT_COLUMNS)
+            conn.execute(f'''
+            INSERT OR IGNORE INTO seal.measurements ({columns})
+            SELECT {columns} FROM main.measurements
+            WHERE timestamp >= ? AND timestamp < ?
+            ORDER BY timestamp, id
+            ''', (start, end))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if target != path:
+            conn.execute('DETACH DATABASE seal')
+            os.replace(target, path)
+            target = path
+            conn.execute('ATTACH DATABASE ? AS seal', (path,))
+        # Then retire them in batches, keeping the rollups (and so series and rebuilt stats) complete
+        moved = retire_measurements(
+            conn, 'SELECT m.id FROM main.measurements m JOIN seal.measurements s ON s.id = m.id LIMIT ?'
+        )
+        rows = conn.execute('SELECT COUNT(*) FROM seal.measurements').fetchone()[0]
+    finally:
+        conn.execute('DETACH DATABASE seal')
+        if target == path:
+            os.chmod(path, 0o444)
+        else:
+            os.remove(target)
+    _partition_cache['mtime'] = None
+    return {'month': month, 'path': path, 'moved_rows': moved, 'partition_rows': rows}
+
+def sealable_months(conn, hot_months=PARTITION_HOT_MONTHS):
+    """Months with rows in the main table that are older than the hot window"""
+    now = datetime.now(timezone.utc)
+    month_index = now.year * 12 + now.month - 1 - (max(hot_months, 1) - 1)
+    cutoff = f'{month_index // 12:04d}-{month_index % 12 + 1:02d}-01 00:00:00'
+    cursor = conn.execute('''
+    SELECT DISTINCT strftime('%Y-%m', timestamp) FROM measurements
+    WHERE timestamp < ?
+    ORDER BY 1
+    ''', (cutoff,))
+    return [row[0] for row in cursor.fetchall()]
+
+def seal_partitions(conn):
+    """Seal every month that has left the hot window"""
+    results = [seal_partition(conn, month) for month in sealable_months(conn)]
+    if results:
+        release_free_pages(conn)
+    return results
+
+# Columnar archive
+# An archived month is a directory of .npy column files sorted by device and time,
+# plus index.json with each device's row offset, row count and time range.
+ARCHIVE_COLUMNS = {
+    'id': np.int64,
+    'timestamp': np.int64,  # Unix seconds (UTC)
+    'signal_power': np.float64,
+    'attenuation': np.float64,
+    'distance': np.float64,
+    'fault_code': np.int8,  # index into FAULT_TYPES, -1 if unknown
+    'confidence': np.float64,
+}
+
+def to_epoch(timestamp):
+    """Unix seconds for a UTC timestamp in CURRENT_TIMESTAMP format"""
+    return calendar.timegm(datetime.fromisoformat(timestamp).timetuple())
+
+def archive_path(month, archive_dir=None):
+    return os.path.join(archive_dir or ARCHIVE_DIR, f"measurements_{month.replace('-', '_')}")
+
+def write_columnar_archive(conn, month, archive_dir=None):
+    """Write one month of measurements (from its sealed partition if any) as a columnar archive"""
+    start, end = month_bounds(month)
+    target = archive_path(month, archive_dir)
+    partition = partition_path(month) if PARTITION_DIR else None
+    source = 'main.measurements'
+    if partition and os.path.exists(partition):
+        conn.execute('ATTACH DATABASE ? AS sealed', (f'file:{partition}?mode=ro',))
+        source = 'sealed.measurements'
+
+    tmp = target + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    fault_codes = {fault_type: code for code, fault_type in enumerate(FAULT_TYPES)}
+    devices = {}
+    try:
+        # Count and copy from the same snapshot
+        conn.execute('BEGIN')
+        rows = conn.execute(f'SELECT COUNT(*) FROM {source} WHERE timestamp >= ? AND timestamp < ?',
+                            (start, end)).fetchone()[0]
+        columns = {
+            name: np.lib.format.open_memmap(os.path.join(tmp, f'{name}.npy'), mode='w+', dtype=dtype, shape=(rows,))
+            for name, dtype in ARCHIVE_COLUMNS.items()
+        }
+        cursor = conn.execute(f'''
+        SELECT id, device_id, CAST(strftime('%s', timestamp) AS INTEGER), signal_power, attenuation,
+               distance, fault_type, confidence
+        FROM {source}
+        WHERE timestamp >= ? AND timestamp < ?
+        ORDER BY device_id, timestamp, id
+        ''', (start, end))
+        offset = 0
+        while True:
+            chunk = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            ids, device_ids, timestamps, signal_power, attenuation, distance, fault_types, confidence = zip(*chunk)
+            stop = offset + len(chunk)
+            columns['id'][offset:stop] = ids
+            columns['timestamp'][offset:stop] = timestamps
+            columns['signal_power'][offset:stop] = signal_power
+            columns['attenuation'][offset:stop] = attenuation
+            columns['distance'][offset:stop] = distance
+            columns['fault_code'][offset:stop] = [fault_codes.get(fault_type, -1) for fault_type in fault_types]
+            columns['confidence'][offset:stop] = confidence
+            position = offset
+            for device_id, group in itertools.groupby(device_ids):
+                count = sum(1 for _ in group)
+                entry = devices.setdefault(device_id, {'offset': position, 'count': 0})
+                entry['count'] += count
+                position += count
+            offset = stop
+        conn.rollback()
+
+        for entry in devices.values():
+            entry['start'] = int(columns['timestamp'][entry['offset']])
+            entry['end'] = int(columns['timestamp'][entry['offset'] + entry['count'] - 1])
+        for column in columns.values():
+            column.flush()
+        del columns
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    finally:
+        # A database can't be detached while a transaction is open
+        if conn.in_transaction:
+            conn.rollback()
+        if source == 'sealed.measurements':
+            conn.execute('DETACH DATABASE sealed')
+
+    index = {
+        'month': month,
+        'rows': rows,
+        'start': to_epoch(start),
+        'end': to_epoch(end),
+        'columns': {name: np.dtype(dtype).str for name, dtype in ARCHIVE_COLUMNS.items()},
+        'fault_types': list(FAULT_TYPES),
+        'devices': devices,
+    }
+    with open(os.path.join(tmp, 'index.json'), 'w') as f:
+        json.dump(index, f)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    return {'month': month, 'path': target, 'rows': rows, 'devices': len(devices)}
+
+class ColumnarArchive:
+    """Read-only view of an archived month; columns are memory-mapped and device slices are zero-copy"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'index.json')) as f:
+            self.index = json.load(f)
+        self._columns = {}
+
+    def __len__(self):
+        return self.index['rows']
+
+    @property
+    def devices(self):
+        return self.index['devices']
+
+    def column(self, name):
+        if name not in self._columns:
+            self._columns[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        return self._columns[name]
+
+    def scan(self, columns, device_id=None, since=None, until=None):
+        """Return {column: array} for every row or one device, optionally limited to [since, until) Unix seconds
+
+        Whole-archive and per-device scans are views of the mapped files; a time range across all
+        devices needs a mask and so returns copies.
+        """
+        start, stop = 0, len(self)
+        if device_id is not None:
+            entry = self.devices.get(device_id, {'offset': 0, 'count': 0})
+            start, stop = entry['offset'], entry['offset'] + entry['count']
+            # Rows are sorted by time within a device
+            timestamps = self.column('timestamp')[start:stop]
+            low = int(np.searchsorted(timestamps, since)) if since is not None else 0
+            high = int(np.searchsorted(timestamps, until)) if until is not None else len(timestamps)
+            start, stop = start + low, start + max(low, high)
+        elif since is not None or until is not None:
+            timestamps = self.column('timestamp')
+            mask = np.ones(len(self), dtype=bool)
+            if since is not None:
+                mask &= timestamps >= since
+            if until is not None:
+                mask &= timestamps < until
+            return {name: self.column(name)[mask] for name in columns}
+        return {name: self.column(name)[start:stop] for name in columns}
+
+    def fault_types(self, fault_codes):
+        """Decode fault_code values to labels"""
+        labels = np.array(self.index['fault_types'] + ['Unknown'], dtype=object)
+        return labels[fault_codes]
+
+class RetentionWorker:
+    """Background thread applying the retention policy (and partition sealing) every `interval` seconds"""
+
+    def __init__(self, days, interval):
+        self.days = days
+        self.interval = interval
+        self._worker = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._worker is not None or (self.days <= 0 and not PARTITION_DIR):
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='retention', daemon=True)
+                self._worker.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with db_connection() as conn:
+                    if PARTITION_DIR:
+                        for result in seal_partitions(conn):
+                            logger.info(f"Sealed {result['moved_rows']} measurements into {result['path']}")
+                    if self.days > 0:
+                        result = run_retention(conn, retention_cutoff(self.days))
+                        if result['rolled_up_rows']:
+                            logger.info(f"Retention rolled up {result['rolled_up_rows']} measurements before "
+                                        f"{result['cutoff']}, released {result['released_bytes']} bytes")
+            except Exception as e:
+                logger.error(f"Retention run failed: {str(e)}")
+            self._stop.wait(self.interval)
+
+retention_worker = RetentionWorker(RETENTION_DAYS, RETENTION_INTERVAL)
+atexit.register(retention_worker.stop)
+
+@app.before_request
+def start_background_jobs():
+    retention_worker.start()
+    model_registry.start()
+    anomaly_detector.start_rebuild()
+
 # Initialize database on startup
 init_db()
 
-def get_db_connection():
-    """Connect to the SQLite database and return the connection."""
-    # Use the DB_PATH variable for the database location
-    conn = sqlite3.connect(DB_PATH)  # Replace DB_PATH with the actual path to your database
-    conn.row_factory = sqlite3.Row  # This allows us to access columns by name (e.g., user['email'])
-    return conn
+# Classifier noise
+_SPLITMIX_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_SPLITMIX_MUL1 = np.uint64(0xBF58476D1CE4E5B9)
+_SPLITMIX_MUL2 = np.uint64(0x94D049BB133111EB)
+
+def _splitmix64(x):
+    """SplitMix64 finalizer applied elementwise to a uint64 array"""
+    x = x + _SPLITMIX_GAMMA
+    x = (x ^ (x >> np.uint64(30))) * _SPLITMIX_MUL1
+    x = (x ^ (x >> np.uint64(27))) * _SPLITMIX_MUL2
+    return x ^ (x >> np.uint64(31))
+
+def hashed_uniforms(signal_power, attenuation, distance, columns, seed=None):
+    """Uniforms in [0, 1) derived from a hash of each (signal_power, attenuation, distance) triple"""
+    # Adding 0.0 folds -0.0 into 0.0 so equal readings hash equally
+    bits = np.stack([signal_power + 0.0, attenuation + 0.0, distance + 0.0], axis=1).view(np.uint64)
+    seed = CLASSIFIER_SEED if seed is None else seed
+    with np.errstate(over='ignore'):
+        state = np.full(len(bits), np.uint64(seed & 0xFFFFFFFFFFFFFFFF))
+        for column in range(bits.shape[1]):
+            state = _splitmix64(state ^ bits[:, column])
+        uniforms = np.empty((len(bits), columns))
+        for column in range(columns):
+            state = _splitmix64(state)
+            uniforms[:, column] = (state >> np.uint64(11)) * (1.0 / (1 << 53))
+    return uniforms
+
+def classifier_noise(signal_power, attenuation, distance, shape, noise=None):
+    """Return uniforms in [0, 1) for the probability jitter, or None when noise is disabled"""
+    mode = noise or CLASSIFIER_NOISE
+    if mode == 'off':
+        return None
+    if mode == 'hashed':
+        return hashed_uniforms(signal_power, attenuation, distance, shape[1])
+    if mode == 'seeded':
+        with classifier_rng_lock:
+            return classifier_rng.random(shape)
+    return np.random.random(shape)
+
+def is_classifier_deterministic(noise=None):
+    """True when identical readings always produce identical classifications"""
+    return (noise or CLASSIFIER_NOISE) in ('hashed', 'off')
+
 # Simple rule-based model
-def predict_fault(signal_power, attenuation, distance):
+# Fault classes, in the column order used by probability matrices
+FAULT_TYPES = ('No Fault', 'Fiber Break', 'High Loss', 'Splice Loss')
+FAULT_LABELS = np.array(FAULT_TYPES, dtype=object)
+
+# Base probabilities assigned by each rule (rows and columns follow FAULT_TYPES)
+RULE_PROBABILITIES = np.array([
+    [0.85, 0.01, 0.04, 0.10],  # No Fault
+    [0.02, 0.85, 0.10, 0.03],  # Fiber Break
+    [0.02, 0.15, 0.75, 0.08],  # High Loss
+    [0.10, 0.05, 0.15, 0.70],  # Splice Loss
+])
+
+# Bump whenever classify_rules or RULE_PROBABILITIES change, so stored results can be told apart
+RULES_VERSION = 1
+
+def classifier_version(noise=None):
+    """Identifier of the classification the active backend produces with a given noise mode"""
+    return model_registry.backend.version(noise)
+
+def classify_rules(signal_power, attenuation, distance, noise=None):
     """
-    Simple rule-based model that doesn't require training
-    Based on the patterns in our synthetic data
+    Vectorized rule-based model over float64 columns of readings
+    Returns an array of predicted labels, an (n, 4) probability matrix
+    with columns ordered as FAULT_TYPES, and an array of confidences
     """
-    # Initialize probabilities
-    probabilities = {
-        'No Fault': 0.0,
-        'Fiber Break': 0.0,
-        'High Loss': 0.0,
-        'Splice Loss': 0.0
-    }
-    
+
     # Fiber Break: Very low signal power, high attenuation
-    if signal_power < -40 and attenuation > 1.5:
-        probabilities['Fiber Break'] = 0.85
-        probabilities['High Loss'] = 0.10
-        probabilities['Splice Loss'] = 0.03
-        probabilities['No Fault'] = 0.02
+    fiber_break = (signal_power < -40) & (attenuation > 1.5)
     # High Loss: Moderate-low signal power, moderate-high attenuation
-    elif signal_power < -30 and signal_power >= -40 and attenuation > 1.0:
-        probabilities['High Loss'] = 0.75
-        probabilities['Fiber Break'] = 0.15
-        probabilities['Splice Loss'] = 0.08
-        probabilities['No Fault'] = 0.02
+    high_loss = (signal_power < -30) & (signal_power >= -40) & (attenuation > 1.0)
     # Splice Loss: Moderate signal power, low-moderate attenuation
-    elif signal_power < -20 and signal_power >= -30 and attenuation > 0.5 and attenuation <= 1.5:
-        probabilities['Splice Loss'] = 0.70
-        probabilities['High Loss'] = 0.15
-        probabilities['No Fault'] = 0.10
-        probabilities['Fiber Break'] = 0.05
-    # No Fault: Good signal power, low attenuation
-    else:
-        probabilities['No Fault'] = 0.85
-        probabilities['Splice Loss'] = 0.10
-        probabilities['High Loss'] = 0.04
-        probabilities['Fiber Break'] = 0.01
-    
-    # Add some randomness to make it more realistic
-    for key in probabilities:
-        # Add random noise ±5%
-        probabilities[key] += (np.random.random() * 0.1 - 0.05)
-        # Ensure probabilities stay in valid range
-        probabilities[key] = max(0, min(1, probabilities[key]))
-    
+    splice_loss = (signal_power < -20) & (signal_power >= -30) & (attenuation > 0.5) & (attenuation <= 1.5)
+    # No Fault: everything else; the first matching rule wins
+    rule = np.select([fiber_break, high_loss, splice_loss], [1, 2, 3], default=0)
+
+    probabilities = RULE_PROBABILITIES[rule]
+
+    # Add noise ±5% to make it more realistic, keeping probabilities in range
+    uniforms = classifier_noise(signal_power, attenuation, distance, probabilities.shape, noise)
+    if uniforms is not None:
+        probabilities += uniforms * 0.1 - 0.05
+        np.clip(probabilities, 0, 1, out=probabilities)
+
     # Normalize probabilities to sum to 1
-    total = sum(probabilities.values())
-    for key in probabilities:
-        probabilities[key] /= total
-    
+    probabilities /= probabilities.sum(axis=1, keepdims=True)
+
     # Find the most likely fault type
-    prediction = max(probabilities, key=probabilities.get)
-    confidence = probabilities[prediction]
-    
-    return prediction, probabilities, confidence
-
-# Email notification function
-def send_email_notification(device_id, device_name, fault_type, confidence, signal_power, attenuation, distance, measurement_id, recipients):
-    """Send email notification about a detected fault"""
-    if not EMAIL_ENABLED or not EMAIL_USERNAME or not EMAIL_PASSWORD:
-        logger.warning("Email notifications are disabled or not configured")
-        return False, "Email notifications are disabled or not configured"
-    
-    try:
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_FROM
-        msg['To'] = ", ".join(recipients)
-        msg['Subject'] = f"{EMAIL_SUBJECT_PREFIX} {fault_type} Detected on {device_name}"
-        
-        # Email body
-        body = f"""
-        <html>
-        <body>
-            <h2>Fiber Optic Fault Alert</h2>
-            <p>A potential issue has been detected in your fiber optic network.</p>
-            
-            <h3>Alert Details:</h3>
-            <ul>
-                <li><strong>Device:</strong> {device_name} ({device_id})</li>
-                <li><strong>Fault Type:</strong> <span style="color: red; font-weight: bold;">{fault_type}</span></li>
-                <li><strong>Confidence:</strong> {confidence:.1%}</li>
-                <li><strong>Time Detected:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</li>
-            </ul>
-            
-            <h3>Measurements:</h3>
-            <ul>
-                <li><strong>Signal Power:</strong> {signal_power} dB</li>
-                <li><strong>Attenuation:</strong> {attenuation} dB/km</li>
-                <li><strong>Distance:</strong> {distance} m</li>
-            </ul>
-            
-            <h3>Recommended Actions:</h3>
-            <ul>
-        """
-        
-        # Add recommendations based on fault type
-        if fault_type == "Fiber Break":
-            body += """
-                <li>Immediately check for physical damage to the fiber</li>
-                <li>Verify connectivity at both ends of the fiber link</li>
-                <li>Prepare replacement fiber if necessary</li>
-                <li>Use OTDR to locate the exact break point</li>
-            """
-        elif fault_type == "High Loss":
-            body += """
-                <li>Check for bends or stress points in the fiber</li>
-                <li>Inspect connectors for damage or contamination</li>
-                <li>Verify transmitter power levels</li>
-                <li>Consider cleaning or replacing connectors</li>
-            """
-        elif fault_type == "Splice Loss":
-            body += """
-                <li>Inspect splice points for proper alignment</li>
-                <li>Check for contamination at splice locations</li>
-                <li>Consider re-splicing if loss is above acceptable threshold</li>
-                <li>Verify splice protection is properly installed</li>
-            """
-        
-        body += """
-            </ul>
-            
-            <p>Please investigate this issue promptly to prevent service disruption.</p>
-            
-            <p style="color: gray; font-size: 0.8em;">This is an automated message from the Fiber Optic Fault Detection System. 
-            Do not reply to this email.</p>
-        </body>
-        </html>
-        """
-        
-        msg.attach(MIMEText(body, 'html'))
-        
-        # Connect to server and send
-        server = smtplib.SMTP(EMAIL_SERVER, EMAIL_PORT)
-        if EMAIL_USE_TLS:
-            server.starttls()
-        server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
-        server.send_message(msg)
-        server.quit()
-        
-        logger.info(f"Email notification sent for device {device_id}, fault: {fault_type}")
-        
-        # Record notification in database
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-        INSERT INTO notifications 
-        (device_id, measurement_id, fault_type, recipients, status)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (device_id, measurement_id, fault_type, json.dumps(recipients), 'sent'))
-        
-        # Update measurement to mark notification as sent
-        cursor.execute('''
-        UPDATE measurements
-        SET notification_sent = 1
-        WHERE id = ?
-        ''', (measurement_id,))
-        
-        # Update device last alert time
-        cursor.execute('''
-        UPDATE devices
-        SET last_alert_sent = ?
-        WHERE id = ?
-        ''', (datetime.now().isoformat(), device_id))
-        
-        conn.commit()
-        conn.close()
-        
-        return True, "Email notification sent successfully"
-        
-    except Exception as e:
-        error_message = str(e)
-        logger.error(f"Failed to send email notification: {error_message}")
-        
-        # Record failed notification
-        try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('''
-            INSERT INTO notifications 
-            (device_id, measurement_id, fault_type, recipients, status, error_message)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ''', (device_id, measurement_id, fault_type, json.dumps(recipients), 'failed', error_message))
-            conn.commit()
-            conn.close()
-        except Exception as db_error:
-            logger.error(f"Failed to record notification error: {db_error}")
-        
-        return False, error_message
+    codes = probabilities.argmax(axis=1)
+    confidences = probabilities[np.arange(len(codes)), codes]
+
+    return FAULT_LABELS[codes], probabilities, confidences
+
+# Classifier backends
+# A backend classifies float64 columns of readings (plus their timestamps, for
+# backends using time features) and returns labels, probabilities and confidences.
+SCALER_FEATURES = ('Signal_Power (dB)', 'Attenuation (dB/km)', 'Distance (m)', 'Hour', 'Day', 'DayOfWeek')
+
+def time_features(timestamps, n):
+    """Hour, day of month and day of week (Monday=0) columns for UTC timestamps; missing ones use now"""
+    now = np.datetime64(datetime.now(timezone.utc).replace(tzinfo=None), 's')
+    if timestamps is None:
+        times = np.full(n, now)
+    else:
+        times = np.asarray(timestamps)
+        # Integers are Unix seconds (columnar archives), anything else is parsed as a timestamp
+        times = times.astype('datetime64[s]') if times.dtype.kind in 'iu' else np.array(times, dtype='datetime64[s]')
+        times[np.isnat(times)] = now
+    days = times.astype('datetime64[D]')
+    hour = (times - days).astype('timedelta64[h]').astype(np.float64)
+    day = (days - days.astype('datetime64[M]')).astype(np.float64) + 1
+    day_of_week = ((days.astype(np.int64) + 3) % 7).astype(np.float64)  # 1970-01-01 was a Thursday
+    return hour, day, day_of_week
+
+class RulesBackend:
+    """The threshold rules in classify_rules"""
+
+    name = 'rules'
+    uses_time = False
+
+    def version(self, noise=None):
+        return f'rules-v{RULES_VERSION}-{noise or CLASSIFIER_NOISE}'
+
+    def is_deterministic(self, noise=None):
+        return is_classifier_deterministic(noise)
+
+    def classify(self, signal_power, attenuation, distance, timestamps=None, noise=None):
+        return classify_rules(signal_power, attenuation, distance, noise)
+
+class MlpBackend:
+    """
+    Small dense network over the standardized scaler features, evaluated with
+    NumPy matrix products (ReLU hidden layers, softmax output). With no hidden
+    layers it is a linear softmax model. Probabilities carry no noise.
+    """
+
+    name = 'mlp'
+    uses_time = True
+
+    def __init__(self, mean, scale, layers, version):
+        self.mean = mean
+        self.scale = scale
+        self.layers = layers
+        self._version = version
+
+    @classmethod
+    def load(cls, scaler_path, weights_path):
+        mean, scale = load_feature_scaler(scaler_path)
+        with np.load(weights_path, allow_pickle=False) as weights:
+            depth = sum(1 for key in weights.files if key.startswith('W'))
+            layers = [(weights[f'W{index}'].astype(np.float64), weights[f'b{index}'].astype(np.float64))
+                      for index in range(depth)]
+            classes = tuple(weights['classes'].tolist())
+        if classes != FAULT_TYPES:
+            raise ValueError(f'Model classes {classes} do not match {FAULT_TYPES}')
+        if not layers:
+            raise ValueError('Model has no layers')
+        inputs = len(mean)
+        for weight, bias in layers:
+            if weight.ndim != 2 or weight.shape[0] != inputs or bias.shape != (weight.shape[1],):
+                raise ValueError('Model layer shapes do not chain')
+            if not (np.all(np.isfinite(weight)) and np.all(np.isfinite(bias))):
+                raise ValueError('Model weights are not finite')
+            inputs = weight.shape[1]
+        if inputs != len(FAULT_TYPES):
+            raise ValueError(f'Model has {inputs} outputs, expected {len(FAULT_TYPES)}')
+        digest = hashlib.sha256(b''.join(array.tobytes() for layer in layers for array in layer)).hexdigest()
+        return cls(mean, scale, layers, f'mlp-{digest[:12]}')
+
+    def version(self, noise=None):
+        return self._version
+
+    def is_deterministic(self, noise=None):
+        return True
+
+    def probabilities(self, features):
+        x = (features - self.mean) / self.scale
+        for weight, bias in self.layers[:-1]:
+            x = np.maximum(x @ weight + bias, 0.0)
+        weight, bias = self.layers[-1]
+        logits = x @ weight + bias
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        return probabilities
+
+    def classify(self, signal_power, attenuation, distance, timestamps=None, noise=None):
+        features = np.column_stack((signal_power, attenuation, distance,
+                                    *time_features(timestamps, len(signal_power))))
+        probabilities = self.probabilities(features)
+        codes = probabilities.argmax(axis=1)
+        confidences = probabilities[np.arange(len(codes)), codes]
+        return FAULT_LABELS[codes], probabilities, confidences
+
+def load_feature_scaler(path):
+    """Return validated (mean, scale) arrays from a feature_scaler.npz written by `flask convert-scaler`"""
+    with np.load(path, allow_pickle=False) as scaler:
+        features = tuple(scaler['feature_names'].tolist())
+        mean = scaler['mean'].astype(np.float64)
+        scale = scaler['scale'].astype(np.float64)
+    if features != SCALER_FEATURES:
+        raise ValueError(f'Unexpected scaler features {features}')
+    if mean.shape != (len(features),) or scale.shape != (len(features),):
+        raise ValueError('Scaler mean/scale do not match its features')
+    if not (np.all(np.isfinite(mean)) and np.all(np.isfinite(scale)) and np.all(scale > 0)):
+        raise ValueError('Scaler mean/scale must be finite with a positive scale')
+    return mean, scale
+
+def read_scaler_pickle(path):
+    """Read the scikit-learn StandardScaler pickle (needs joblib and scikit-learn; only used to convert it)"""
+    import joblib  # optional, from requirements-models.txt; only `flask convert-scaler` needs it
+    scaler = joblib.load(path)
+    return {
+        'feature_names': np.array(getattr(scaler, 'feature_names_in_', SCALER_FEATURES), dtype=str),
+        'mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scale': np.asarray(scaler.scale_, dtype=np.float64),
+    }
+
+def build_classifier_backend(name):
+    """Load, validate and warm up a backend; raises if the artifacts are unusable"""
+    if name == 'mlp':
+        backend = MlpBackend.load(FEATURE_SCALER_PATH, MLP_WEIGHTS_PATH)
+    elif name == 'rules':
+        backend = RulesBackend()
+    else:
+        raise ValueError(f"Unknown CLASSIFIER_BACKEND '{name}'")
+
+    # Run a batch through the backend before it serves traffic
+    rng = np.random.default_rng(0)
+    _, probabilities, _ = backend.classify(rng.uniform(-60, -5, 256), rng.uniform(0, 3, 256),
+                                           rng.uniform(0, 10000, 256), noise='off')
+    if not (np.all(np.isfinite(probabilities)) and np.allclose(probabilities.sum(axis=1), 1.0)):
+        raise ValueError('Model warm-up produced invalid probabilities')
+    return backend
+
+MODEL_LOAD_ERRORS = (OSError, KeyError, ValueError)
+
+class ModelRegistry:
+    """
+    Holds the active classifier backend. Replacements are loaded, validated and
+    warmed up off to the side and then swapped in with a single reference
+    assignment, so requests always see a complete model and a failed load
+    leaves the current one serving.
+    """
+
+    def __init__(self, name, reload_interval):
+        self.name = name
+        self.reload_interval = reload_interval
+        self.backend = RulesBackend()
+        self.loaded_at = None
+        self.last_error = None
+        self._signature = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+
+    def artifacts(self):
+        return [FEATURE_SCALER_PATH, MLP_WEIGHTS_PATH] if self.name == 'mlp' else []
+
+    def signature(self):
+        """(mtime, size) of each artifact, used to notice replaced files"""
+        signature = []
+        for path in self.artifacts():
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def load(self):
+        """Initial load at startup; falls back to the rules if the artifacts are unusable"""
+        try:
+            self.reload(force=True)
+        except MODEL_LOAD_ERRORS as e:
+            logger.warning(f"Could not load the {self.name} classifier backend, using rules: {str(e)}")
+            self.backend = RulesBackend()
+
+    def reload(self, force=False):
+        """Swap in freshly loaded artifacts if they changed (or if forced)"""
+        with self._reload_lock:
+            signature = self.signature()
+            if not force and signature == self._signature:
+                return False
+            try:
+                backend = build_classifier_backend(self.name)
+            except MODEL_LOAD_ERRORS as e:
+                self.last_error = str(e)
+                # Remember the broken files so they are not retried until they change again
+                self._signature = signature
+                raise
+            self.backend = backend
+            self._signature = signature
+            self.loaded_at = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            self.last_error = None
+            classification_cache.clear()
+        logger.info(f"Loaded classifier backend {backend.version()}")
+        return True
+
+    def status(self):
+        return {
+            'backend': self.backend.version(),
+            'configured': self.name,
+            'loaded_at': self.loaded_at,
+            'last_error': self.last_error,
+            'artifacts': self.artifacts()
+        }
+
+    def start(self):
+        """Watch the artifacts from a background thread so reloads never run on a request"""
+        if self._watcher is not None or self.reload_interval <= 0 or not self.artifacts():
+            return
+        with self._reload_lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+                self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            try:
+                self.reload()
+            except MODEL_LOAD_ERRORS as e:
+                logger.error(f"Model reload failed, keeping {self.backend.version()}: {str(e)}")
+
+def train_mlp(mean, scale, hidden=16, samples=200000, epochs=20, batch_size=512, learning_rate=0.01, seed=0):
+    """Fit the mlp backend to noise-free rule labels on synthetic readings (Adam, cross-entropy)"""
+    rng = np.random.default_rng(seed)
+    features = np.column_stack((
+        rng.uniform(-60, -5, samples),                        # signal power
+        rng.uniform(0, 3, samples),                           # attenuation
+        rng.uniform(0, 2 * mean[2], samples),                 # distance
+        rng.integers(0, 24, samples).astype(np.float64),     # hour
+        rng.integers(1, 32, samples).astype(np.float64),     # day
+        rng.integers(0, 7, samples).astype(np.float64),      # day of week
+    ))
+    _, probabilities, _ = classify_rules(features[:, 0], features[:, 1], features[:, 2], noise='off')
+    targets = np.eye(len(FAULT_TYPES))[probabilities.argmax(axis=1)]
+    x_all = (features - mean) / scale
+
+    sizes = [x_all.shape[1]] + ([hidden] if hidden else []) + [len(FAULT_TYPES)]
+    params = []
+    for fan_in, fan_out in zip(sizes[:-1], sizes[1:]):
+        params += [rng.normal(0, np.sqrt(2.0 / fan_in), (fan_in, fan_out)), np.zeros(fan_out)]
+    moments = [(np.zeros_like(p), np.zeros_like(p)) for p in params]
+    step = 0
+    for _ in range(epochs):
+        order = rng.permutation(samples)
+        for start in range(0, samples, batch_size):
+            batch = order[start:start + batch_size]
+            activations = [x_all[batch]]
+            for index in range(0, len(params) - 2, 2):
+                activations.append(np.maximum(activations[-1] @ params[index] + params[index + 1], 0.0))
+            logits = activations[-1] @ params[-2] + params[-1]
+            logits -= logits.max(axis=1, keepdims=True)
+            output = np.exp(logits)
+            output /= output.sum(axis=1, keepdims=True)
+
+            delta = (output - targets[batch]) / len(batch)
+            gradients = [None] * len(params)
+            for index in range(len(params) - 2, -1, -2):
+                gradients[index] = activations[index // 2].T @ delta
+                gradients[index + 1] = delta.sum(axis=0)
+                if index:
+                    delta = (delta @ params[index].T) * (activations[index // 2] > 0)
+
+            step += 1
+            for param, gradient, (m, v) in zip(params, gradients, moments):
+                m *= 0.9
+                m += 0.1 * gradient
+                v *= 0.999
+                v += 0.001 * gradient ** 2
+                param -= learning_rate * (m / (1 - 0.9 ** step)) / (np.sqrt(v / (1 - 0.999 ** step)) + 1e-8)
+
+    layers = [(params[index], params[index + 1]) for index in range(0, len(params), 2)]
+    backend = MlpBackend(mean, scale, layers, 'mlp-training')
+    accuracy = float(np.mean(backend.probabilities(features).argmax(axis=1) == targets.argmax(axis=1)))
+    return layers, accuracy
+
+class ClassificationCache:
+    """Thread-safe bounded LRU cache of classifications keyed on noise mode and quantized reading triple"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bypassed = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def bypass(self, count):
+        """Count readings classified without a lookup"""
+        with self._lock:
+            self.bypassed += count
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'bypassed': self.bypassed,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+classification_cache = ClassificationCache(CLASSIFIER_CACHE_SIZE)
+
+model_registry = ModelRegistry(CLASSIFIER_BACKEND, MODEL_RELOAD_INTERVAL)
+model_registry.load()
+atexit.register(model_registry.stop)
+
+def classification_cache_enabled(noise=None, backend=None):
+    """The cache is only valid while classification is a pure function of the reading triple"""
+    backend = backend or model_registry.backend
+    return CLASSIFIER_CACHE_SIZE > 0 and not backend.uses_time and backend.is_deterministic(noise)
+
+def classify_cached(backend, signal_power, attenuation, distance, noise=None):
+    """
+    Classify readings through the cache, computing only misses. Only readings
+    that lie exactly on the CLASSIFIER_CACHE_QUANTUM grid are looked up, so a
+    key always stands for one exact reading and cached results never differ
+    from uncached ones; finer readings are classified directly.
+    """
+    mode = noise or CLASSIFIER_NOISE
+    scale = 1.0 / CLASSIFIER_CACHE_QUANTUM
+    values = np.stack([signal_power, attenuation, distance], axis=1)
+    grid = np.rint(values * scale)
+    on_grid = np.isfinite(grid).all(axis=1) & (grid / scale == values).all(axis=1)
+    keys = np.where(on_grid[:, None], grid, 0).astype(np.int64).tolist()
+
+    predictions = np.empty(len(values), dtype=object)
+    probabilities = np.empty((len(values), len(FAULT_TYPES)))
+    confidences = np.empty(len(values))
+    missing = []
+    for index, cacheable in enumerate(on_grid.tolist()):
+        entry = classification_cache.get((mode, *keys[index])) if cacheable else None
+        if entry is None:
+            missing.append(index)
+        else:
+            predictions[index], probabilities[index], confidences[index] = entry
+    classification_cache.bypass(len(values) - int(on_grid.sum()))
+
+    if missing:
+        new_predictions, new_probabilities, new_confidences = backend.classify(
+            signal_power[missing], attenuation[missing], distance[missing], None, noise)
+        predictions[missing] = new_predictions
+        probabilities[missing] = new_probabilities
+        confidences[missing] = new_confidences
+        for offset, index in enumerate(missing):
+            if on_grid[index]:
+                classification_cache.put((mode, *keys[index]), (
+                    new_predictions[offset], tuple(new_probabilities[offset].tolist()), new_confidences[offset]))
+
+    return predictions, probabilities, confidences
+
+def predict_fault_batch(signal_power, attenuation, distance, noise=None, timestamps=None):
+    """
+    Classify columns of readings with the configured backend, returning labels,
+    an (n, 4) probability matrix in FAULT_TYPES order and confidences.
+    `noise` overrides the configured CLASSIFIER_NOISE mode; `timestamps` (UTC,
+    default now) feed backends that use time features.
+    """
+    signal_power = np.asarray(signal_power, dtype=np.float64).ravel()
+    attenuation = np.asarray(attenuation, dtype=np.float64).ravel()
+    distance = np.asarray(distance, dtype=np.float64).ravel()
+
+    # One backend for the whole batch, even if a reload swaps it meanwhile
+    backend = model_registry.backend
+    if classification_cache_enabled(noise, backend):
+        return classify_cached(backend, signal_power, attenuation, distance, noise)
+    return backend.classify(signal_power, attenuation, distance, timestamps, noise)
+
+def predict_fault(signal_power, attenuation, distance, noise=None, timestamp=None):
+    """
+    Classify a single reading with the configured backend
+    (the threshold rules by default)
+    """
+    timestamps = None if timestamp is None else [timestamp]
+    predictions, probabilities, confidences = predict_fault_batch([signal_power], [attenuation], [distance], noise,
+                                                                  timestamps)
+    return predictions[0], dict(zip(FAULT_TYPES, probabilities[0].tolist())), float(confidences[0])
+
+# Re-scoring
+RESCORE_TARGETS = ('measurements', 'scores')
+
+def rescore_measurements(conn, target='measurements', noise='hashed', job=None, restart=False,
+                         chunk_size=RESCORE_CHUNK_SIZE, max_rows=None, progress=None):
+    """
+    Re-classify stored measurements in id order, one chunk per transaction.
+    target='measurements' rewrites fault_type/confidence where they changed;
+    target='scores' writes every result to measurement_scores under the classifier version.
+    The checkpoint commits with each chunk, so an interrupted job resumes where it stopped.
+    """
+    version = classifier_version(noise)
+    job = job or f'{target}:{version}'
+    if restart:
+        conn.execute('DELETE FROM rescore_checkpoints WHERE job = ?', (job,))
+        conn.commit()
+    checkpoint = conn.execute('SELECT last_id, rows FROM rescore_checkpoints WHERE job = ?', (job,)).fetchone()
+    last_id, previous_rows = (checkpoint['last_id'], checkpoint['rows']) if checkpoint else (0, 0)
+
+    processed = written = 0
+    started = time.perf_counter()
+    while max_rows is None or processed < max_rows:
+        rows = conn.execute('''
+        SELECT id, signal_power, attenuation, distance, fault_type, confidence, timestamp
+        FROM measurements
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+        ''', (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        ids, signal_power, attenuation, distance, fault_types, confidences, timestamps = zip(*rows)
+        ids = np.array(ids, dtype=np.int64)
+        predictions, _, new_confidences = predict_fault_batch(signal_power, attenuation, distance, noise, timestamps)
+
+        if target == 'measurements':
+            changed = (predictions != np.array(fault_types, dtype=object)) | (new_confidences != np.array(confidences))
+            sql = 'UPDATE measurements SET fault_type = ?, confidence = ? WHERE id = ?'
+            params = list(zip(predictions[changed].tolist(), new_confidences[changed].tolist(), ids[changed].tolist()))
+        else:
+            sql = '''
+            INSERT OR REPLACE INTO measurement_scores (version, measurement_id, fault_type, confidence)
+            VALUES (?, ?, ?, ?)
+            '''
+            params = list(zip(itertools.repeat(version), ids.tolist(), predictions.tolist(), new_confidences.tolist()))
+
+        last_id = int(ids[-1])
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(sql, params)
+            conn.execute('''
+            INSERT INTO rescore_checkpoints (job, version, last_id, rows, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (job) DO UPDATE SET
+                last_id = excluded.last_id, rows = excluded.rows, updated_at = excluded.updated_at
+            ''', (job, version, last_id, previous_rows + processed + len(rows)))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        processed += len(rows)
+        written += len(params)
+        if progress:
+            progress(processed, written, time.perf_counter() - started)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'job': job,
+        'version': version,
+        'target': target,
+        'last_id': last_id,
+        'processed': processed,
+        'written': written,
+        'total_processed': previous_rows + processed,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(processed / elapsed) if elapsed else None
+    }
+
+# Email notifications
+FAULT_RECOMMENDATIONS = {
+    "Fiber Break": [
+        "Immediately check for physical damage to the fiber",
+        "Verify connectivity at both ends of the fiber link",
+        "Prepare replacement fiber if necessary",
+        "Use OTDR to locate the exact break point",
+    ],
+    "High Loss": [
+        "Check for bends or stress points in the fiber",
+        "Inspect connectors for damage or contamination",
+        "Verify transmitter power levels",
+        "Consider cleaning or replacing connectors",
+    ],
+    "Splice Loss": [
+        "Inspect splice points for proper alignment",
+        "Check for contamination at splice locations",
+        "Consider re-splicing if loss is above acceptable threshold",
+        "Verify splice protection is properly installed",
+    ],
+    "Signal Drift": [
+        "Check transmitter output power for laser aging",
+        "Inspect connectors and patch panels along the link",
+        "Compare with neighbouring links to rule out a shared cause",
+    ],
+    "Attenuation Drift": [
+        "Look for gradual degradation such as new bends, stress or water ingress",
+        "Clean and re-seat connectors",
+        "Take an OTDR trace and compare it with the link's baseline",
+    ],
+}
+
+def build_alert_message(alerts, recipients):
+    """Build one email for a single alert, or a digest when several alerts share recipients"""
+    msg = MIMEMultipart()
+    msg['From'] = EMAIL_FROM
+    msg['To'] = ", ".join(recipients)
+
+    if len(alerts) == 1:
+        alert = alerts[0]
+        msg['Subject'] = f"{EMAIL_SUBJECT_PREFIX} {alert['fault_type']} Detected on {alert['device_name']}"
+        intro = "A potential issue has been detected in your fiber optic network."
+    else:
+        devices = {alert['device_id'] for alert in alerts}
+        msg['Subject'] = f"{EMAIL_SUBJECT_PREFIX} {len(alerts)} Faults Detected on {len(devices)} Devices"
+        intro = f"{len(alerts)} potential issues have been detected in your fiber optic network."
+
+    # Email body
+    body = f"""
+    <html>
+    <body>
+        <h2>Fiber Optic Fault Alert</h2>
+        <p>{intro}</p>
+    """
+
+    for alert in alerts:
+        body += f"""
+        <h3>Alert Details:</h3>
+        <ul>
+            <li><strong>Device:</strong> {alert['device_name']} ({alert['device_id']})</li>
+            <li><strong>Fault Type:</strong> <span style="color: red; font-weight: bold;">{alert['fault_type']}</span></li>
+            <li><strong>Confidence:</strong> {alert['confidence']:.1%}</li>
+            <li><strong>Time Detected:</strong> {alert['detected_at']}</li>
+        </ul>
+        """
+        if alert.get('incident'):
+            incident = alert['incident']
+            body += f"""
+        <h3>Location:</h3>
+        <ul>
+            <li><strong>Route:</strong> {incident['route_name']} ({incident['route_id']})</li>
+            <li><strong>Estimated Position:</strong> {incident['location_m']:.0f} m (&plusmn;{incident['spread_m'] / 2:.0f} m)</li>
+            <li><strong>Between Devices:</strong> {incident['segment_start_device'] or 'route start'} and {incident['segment_end_device'] or 'route end'}</li>
+            <li><strong>Devices Reporting:</strong> {len(incident['devices'])}</li>
+        </ul>
+        """
+        body += f"""
+        <h3>Measurements:</h3>
+        <ul>
+            <li><strong>Signal Power:</strong> {alert['signal_power']} dB</li>
+            <li><strong>Attenuation:</strong> {alert['attenuation']} dB/km</li>
+            <li><strong>Distance:</strong> {alert['distance']} m</li>
+        </ul>
+        """
+
+    # Add recommendations based on fault type
+    body += """
+        <h3>Recommended Actions:</h3>
+        <ul>
+    """
+    for fault_type in dict.fromkeys(alert['fault_type'] for alert in alerts):
+        for recommendation in FAULT_RECOMMENDATIONS.get(fault_type, []):
+            body += f"""
+            <li>{recommendation}</li>
+            """
+
+    body += """
+        </ul>
+
+        <p>Please investigate this issue promptly to prevent service disruption.</p>
+
+        <p style="color: gray; font-size: 0.8em;">This is an automated message from the Fiber Optic Fault Detection System.
+        Do not reply to this email.</p>
+    </body>
+    </html>
+    """
+
+    msg.attach(MIMEText(body, 'html'))
+    return msg
+
+class SmtpSession:
+    """Persistent SMTP connection that reconnects when the server drops it"""
+
+    def __init__(self):
+        self._server = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        server = smtplib.SMTP(EMAIL_SERVER, EMAIL_PORT, timeout=SMTP_TIMEOUT)
+        if EMAIL_USE_TLS:
+            server.starttls()
+        if EMAIL_USERNAME and EMAIL_PASSWORD:
+            server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
+        return server
+
+    def send(self, msg):
+        for attempt in range(2):
+            if self._server is None:
+                self._server = self._connect()
+            try:
+                self._server.send_message(msg)
+                self._last_used = time.monotonic()
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                # The server closed an idle session; reconnect once and retry
+                self.close()
+                if attempt:
+                    raise
+                logger.info(f"SMTP session lost ({e}), reconnecting")
+
+    def close_if_idle(self, idle_timeout):
+        if self._server is not None and time.monotonic() - self._last_used > idle_timeout:
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+def record_notifications(sent, failed):
+    """Write the bookkeeping for a dispatch round in one transaction"""
+    now = datetime.now().isoformat()
+    with db_connection() as conn:
+        conn.executemany('''
+        INSERT INTO notifications
+        (device_id, measurement_id, fault_type, recipients, status, error_message)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(alert['device_id'], alert['measurement_id'], alert['fault_type'], json.dumps(alert['recipients']),
+               'sent', None) for alert in sent] +
+             [(alert['device_id'], alert['measurement_id'], alert['fault_type'], json.dumps(alert['recipients']),
+               'failed', error_message) for alert, error_message in failed])
+
+        # Mark measurements as notified and update device last alert time
+        conn.executemany('UPDATE measurements SET notification_sent = 1 WHERE id = ?',
+                         [(alert['measurement_id'],) for alert in sent])
+        conn.executemany('UPDATE devices SET last_alert_sent = ? WHERE id = ?',
+                         [(now, device_id) for device_id in {alert['device_id'] for alert in sent}])
+        conn.commit()
+
+    recorded = len(sent) + len(failed)
+    event_broker.publish('stats', {'notification_count': recorded, 'recent_alerts': recorded})
+
+class NotificationDispatcher:
+    """
+    Bounded queue of fault alerts drained by a single worker thread that keeps
+    one SMTP session open and coalesces alerts for the same recipients into digests
+    """
+
+    def __init__(self, queue_size, coalesce_window, max_digest):
+        self.coalesce_window = coalesce_window
+        self.max_digest = max_digest
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._smtp = SmtpSession()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def enqueue(self, alert):
+        """Queue an alert without blocking; returns False when it was dropped"""
+        if not EMAIL_ENABLED:
+            logger.warning("Email notifications are disabled or not configured")
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(alert)
+            return True
+        except queue.Full:
+            logger.error(f"Notification queue full, dropping alert for device {alert['device_id']}")
+            return False
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopping.clear()
+                self._worker = threading.Thread(target=self._run, name='notification-dispatcher', daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        """Wait for an alert, then gather others that arrive within the coalescing window"""
+        try:
+            alerts = [self._queue.get(timeout=1.0)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.coalesce_window
+        while len(alerts) < self.max_digest:
+            remaining = deadline - time.monotonic()
+            try:
+                alerts.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return alerts
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            alerts = self._collect()
+            if not alerts:
+                self._smtp.close_if_idle(SMTP_IDLE_TIMEOUT)
+                continue
+            try:
+                self._deliver(alerts)
+            except Exception as e:
+                logger.error(f"Notification dispatch failed: {e}")
+            finally:
+                for _ in alerts:
+                    self._queue.task_done()
+        self._smtp.close()
+
+    def _deliver(self, alerts):
+        # Group alerts by recipient list so each group becomes one message
+        groups = OrderedDict()
+        for alert in alerts:
+            groups.setdefault(tuple(alert['recipients']), []).append(alert)
+
+        sent, failed = [], []
+        for recipients, group in groups.items():
+            try:
+                self._smtp.send(build_alert_message(group, list(recipients)))
+                sent.extend(group)
+                logger.info(f"Email notification sent for {len(group)} alert(s) to {', '.join(recipients)}")
+            except Exception as e:
+                logger.error(f"Failed to send email notification: {e}")
+                failed.extend((alert, str(e)) for alert in group)
+
+        try:
+            record_notifications(sent, failed)
+        except Exception as db_error:
+            logger.error(f"Failed to record notifications: {db_error}")
+
+    def flush(self, timeout=None):
+        """Stop accepting new work once the queue drains and wait for the worker"""
+        worker = self._worker
+        if worker is None or not worker.is_alive():
+            return
+        self._stopping.set()
+        worker.join(timeout)
+
+notification_dispatcher = NotificationDispatcher(
+    NOTIFICATION_QUEUE_SIZE, NOTIFICATION_COALESCE_WINDOW, NOTIFICATION_MAX_DIGEST)
+atexit.register(notification_dispatcher.flush, 10)
+
+# Write-behind ingestion
+INSERT_MEASUREMENTS_SQL = '''
+INSERT INTO measurements
+(device_id, timestamp, signal_power, attenuation, distance, fault_type, confidence)
+VALUES (?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?, ?, ?)
+'''
+
+class WriteBehindFull(Exception):
+    """The write-behind queue cannot take more readings right now"""
+
+class WriteBehindBuffer:
+    """
+    Bounded queue of classified readings drained by a single writer thread that
+    commits the readings of many requests in one transaction (group commit).
+    Each submission gets a Future that resolves to the id of its first row
+    once the transaction holding it has committed. A submission's after_insert
+    hook runs inside that transaction, right after its rows are inserted (see
+    store_measurements). When a group fails, its submissions are retried one
+    per transaction, so a hook can run more than once for the same rows.
+    """
+
+    def __init__(self, capacity, batch_size, flush_interval, synchronous):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.synchronous = synchronous
+        self._pending = deque()  # (rows, after_insert, future)
+        self._queued_rows = 0
+        self._cond = threading.Condition()
+        self._worker = None
+        self._stopping = False
+        self.commits = 0
+        self.rows_written = 0
+        self.rejected = 0
+
+    def submit(self, rows, after_insert=None):
+        """Queue rows for the writer; raises WriteBehindFull instead of blocking"""
+        future = Future()
+        with self._cond:
+            if self._stopping or self._queued_rows + len(rows) > self.capacity:
+                self.rejected += len(rows)
+                raise WriteBehindFull('Ingestion is shutting down, retry later' if self._stopping
+                                      else 'Ingestion queue is full, retry later')
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._worker.start()
+            self._pending.append((rows, after_insert, future))
+            self._queued_rows += len(rows)
+            self._cond.notify()
+        return future
+
+    def _take(self):
+        """Wait for readings, then let the group fill up until it is full or the flush interval passes"""
+        with self._cond:
+            while not self._pending:
+                if self._stopping:
+                    return None
+                self._cond.wait(1.0)
+            deadline = time.monotonic() + self.flush_interval
+            while self._queued_rows < self.batch_size and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            group, count = [], 0
+            while self._pending and (not group or count + len(self._pending[0][0]) <= self.batch_size):
+                rows, after_insert, future = self._pending.popleft()
+                group.append((rows, after_insert, future))
+                count += len(rows)
+            self._queued_rows -= count
+            return group
+
+    def _run(self):
+        # A dedicated connection, so the writer never waits on the request pool
+        conn = get_db_connection()
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        try:
+            while True:
+                group = self._take()
+                if group is None:
+                    break
+                self._write(conn, group)
+        finally:
+            conn.close()
+
+    def _write(self, conn, group):
+        first_ids, settlers = [], []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.cursor()
+            for rows, after_insert, _ in group:
+                cursor.executemany(INSERT_MEASUREMENTS_SQL, rows)
+                # Rows inserted inside one write transaction receive consecutive ids
+                first_ids.append(conn.execute('SELECT last_insert_rowid()').fetchone()[0] - len(rows) + 1)
+                if after_insert:
+                    settlers.append(after_insert(conn, first_ids[-1]))
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            settle_hooks(settlers, False)
+            if len(group) > 1:
+                # Retry one submission per transaction so a bad request cannot fail the others
+                for item in group:
+                    self._write(conn, [item])
+                return
+            logger.error(f"Write-behind commit failed: {e}")
+            group[0][2].set_exception(e)
+            return
+
+        settle_hooks(settlers, True)
+        self.commits += 1
+        self.rows_written += sum(len(rows) for rows, _, _ in group)
+        for (_, _, future), first_id in zip(group, first_ids):
+            future.set_result(first_id)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queued': self._queued_rows,
+                'capacity': self.capacity,
+                'commits': self.commits,
+                'rows_written': self.rows_written,
+                'rows_per_commit': round(self.rows_written / self.commits, 1) if self.commits else 0.0,
+                'rejected': self.rejected
+            }
+
+    def flush(self, timeout=None):
+        """Refuse new readings, write everything already accepted, and wait for the writer"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            worker = self._worker
+        if worker is not None and worker.is_alive():
+            worker.join(timeout)
+
+write_behind = WriteBehindBuffer(
+    WRITE_BEHIND_QUEUE_SIZE, WRITE_BEHIND_BATCH_SIZE, WRITE_BEHIND_FLUSH_MS / 1000, WRITE_BEHIND_SYNCHRONOUS)
+atexit.register(write_behind.flush, 30)
+
+def settle_hooks(settlers, committed):
+    """Tell after_insert hooks whether the transaction they wrote in committed"""
+    for settle in settlers:
+        if settle is not None:
+            settle(committed)
+
+def store_measurements(rows, after_insert=None):
+    """Insert classified rows and return the id of the first one; the ids are consecutive
+
+    `after_insert(conn, first_id)` runs in the same transaction, so its writes commit with the rows.
+    It writes only through conn and must be safe to run again, since write-behind retries a failed
+    group one submission at a time. It may return a `settle(committed)` callable, which is called
+    once the transaction commits or rolls back, to keep or undo in-memory state the hook changed;
+    a hook that raises undoes its own changes first.
+    """
+    if WRITE_BEHIND:
+        # Stamp readings on arrival rather than when their group commits
+        now = utc_timestamp()
+        rows = [(device_id, timestamp or now, *values) for device_id, timestamp, *values in rows]
+        return write_behind.submit(rows, after_insert).result()
+
+    conn = get_db()
+    settlers = []
+    try:
+        cursor = conn.cursor()
+        cursor.executemany(INSERT_MEASUREMENTS_SQL, rows)
+        first_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0] - len(rows) + 1
+        if after_insert:
+            settlers.append(after_insert(conn, first_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        settle_hooks(settlers, False)
+        raise
+    settle_hooks(settlers, True)
+    return first_id
+
+def ingestion_backpressure(error):
+    """503 telling the device when to retry"""
+    response = jsonify({'error': str(error)})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(WRITE_BEHIND_RETRY_AFTER)
+    return response
+
+# Device registry
+class DeviceRegistry:
+    """In-process cache of device records keyed by API key and by device id"""
+
+    COLUMNS = 'id, name, api_key, alert_threshold, alert_email, alert_debounce'
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._by_key = {}  # api_key -> (expires_at, device)
+        self._by_id = {}  # device_id -> (expires_at, device)
+        self._lock = threading.Lock()
+
+    def _cached(self, index, value):
+        with self._lock:
+            entry = index.get(value)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def _load(self, column, value):
+        with db_connection() as conn:
+            row = conn.execute(f'SELECT {self.COLUMNS} FROM devices WHERE {column} = ?', (value,)).fetchone()
+        if not row:
+            return None
+        device = dict(row)
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._by_key[device['api_key']] = (expires_at, device)
+            self._by_id[device['id']] = (expires_at, device)
+        return device
+
+    def get_by_api_key(self, api_key):
+        return self._cached(self._by_key, api_key) or self._load('api_key', api_key)
+
+    def get_by_id(self, device_id):
+        return self._cached(self._by_id, device_id) or self._load('id', device_id)
+
+    def invalidate(self, device_id):
+        """Drop a device after it was created or modified"""
+        with self._lock:
+            entry = self._by_id.pop(device_id, None)
+            if entry:
+                self._by_key.pop(entry[1]['api_key'], None)
+
+    def clear(self):
+        with self._lock:
+            self._by_key.clear()
+            self._by_id.clear()
+
+device_registry = DeviceRegistry(DEVICE_CACHE_TTL)
+
+# Alert cooldowns
+def notification_cooldown(fault_type):
+    """Cooldown period in seconds for a fault type"""
+    return NOTIFICATION_COOLDOWNS.get(fault_type, NOTIFICATION_COOLDOWN)
+
+class CooldownStore(ABC):
+    """Records when each device last alerted for each fault type"""
+
+    @abstractmethod
+    def try_acquire(self, device_id, fault_type, now, cooldown):
+        """Atomically claim the right to alert; False while the previous alert is within `cooldown`"""
+
+    @abstractmethod
+    def release(self, device_id, fault_type, claimed_at):
+        """Give back a claim made at `claimed_at` whose alert was never sent, unless it was claimed again since"""
+
+    @abstractmethod
+    def reset(self, device_id):
+        """Forget every cooldown of a device, so its next fault of any type alerts"""
+
+class MemoryCooldownStore(CooldownStore):
+    """Single-process store; expired entries are pruned so it stays bounded"""
+
+    PRUNE_INTERVAL = 300  # seconds
+
+    def __init__(self):
+        self._last_alert = {}  # (device_id, fault_type) -> timestamp
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def try_acquire(self, device_id, fault_type, now, cooldown):
+        with self._lock:
+            key = (device_id, fault_type)
+            last = self._last_alert.get(key)
+            if last is not None and now - last < cooldown:
+                return False
+            self._last_alert[key] = now
+            if now >= self._next_prune:
+                self._prune(now)
+            return True
+
+    def release(self, device_id, fault_type, claimed_at):
+        with self._lock:
+            if self._last_alert.get((device_id, fault_type)) == claimed_at:
+                del self._last_alert[(device_id, fault_type)]
+
+    def _prune(self, now):
+        longest = max([NOTIFICATION_COOLDOWN] + list(NOTIFICATION_COOLDOWNS.values()))
+        self._last_alert = {key: last for key, last in self._last_alert.items() if now - last < longest}
+        self._next_prune = now + self.PRUNE_INTERVAL
+
+    def reset(self, device_id):
+        with self._lock:
+            self._last_alert = {key: last for key, last in self._last_alert.items() if key[0] != device_id}
+
+class SqliteCooldownStore(CooldownStore):
+    """Store shared by every worker process through the alert_cooldowns table"""
+
+    def try_acquire(self, device_id, fault_type, now, cooldown):
+        # Compare-and-set: only one writer can move last_alert_sent forward past the cooldown
+        with db_connection() as conn:
+            cursor = conn.execute('''
+            INSERT INTO alert_cooldowns (device_id, fault_type, last_alert_sent)
+            VALUES (?, ?, ?)
+            ON CONFLICT (device_id, fault_type) DO UPDATE SET last_alert_sent = excluded.last_alert_sent
+            WHERE alert_cooldowns.last_alert_sent <= ?
+            ''', (device_id, fault_type, now, now - cooldown))
+            acquired = cursor.rowcount == 1
+            conn.commit()
+        return acquired
+
+    def release(self, device_id, fault_type, claimed_at):
+        # The claim only replaced an expired timestamp, so removing it restores the same state
+        with db_connection() as conn:
+            conn.execute('DELETE FROM alert_cooldowns WHERE device_id = ? AND fault_type = ? AND last_alert_sent = ?',
+                         (device_id, fault_type, claimed_at))
+            conn.commit()
+
+    def reset(self, device_id):
+        with db_connection() as conn:
+            conn.execute('DELETE FROM alert_cooldowns WHERE device_id = ?', (device_id,))
+            conn.commit()
+
+if COOLDOWN_STORE == 'memory':
+    cooldown_store = MemoryCooldownStore()
+else:
+    cooldown_store = SqliteCooldownStore()
+
+# Check if notification should be sent
+def should_send_notification(device_id, fault_type, confidence, now=None):
+    """Determine if a notification should be sent based on rules and cooldown period, claiming the cooldown at `now`"""
+    # Don't notify for "No Fault"
+    if fault_type == "No Fault":
+        return False
+    
+    # Get device alert threshold
+    device = device_registry.get_by_id(device_id)
+    if not device:
+        return False
+    
+    alert_threshold = device['alert_threshold']
+
+    # Check if confidence exceeds threshold
+    if confidence < alert_threshold:
+        logger.info(f"Notification for device {device_id} skipped (below threshold: {confidence:.2f} < {alert_threshold:.2f})")
+        return False
+
+    # Require N of the device's last M readings to show the fault
+    votes, needed, window = alert_debouncer.votes(device, fault_type)
+    if votes < needed:
+        logger.info(f"Notification for device {device_id} skipped (debouncing: {votes} of last {window} readings, need {needed})")
+        return False
+
+    # A lesser fault is noise while a more severe one is still being handled; escalations have their own cooldown
+    now = time.time() if now is None else now
+    outranked_by = alert_debouncer.outranked_by(device_id, fault_type, now)
+    if outranked_by:
+        logger.info(f"Notification for device {device_id} skipped ({outranked_by} alert still active)")
+        return False
+
+    # Check cooldown period, claiming it so concurrent workers don't alert twice
+    if not cooldown_store.try_acquire(device_id, fault_type, now, notification_cooldown(fault_type)):
+        logger.info(f"Notification for device {device_id} skipped (cooldown period)")
+        return False
+
+    return True
+
+def notify_fault(device_id, device_name, fault_type, confidence, signal_power, attenuation, distance, measurement_id):
+    """Send a device's fault notification if should_send_notification allows it; returns True if it was queued"""
+    if not EMAIL_ENABLED:
+        # Nothing could be sent, so no cooldown is claimed
+        return False
+    now = time.time()
+    if not should_send_notification(device_id, fault_type, confidence, now):
+        return False
+    if not dispatch_notification(device_id, device_name, fault_type, confidence, signal_power, attenuation, distance,
+                                 measurement_id):
+        # Dropped (no recipients or a full queue): the next reading may alert instead
+        cooldown_store.release(device_id, fault_type, now)
+        return False
+    alert_debouncer.record_alert(device_id, fault_type, now)
+    return True
+
+def dispatch_notification(device_id, device_name, fault_type, confidence, signal_power, attenuation, distance, measurement_id,
+                          incident=None):
+    """Resolve recipients for a device and send the fault notification in the background"""
+    # Get notification recipients
+    device = device_registry.get_by_id(device_id)
+    device_email = device['alert_email'] if device and device['alert_email'] else None
+
+    # Combine global recipients with device-specific recipient
+    recipients = EMAIL_TO.copy()
+    if device_email and device_email not in recipients:
+        recipients.append(device_email)
+
+    if not recipients:
+        return False
+
+    # Hand the alert to the background dispatcher to avoid blocking
+    return notification_dispatcher.enqueue({
+        'device_id': device_id,
+        'device_name': device_name,
+        'fault_type': fault_type,
+        'confidence': confidence,
+        'signal_power': signal_power,
+        'attenuation': attenuation,
+        'distance': distance,
+        'measurement_id': measurement_id,
+        'recipients': recipients,
+        'incident': incident,
+        'detected_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    })
+
+# Anomaly detection
+ANOMALY_METRICS = (  # (metric, smallest standard deviation assumed, adverse direction, drift alert)
+    ('signal_power', 0.5, -1, 'Signal Drift'),
+    ('attenuation', 0.05, 1, 'Attenuation Drift'),
+)
+
+class DeviceSlotTable(ABC):
+    """Maps device ids to rows of fixed-size NumPy arrays, reusing the least recently seen row when full"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._slots = OrderedDict()  # device_id -> slot, least recently seen first
+        self._lock = threading.Lock()
+
+    def _slot(self, device_id):
+        slot = self._slots.get(device_id)
+        if slot is not None:
+            self._slots.move_to_end(device_id)
+            return slot
+        if len(self._slots) < self.capacity:
+            slot = len(self._slots)
+        else:
+            _, slot = self._slots.popitem(last=False)
+        self._slots[device_id] = slot
+        self._reset(slot)
+        return slot
+
+    @abstractmethod
+    def _reset(self, slot):
+        """Clear a slot's state before it is handed to another device"""
+
+class AnomalyDetector(DeviceSlotTable):
+    """
+    Per-device online baseline of signal power and attenuation: an EWMA mean
+    and variance, a two-sided CUSUM for slow drift, and a count of consecutive
+    outliers for telling isolated spikes from real changes. State lives in
+    fixed-size NumPy slot arrays, so memory is bounded by `capacity` and each
+    reading costs O(1). The state is per process.
+    """
+
+    MEAN, VAR, CUSUM_UP, CUSUM_DOWN = range(4)
+
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self._state = np.zeros((capacity, len(ANOMALY_METRICS), 4))
+        self._counts = np.zeros(capacity, dtype=np.int32)
+        self._outliers = np.zeros(capacity, dtype=np.int16)
+        self._rebuild = None
+
+    def _reset(self, slot):
+        self._state[slot] = 0
+        self._counts[slot] = 0
+        self._outliers[slot] = 0
+
+    def update(self, device_id, signal_power, attenuation):
+        """Fold one reading into the device's state and report spikes and drift"""
+        with self._lock:
+            return self._update(self._slot(device_id), (signal_power, attenuation))
+
+    def _update(self, slot, values):
+        count = int(self._counts[slot])
+        state = self._state[slot].tolist()
+        scores, drift = {}, []
+        outlier = False
+        for (metric, min_std, direction, alert), value, row in zip(ANOMALY_METRICS, values, state):
+            mean, var, up, down = row
+            if count == 0:
+                row[self.MEAN] = value
+                continue
+            z = (value - mean) / max(var ** 0.5, min_std)
+            scores[metric] = round(z, 2)
+            outlier = outlier or abs(z) > ANOMALY_SPIKE_Z
+            if count >= ANOMALY_WARMUP:
+                # Clip so one wild reading cannot trip the CUSUM on its own
+                clipped = max(-ANOMALY_SPIKE_Z, min(ANOMALY_SPIKE_Z, z))
+                up = max(0.0, up + clipped - ANOMALY_CUSUM_SLACK)
+                down = max(0.0, down - clipped - ANOMALY_CUSUM_SLACK)
+                if max(up, down) > ANOMALY_CUSUM_LIMIT:
+                    if (up if direction > 0 else down) > ANOMALY_CUSUM_LIMIT:
+                        drift.append(alert)
+                    # Accept the new level as the baseline and start watching again
+                    row[:] = [value, var, 0.0, 0.0]
+                    continue
+            row[self.CUSUM_UP] = up
+            row[self.CUSUM_DOWN] = down
+            if abs(z) <= ANOMALY_SPIKE_Z:
+                # Outliers stay out of the baseline
+                diff = value - mean
+                row[self.MEAN] = mean + ANOMALY_ALPHA * diff
+                row[self.VAR] = (1 - ANOMALY_ALPHA) * (var + ANOMALY_ALPHA * diff * diff)
+
+        outliers = int(self._outliers[slot]) + 1 if outlier else 0
+        self._state[slot] = state
+        self._counts[slot] = min(count + 1, np.iinfo(np.int32).max)
+        self._outliers[slot] = min(outliers, np.iinfo(np.int16).max)
+        ready = count >= ANOMALY_WARMUP
+        return {
+            'ready': ready,
+            'spike': ready and 0 < outliers < ANOMALY_SPIKE_CONFIRM,
+            'drift': drift,
+            'scores': scores
+        }
+
+    def state(self, device_id):
+        """Current baseline of a device, or None if it has no state"""
+        with self._lock:
+            slot = self._slots.get(device_id)
+            if slot is None:
+                return None
+            return {
+                'readings': int(self._counts[slot]),
+                'consecutive_outliers': int(self._outliers[slot]),
+                **{metric: {
+                    'mean': float(self._state[slot, index, self.MEAN]),
+                    'std': float(self._state[slot, index, self.VAR] ** 0.5),
+                    'cusum_up': float(self._state[slot, index, self.CUSUM_UP]),
+                    'cusum_down': float(self._state[slot, index, self.CUSUM_DOWN])
+                } for index, (metric, *_) in enumerate(ANOMALY_METRICS)}
+            }
+
+    def rebuild(self, conn, readings=ANOMALY_REBUILD_READINGS):
+        """Replay each recently active device's latest readings; devices already seen live are skipped"""
+        devices = [row[0] for row in conn.execute('''
+            SELECT device_id FROM stats_hourly
+            WHERE measurement_count > 0
+            GROUP BY device_id
+            ORDER BY MAX(hour) DESC
+            LIMIT ?
+            ''', (self.capacity,))]
+        rebuilt = 0
+        # Least recently active first, so the LRU order matches reality
+        for device_id in reversed(devices):
+            rows = conn.execute('''
+                SELECT signal_power, attenuation FROM measurements
+                WHERE device_id = ?
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ?
+                ''', (device_id, readings)).fetchall()
+            with self._lock:
+                if device_id in self._slots:
+                    continue
+                slot = self._slot(device_id)
+                for signal_power, attenuation in reversed(rows):
+                    self._update(slot, (signal_power, attenuation))
+            rebuilt += 1
+        return rebuilt
+
+    def start_rebuild(self):
+        """Rebuild from the database once, in the background"""
+        if self._rebuild is not None or not ANOMALY_DETECTION:
+            return
+        with self._lock:
+            if self._rebuild is not None:
+                return
+            self._rebuild = threading.Thread(target=self._run_rebuild, name='anomaly-rebuild', daemon=True)
+            self._rebuild.start()
+
+    def _run_rebuild(self):
+        started = time.monotonic()
+        try:
+            with db_connection() as conn:
+                rebuilt = self.rebuild(conn)
+            logger.info(f"Anomaly state rebuilt for {rebuilt} devices in {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            logger.error(f"Anomaly state rebuild failed: {str(e)}")
+
+anomaly_detector = AnomalyDetector(ANOMALY_MAX_DEVICES)
+
+def detect_anomaly(device_id, signal_power, attenuation):
+    """Update the device's online state; None when anomaly detection is disabled"""
+    if not ANOMALY_DETECTION:
+        return None
+    return anomaly_detector.update(device_id, signal_power, attenuation)
+
+def dispatch_drift_alerts(device_id, device_name, drift, signal_power, attenuation, distance, measurement_id):
+    """Alert on drift the classifier cannot see in a single reading; returns True if any alert was queued"""
+    sent = False
+    for fault_type in dict.fromkeys(drift):
+        # A crossed CUSUM limit is a decision, not a probability
+        sent = notify_fault(device_id, device_name, fault_type, 1.0,
+                            signal_power, attenuation, distance, measurement_id) or sent
+    return sent
+
+# Alert debouncing
+FAULT_SEVERITY = {'No Fault': 0, 'Splice Loss': 1, 'High Loss': 2, 'Fiber Break': 3}
+
+def parse_alert_debounce(value):
+    """Validate an N-of-M rule set (JSON text or dict) and return it as {fault type or 'default': (N, M)}"""
+    rules = json.loads(value) if isinstance(value, str) else value
+    if not isinstance(rules, dict):
+        raise ValueError('Alert debounce must be a JSON object')
+    parsed = {}
+    for fault_type, rule in rules.items():
+        if fault_type == 'No Fault' or fault_type not in ('default', *FAULT_SEVERITY):
+            raise ValueError(f'Unknown fault type in alert debounce: {fault_type}')
+        if (not isinstance(rule, (list, tuple)) or len(rule) != 2
+                or not all(isinstance(part, int) and not isinstance(part, bool) for part in rule)
+                or not 1 <= rule[0] <= rule[1] <= ALERT_DEBOUNCE_MAX_WINDOW):
+            raise ValueError(f'Alert debounce for {fault_type} must be [N, M] with 1 <= N <= M <= '
+                             f'{ALERT_DEBOUNCE_MAX_WINDOW}')
+        parsed[fault_type] = tuple(rule)
+    return parsed
+
+DEFAULT_ALERT_DEBOUNCE = parse_alert_debounce(ALERT_DEBOUNCE)
+
+@lru_cache(maxsize=1024)
+def debounce_rules(value):
+    """(N, M) per FAULT_TYPES index for a device's alert_debounce column, layered over the defaults"""
+    rules = dict(DEFAULT_ALERT_DEBOUNCE)
+    if value:
+        try:
+            rules.update(parse_alert_debounce(value))
+        except ValueError as e:
+            logger.warning(f"Ignoring invalid alert_debounce {value!r}: {str(e)}")
+    fallback = rules.get('default', (1, 1))
+    return tuple(rules.get(fault_type, fallback) for fault_type in FAULT_TYPES)
+
+def held_back_as_spike(device, fault_type, anomaly):
+    """
+    Whether an alert for a fault seen on an isolated spike waits for the next
+    reading. Fault types the device alerts on after a single reading (1-of-1,
+    the default) are never held back.
+    """
+    if fault_type not in FAULT_TYPES or fault_type == 'No Fault' or not (anomaly and anomaly['spike']):
+        return False
+    needed, _ = debounce_rules(device.get('alert_debounce'))[FAULT_TYPES.index(fault_type)]
+    return needed > 1
+
+class AlertDebouncer(DeviceSlotTable):
+    """
+    Per-device ring buffer of the last ALERT_DEBOUNCE_MAX_WINDOW classifications
+    (a FAULT_TYPES index, or -1 below the device's alert threshold) plus the time
+    each fault type last alerted. Both live in NumPy slot arrays, so checks run
+    in memory with no database round trip. The state is per process, so N-of-M
+    rules are only exact when one worker process receives all of a device's
+    readings; with several workers each one votes on the readings it was sent.
+    Run a single worker when devices override the 1-of-1 default.
+    """
+
+    def __init__(self, capacity, window):
+        super().__init__(capacity)
+        self.window = window
+        self._ring = np.full((capacity, window), -1, dtype=np.int8)
+        self._position = np.zeros(capacity, dtype=np.int64)
+        self._alerted = np.zeros((capacity, len(FAULT_TYPES)))
+
+    def _reset(self, slot):
+        self._ring[slot] = -1
+        self._position[slot] = 0
+        self._alerted[slot] = 0
+
+    def observe(self, device, fault_type, confidence):
+        """Record one classified reading of a device (a registry record)"""
+        code = FAULT_TYPES.index(fault_type) if confidence >= device['alert_threshold'] else -1
+        with self._lock:
+            slot = self._slot(device['id'])
+            self._ring[slot, self._position[slot] % self.window] = code
+            self._position[slot] += 1
+
+    def votes(self, device, fault_type):
+        """(readings showing the fault, N, M) over the device's last M readings"""
+        if fault_type not in FAULT_TYPES:
+            # Drift and other derived alerts are decisions already
+            return 1, 1, 1
+        code = FAULT_TYPES.index(fault_type)
+        needed, window = debounce_rules(device.get('alert_debounce'))[code]
+        with self._lock:
+            slot = self._slots.get(device['id'])
+            if slot is None:
+                return 0, needed, window
+            recent = (self._position[slot] - 1 - np.arange(window)) % self.window
+            return int(np.count_nonzero(self._ring[slot, recent] == code)), needed, window
+
+    def outranked_by(self, device_id, fault_type, now):
+        """A more severe fault type alerted for the device and still within its cooldown, if any"""
+        severity = FAULT_SEVERITY.get(fault_type)
+        if severity is None:
+            return None
+        with self._lock:
+            slot = self._slots.get(device_id)
+            if slot is None:
+                return None
+            alerted = self._alerted[slot].tolist()
+        for code, other in enumerate(FAULT_TYPES):
+            if FAULT_SEVERITY[other] > severity and now - alerted[code] < notification_cooldown(other):
+                return other
+        return None
+
+    def record_alert(self, device_id, fault_type, now):
+        if fault_type in FAULT_TYPES:
+            with self._lock:
+                self._alerted[self._slot(device_id), FAULT_TYPES.index(fault_type)] = now
+
+alert_debouncer = AlertDebouncer(ALERT_STATE_MAX_DEVICES, ALERT_DEBOUNCE_MAX_WINDOW)
+
+# Route correlation
+class RouteCorrelator:
+    """
+    Locates faults by correlating reports from several devices on the same
+    fiber route. A device at `position_m` looking in `direction` that sees a
+    fault `distance` metres away places it at position + direction * distance.
+    Recent estimates are kept per route in a list sorted by location, so
+    finding the reports near a new one is a bisect plus the matches. When at
+    least `min_devices` devices agree, their estimates form one incident.
+    Later reports of the same fault update that incident instead of opening
+    new ones.
+    """
+
+    def __init__(self, window, radius, min_devices, ttl):
+        self.window = window
+        self.radius = radius
+        self.min_devices = min_devices
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._members = {}  # device_id -> (route_id, position_m, direction)
+        self._routes = {}  # route_id -> {'name', 'length_m', 'positions', 'devices'} sorted by position
+        self._estimates = {}  # route_id -> sorted [(location_m, seq, device_id, reported_at, fault_type)]
+        self._expiry = {}  # route_id -> deque of estimate keys in arrival order
+        self._incidents = {}  # route_id -> sorted [(location_m, seq, incident)]
+        self._swept = {}  # route_id -> when stale incidents were last dropped
+        self._seq = itertools.count()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _load(self, conn):
+        """Reload the routes through conn once the cached copy is older than the TTL, outside the lock"""
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        routes = {row['id']: {'name': row['name'], 'length_m': row['length_m'], 'positions': [], 'devices': []}
+                  for row in conn.execute('SELECT id, name, length_m FROM routes')}
+        members = {}
+        for row in conn.execute('SELECT device_id, route_id, position_m, direction FROM route_devices '
+                                'ORDER BY route_id, position_m'):
+            routes[row['route_id']]['positions'].append(row['position_m'])
+            routes[row['route_id']]['devices'].append(row['device_id'])
+            members[row['device_id']] = (row['route_id'], row['position_m'], row['direction'])
+        with self._lock:
+            self._routes, self._members = routes, members
+            self._loaded_at = time.monotonic()
+
+    def locate(self, conn, device_id, distance):
+        """(route_id, position along the route) of a fault the device sees `distance` metres away"""
+        self._load(conn)
+        with self._lock:
+            return self._locate(device_id, distance)
+
+    def _locate(self, device_id, distance):
+        member = self._members.get(device_id)
+        if member is None:
+            return None
+        route_id, position, direction = member
+        return route_id, min(max(position + direction * distance, 0.0), self._routes[route_id]['length_m'])
+
+    def segment(self, route_id, location):
+        """Devices immediately before and after a route position"""
+        route = self._routes[route_id]
+        index = bisect.bisect_right(route['positions'], location)
+        return (route['devices'][index - 1] if index > 0 else None,
+                route['devices'][index] if index < len(route['devices']) else None)
+
+    def _expire(self, route_id, now):
+        estimates, expiry = self._estimates[route_id], self._expiry[route_id]
+        while expiry and expiry[0][3] < now - self.window:
+            key = expiry.popleft()
+            del estimates[bisect.bisect_left(estimates, key)]
+        # Incidents are matched by location, so stale ones only need dropping once per window
+        if now - self._swept.get(route_id, 0) > self.window:
+            self._incidents[route_id] = [entry for entry in self._incidents.get(route_id, [])
+                                         if entry[2]['updated'] >= now - self.window]
+            self._swept[route_id] = now
+
+    def observe(self, conn, device_id, fault_type, distance, now=None):
+        """
+        Record a fault report; returns (incident, created) once enough devices
+        agree on its location, otherwise None. Incidents are not yet persisted.
+        """
+        now = time.time() if now is None else now
+        self._load(conn)
+        with self._lock:
+            located = self._locate(device_id, distance)
+            if located is None:
+                return None
+            route_id, location = located
+            estimates = self._estimates.setdefault(route_id, [])
+            self._expiry.setdefault(route_id, deque())
+            self._expire(route_id, now)
+
+            key = (location, next(self._seq), device_id, now, fault_type)
+            bisect.insort(estimates, key)
+            self._expiry[route_id].append(key)
+
+            # Reports within the radius, keeping each device's latest estimate
+            lo = bisect.bisect_left(estimates, (location - self.radius,))
+            hi = bisect.bisect_right(estimates, (location + self.radius, float('inf')))
+            latest = {}
+            for estimate in estimates[lo:hi]:
+                if estimate[2] not in latest or estimate[3] > latest[estimate[2]][3]:
+                    latest[estimate[2]] = estimate
+            if len(latest) < self.min_devices:
+                return None
+
+            locations = sorted(estimate[0] for estimate in latest.values())
+            cluster = {
+                'route_id': route_id,
+                'route_name': self._routes[route_id]['name'],
+                'fault_type': max((estimate[4] for estimate in latest.values()),
+                                  key=lambda fault: FAULT_SEVERITY.get(fault, 0)),
+                'location_m': (locations[(len(locations) - 1) // 2] + locations[len(locations) // 2]) / 2,
+                'spread_m': locations[-1] - locations[0],
+                'devices': sorted(latest)
+            }
+            cluster['segment_start_device'], cluster['segment_end_device'] = self.segment(route_id, cluster['location_m'])
+
+            incidents = self._incidents[route_id]
+            lo = bisect.bisect_left(incidents, (cluster['location_m'] - self.radius,))
+            hi = bisect.bisect_right(incidents, (cluster['location_m'] + self.radius, float('inf')))
+            for index in range(lo, hi):
+                _, seq, incident = incidents[index]
+                if incident['updated'] < now - self.window:
+                    continue
+                cluster['devices'] = sorted(set(incident['devices']) | set(cluster['devices']))
+                if FAULT_SEVERITY.get(incident['fault_type'], 0) > FAULT_SEVERITY.get(cluster['fault_type'], 0):
+                    cluster['fault_type'] = incident['fault_type']
+                incident.update(cluster, updated=now)
+                # Re-file it under its refined location
+                del incidents[index]
+                bisect.insort(incidents, (incident['location_m'], seq, incident))
+                return incident, False
+            incident = dict(cluster, id=None, updated=now)
+            bisect.insort(incidents, (incident['location_m'], next(self._seq), incident))
+            return incident, True
+
+    def save(self, conn, incident, measurement_id):
+        """Write a new or updated incident through conn, without committing, and return its id"""
+        values = (incident['fault_type'], incident['location_m'], incident['spread_m'],
+                  incident['segment_start_device'], incident['segment_end_device'], json.dumps(incident['devices']))
+        # An id from a transaction that was rolled back matches no row, so the incident is inserted again
+        if incident['id'] is None or conn.execute('''
+        UPDATE route_incidents SET fault_type = ?, location_m = ?, spread_m = ?, segment_start_device = ?,
+            segment_end_device = ?, devices = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+        ''', values + (incident['id'],)).rowcount == 0:
+            incident['id'] = conn.execute('''
+            INSERT INTO route_incidents (fault_type, location_m, spread_m, segment_start_device,
+                                         segment_end_device, devices, route_id, measurement_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', values + (incident['route_id'], measurement_id)).lastrowid
+        return incident['id']
+
+route_correlator = RouteCorrelator(ROUTE_CORRELATION_WINDOW, ROUTE_CLUSTER_RADIUS, ROUTE_MIN_DEVICES, ROUTE_CACHE_TTL)
+
+def correlate_fault(conn, device, fault_type, confidence, distance, measurement_id):
+    """
+    Feed a fault reading to the route correlator and write the incident it
+    belongs to through conn. Returns (incident, created), or None if the
+    reading is not (yet) part of one.
+    """
+    if fault_type == 'No Fault' or confidence < device['alert_threshold']:
+        return None
+    correlation = route_correlator.observe(conn, device['id'], fault_type, distance)
+    if correlation is None:
+        return None
+    incident, created = correlation
+    # A new incident whose insert was rolled back is still new
+    created = created or incident['id'] is None
+    route_correlator.save(conn, incident, measurement_id)
+    return incident, created
+
+def alert_route_incident(device, incident, confidence, signal_power, attenuation, distance, measurement_id):
+    """A new route incident sends one consolidated alert in place of the devices' own; returns True if it was queued"""
+    logger.info(f"Route incident {incident['id']} on {incident['route_id']} at {incident['location_m']:.0f} m "
+                f"from {len(incident['devices'])} devices")
+    # Several devices agreeing is the confirmation, so only the route's cooldown applies
+    key, now = f"route:{incident['route_id']}", time.time()
+    if not EMAIL_ENABLED or not cooldown_store.try_acquire(key, incident['fault_type'], now,
+                                                           notification_cooldown(incident['fault_type'])):
+        return False
+    if not dispatch_notification(device['id'], device['name'], incident['fault_type'], confidence,
+                                 signal_power, attenuation, distance, measurement_id, incident=dict(incident)):
+        cooldown_store.release(key, incident['fault_type'], now)
+        return False
+    return True
+
+# Incidents
+INCIDENT_UPDATE_SQL = '''
+UPDATE incidents SET
+    updated_at = ?,
+    last_measurement_id = ?,
+    measurement_count = measurement_count + 1,
+    max_confidence = MAX(max_confidence, ?),
+    min_signal_power = MIN(min_signal_power, ?),
+    max_attenuation = MAX(max_attenuation, ?)
+WHERE id = ? AND status = 'open'
+'''
+
+INCIDENT_UPSERT_SQL = '''
+INSERT INTO incidents (device_id, fault_type, opened_at, updated_at, first_measurement_id, last_measurement_id,
+                       max_confidence, min_signal_power, max_attenuation)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (device_id, fault_type) WHERE status = 'open' DO UPDATE SET
+    updated_at = excluded.updated_at,
+    last_measurement_id = excluded.last_measurement_id,
+    measurement_count = measurement_count + 1,
+    max_confidence = MAX(max_confidence, excluded.max_confidence),
+    min_signal_power = MIN(min_signal_power, excluded.min_signal_power),
+    max_attenuation = MAX(max_attenuation, excluded.max_attenuation)
+'''
+
+INCIDENT_RESOLVE_SQL = '''
+UPDATE incidents SET status = 'resolved', resolved_at = ?, updated_at = ?, resolution = ?
+WHERE id = ? AND status = 'open'
+'''
+
+class IncidentTracker:
+    """
+    Groups consecutive faulty readings of a device into one incident per fault
+    type. Each faulty reading updates the device's open incident by id, or
+    opens one with an upsert that the partial unique index keeps to a single
+    open row even across processes.
+    An in-memory index of open incidents counts the readings since each was
+    last seen, so healthy readings only touch the database when they resolve
+    something. It is loaded from the incidents table on first use. The lock
+    only guards the index: writes go through the caller's connection, so they
+    commit with the readings that caused them. The index is updated as the
+    readings are decided, ahead of that commit, so a rolled-back write must be
+    followed by discard().
+    """
+
+    def __init__(self, resolve_readings, resolve_after, sweep_interval):
+        self.resolve_readings = resolve_readings
+        self.resolve_after = resolve_after
+        self.sweep_interval = sweep_interval
+        self._open = None  # device_id -> {fault_type: {'id', 'clear', 'seen'}}
+        self._lock = threading.Lock()
+        self._swept = time.monotonic()
+
+    def _load(self, conn):
+        now = time.time()
+        rows = conn.execute("SELECT id, device_id, fault_type FROM incidents WHERE status = 'open'").fetchall()
+        with self._lock:
+            if self._open is None:
+                self._open = {}
+                for row in rows:
+                    self._open.setdefault(row['device_id'], {})[row['fault_type']] = {
+                        'id': row['id'], 'clear': 0, 'seen': now}
+
+    def observe(self, conn, device, readings):
+        """
+        Fold a device's classified readings, in order, into its incidents and
+        write the changes through conn without committing. `readings` are
+        (fault_type, confidence, measurement_id, signal_power, attenuation);
+        returns the open incident id for each reading, or None.
+        """
+        if self._open is None:
+            self._load(conn)
+        now, stamp = time.time(), utc_timestamp()
+        # Decide under the lock: (state, None) resolves, (state, reading) updates or opens
+        changes = []
+        with self._lock:
+            device_open = self._open.get(device['id'], {})
+            for reading in readings:
+                fault_type, confidence = reading[:2]
+                faulty = fault_type != 'No Fault' and confidence >= device['alert_threshold']
+                for other, state in list(device_open.items()):
+                    if other == fault_type and faulty:
+                        continue
+                    state['clear'] += 1
+                    if state['clear'] >= self.resolve_readings:
+                        changes.append((state, 'recovered'))
+                        del device_open[other]
+                if not faulty:
+                    changes.append((None, None))
+                    continue
+                state = device_open.setdefault(fault_type, {'id': None})
+                state.update(clear=0, seen=now)
+                changes.append((state, reading))
+
+            if device_open:
+                self._open[device['id']] = device_open
+            else:
+                self._open.pop(device['id'], None)
+            if time.monotonic() - self._swept > self.sweep_interval:
+                changes += self._sweep(now)
+
+        # Then write, in reading order
+        incident_ids = []
+        for state, change in changes:
+            if state is None:
+                incident_ids.append(None)
+            elif isinstance(change, str):
+                # An incident opened by a write still in flight has no id yet; its upsert keeps it open
+                if state['id'] is not None:
+                    conn.execute(INCIDENT_RESOLVE_SQL, (stamp, stamp, change, state['id']))
+            else:
+                fault_type, confidence, measurement_id, signal_power, attenuation = change
+                # Another process may have resolved it, in which case a new one opens
+                if state['id'] is None or conn.execute(INCIDENT_UPDATE_SQL, (
+                        stamp, measurement_id, confidence, signal_power, attenuation, state['id'])).rowcount == 0:
+                    conn.execute(INCIDENT_UPSERT_SQL, (device['id'], fault_type, stamp, stamp, measurement_id,
+                                                       measurement_id, confidence, signal_power, attenuation))
+                    state['id'] = conn.execute(
+                        "SELECT id FROM incidents WHERE device_id = ? AND fault_type = ? AND status = 'open'",
+                        (device['id'], fault_type)).fetchone()[0]
+                incident_ids.append(state['id'])
+        return incident_ids
+
+    def _sweep(self, now):
+        """Drop incidents whose devices stopped reporting the fault; returns their timeout changes"""
+        self._swept = time.monotonic()
+        changes = []
+        for device_id, device_open in list(self._open.items()):
+            for fault_type, state in list(device_open.items()):
+                if now - state['seen'] > self.resolve_after:
+                    changes.append((state, 'timeout'))
+                    del device_open[fault_type]
+            if not device_open:
+                del self._open[device_id]
+        return changes
+
+    def discard(self):
+        """Drop the index after a rolled-back write, so it is reloaded from what was committed"""
+        with self._lock:
+            self._open = None
+
+    def resolve(self, conn, incident_id, resolution='manual'):
+        """Resolve an incident by hand; returns False if it was not open"""
+        stamp = utc_timestamp()
+        resolved = conn.execute(INCIDENT_RESOLVE_SQL, (stamp, stamp, resolution, incident_id)).rowcount == 1
+        conn.commit()
+        with self._lock:
+            for device_open in (self._open or {}).values():
+                for fault_type, state in list(device_open.items()):
+                    if state['id'] == incident_id:
+                        del device_open[fault_type]
+        return resolved
+
+incident_tracker = IncidentTracker(INCIDENT_RESOLVE_READINGS, INCIDENT_RESOLVE_AFTER, INCIDENT_SWEEP_INTERVAL)
+
+class FaultRecorder:
+    """
+    Ingestion hook that records a device's readings in its incidents and feeds
+    the most confident fault to the route correlator, inside the transaction
+    that stores the readings (see store_measurements). Results are left on the
+    recorder for the request to read once the readings are stored. If that
+    transaction rolls back, the in-memory state it changed is undone.
+    """
+
+    def __init__(self, device, readings):
+        self.device = device
+        self.readings = readings  # (fault_type, confidence, signal_power, attenuation, distance), in order
+        self.incident_ids = [None] * len(readings)
+        self.route_incident = None
+        self.route_created = False
+        self.route_offset = None
+
+    def record(self, conn, first_id):
+        # A write-behind group that fails is retried, so start over each time
+        self.route_incident, self.route_created, self.route_offset = None, False, None
+        try:
+            self.incident_ids = incident_tracker.observe(conn, self.device, [
+                (fault_type, confidence, first_id + offset, signal_power, attenuation)
+                for offset, (fault_type, confidence, signal_power, attenuation, _) in enumerate(self.readings)])
+            faults = [(reading[1], offset) for offset, reading in enumerate(self.readings)
+                      if reading[0] != 'No Fault']
+            if faults:
+                confidence, offset = max(faults)
+                fault_type, _, _, _, distance = self.readings[offset]
+                correlation = correlate_fault(conn, self.device, fault_type, confidence, distance, first_id + offset)
+                if correlation:
+                    (self.route_incident, self.route_created), self.route_offset = correlation, offset
+        except Exception:
+            self.settle(False)
+            raise
+        return self.settle
+
+    def settle(self, committed):
+        if committed:
+            return
+        incident_tracker.discard()
+        # The incident row this transaction inserted is gone, so the next report inserts it again
+        if self.route_created:
+            self.route_incident['id'] = None
+
+# Live dashboard events
+class EventBroker:
+    """Fans out dashboard events to the Server-Sent Events subscribers of this process"""
+
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def publish(self, event, data):
+        message = f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # A client that cannot keep up is disconnected; it reconnects and resyncs
+                self.unsubscribe(subscriber)
+                while True:
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        break
+                subscriber.put_nowait(None)
+
+event_broker = EventBroker(STREAM_QUEUE_SIZE)
+
+def publish_measurements(device_name, measurements):
+    """Push committed measurements and the matching stat deltas to dashboard streams"""
+    if not event_broker.has_subscribers():
+        return
+    fault_counts = {}
+    for measurement in measurements:
+        measurement['device_name'] = device_name
+        fault_counts[measurement['fault_type']] = fault_counts.get(measurement['fault_type'], 0) + 1
+    event_broker.publish('measurements', measurements)
+    event_broker.publish('stats', {
+        'measurement_count': len(measurements),
+        'fault_distribution': fault_counts
+    })
+
+def utc_timestamp():
+    """Current time in SQLite's CURRENT_TIMESTAMP format"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+# Measurement payload parsing
+def parse_timestamp(value):
+    """Normalize an ISO 8601 reading timestamp to SQLite's CURRENT_TIMESTAMP format (UTC)"""
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+def parse_measurement(data):
+    """Validate a single measurement payload and return its typed values"""
+    if not isinstance(data, dict):
+        raise ValueError('Measurement must be a JSON object')
+
+    # Validate required fields
+    for field in ('signal_power', 'attenuation', 'distance'):
+        if field not in data:
+            raise ValueError(f'Missing required field: {field}')
+
+    return (
+        float(data['signal_power']),
+        float(data['attenuation']),
+        float(data['distance']),
+        parse_timestamp(data.get('timestamp'))
+    )
+
+def read_measurement_batch():
+    """Read a batch request body as a JSON array or as NDJSON (one reading per line)"""
+    if request.mimetype in NDJSON_MIMETYPES:
+        items = []
+        for line in request.get_data(as_text=True).splitlines():
+            if line.strip():
+                items.append(json.loads(line))
+        return items
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('measurements')
+    if not isinstance(data, list):
+        raise ValueError('Expected a JSON array of measurements')
+    return data
+
+# Pagination
+def encode_cursor(timestamp, row_id):
+    """Opaque cursor for the page after the row with this timestamp and id"""
+    raw = json.dumps([timestamp, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
 
-# Check if notification should be sent
-def should_send_notification(device_id, fault_type, confidence):
-    """Determine if a notification should be sent based on rules and cooldown period"""
-    # Don't notify for "No Fault"
-    if fault_type == "No Fault":
-        return False
-    
-    # Check cooldown period
-    current_time = time.time()
-    if device_id in last_notification_time:
-        time_since_last = current_time - last_notification_time[device_id]
-        if time_since_last < NOTIFICATION_COOLDOWN:
-            logger.info(f"Notification for device {device_id} skipped (cooldown period)")
-            return False
-    
-    # Get device alert threshold
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT alert_threshold FROM devices WHERE id = ?', (device_id,))
-    result = cursor.fetchone()
-    conn.close()
-    
-    if not result:
-        return False
-    
-    alert_threshold = result[0]
-    
-    # Check if confidence exceeds threshold
-    if confidence < alert_threshold:
-        logger.info(f"Notification for device {device_id} skipped (below threshold: {confidence:.2f} < {alert_threshold:.2f})")
-        return False
-    
-    return True
+def decode_cursor(cursor):
+    """Return the (timestamp, id) encoded in a cursor"""
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(timestamp, str) or not isinstance(row_id, int):
+        raise ValueError('Invalid cursor')
+    return timestamp, row_id
+
+def measurement_filters(prefix=''):
+    """SQL conditions for the optional since/until (ISO 8601, until exclusive) query parameters"""
+    conditions, params = [], []
+    since = parse_timestamp(request.args.get('since'))
+    until = parse_timestamp(request.args.get('until'))
+    if since:
+        conditions.append(f'{prefix}timestamp >= ?')
+        params.append(since)
+    if until:
+        conditions.append(f'{prefix}timestamp < ?')
+        params.append(until)
+    return conditions, params, since, until
+
+def page_size():
+    """Requested page size, clamped to MAX_PAGE_SIZE"""
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def cursor_page(rows, limit, key='timestamp'):
+    """Build a page from up to limit + 1 rows ordered by (key, id) descending"""
+    items = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(items[-1][key], items[-1]['id'])
+    return {'items': items, 'next_cursor': next_cursor}
+
+# Export
+def export_rows(sql, params, since=None, until=None):
+    """Yield query results in chunks from a pooled connection held for the whole stream"""
+    with db_connection() as conn:
+        yield from iter_measurements(conn, sql, params, since, until)
+
+def format_ndjson(chunks):
+    for rows in chunks:
+        yield ''.join(json.dumps(dict(row)) + '\n' for row in rows)
+
+def format_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def gzip_stream(chunks):
+    """Gzip a stream of text chunks incrementally"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+# Chart series
+def lttb_indices(x, y, max_points):
+    """Largest-Triangle-Three-Buckets downsampling; returns the indices of the points to keep"""
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+    max_points = max(max_points, 3)
+
+    # First and last points are always kept; the rest are split into max_points - 2 buckets
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.intp)
+    keep = np.empty(max_points, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        # Keep the point forming the largest triangle with the previous kept point and the next bucket's average
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+def series_range():
+    """Return the (since, until) range of a series request, defaulting to the last 7 days"""
+    until = parse_timestamp(request.args.get('until')) or utc_timestamp()
+    since = request.args.get('since')
+    if since:
+        since = parse_timestamp(since)
+    else:
+        since = (datetime.fromisoformat(until) - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S')
+    if since >= until:
+        raise ValueError('since must be before until')
+    return since, until
 
 # Authentication decorator for API endpoints
 def require_api_key(f):
@@ -361,19 +3414,27 @@ def require_api_key(f):
         if not api_key:
             return jsonify({'error': 'API key is missing'}), 401
         
-        # Check if API key exists in database
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, name FROM devices WHERE api_key = ?', (api_key,))
-        device = cursor.fetchone()
-        conn.close()
-        
+        # Check if API key belongs to a registered device
+        device = device_registry.get_by_api_key(api_key)
         if not device:
             return jsonify({'error': 'Invalid API key'}), 401
         
-        # Add device_id and device_name to request
-        request.device_id = device[0]
-        request.device_name = device[1]
+        # Add device record, device_id and device_name to request
+        request.device = device
+        request.device_id = device['id']
+        request.device_name = device['name']
+        return f(*args, **kwargs)
+    return decorated
+
+# Authentication decorator for operator endpoints
+def require_admin_token(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'error': 'Admin endpoints are disabled (set ADMIN_TOKEN)'}), 403
+        token = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+            return jsonify({'error': 'Invalid admin token'}), 403
         return f(*args, **kwargs)
     return decorated
 
@@ -411,6 +3472,47 @@ def predict():
         logger.error(f"Error in predict endpoint: {str(e)}")
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/classifier/cache', methods=['GET'])
+def classifier_cache_stats():
+    """Classification cache counters"""
+    return jsonify({
+        'enabled': classification_cache_enabled(),
+        'backend': model_registry.backend.version(),
+        'noise': CLASSIFIER_NOISE,
+        'quantum': CLASSIFIER_CACHE_QUANTUM,
+        **classification_cache.stats()
+    })
+
+@app.route('/api/anomaly', methods=['GET'])
+@require_api_key
+def anomaly_state():
+    """Online baseline the anomaly detector keeps for the calling device"""
+    return jsonify({'device_id': request.device_id, 'enabled': ANOMALY_DETECTION,
+                    'state': anomaly_detector.state(request.device_id)})
+
+@app.route('/api/ingest/write-behind', methods=['GET'])
+def write_behind_stats():
+    """Write-behind queue depth and group commit counters"""
+    return jsonify({'enabled': WRITE_BEHIND, **write_behind.stats()})
+
+@app.route('/api/admin/model', methods=['GET'])
+@require_admin_token
+def model_status():
+    """Active classifier backend and the outcome of the last load"""
+    return jsonify(model_registry.status())
+
+@app.route('/api/admin/model/reload', methods=['POST'])
+@csrf.exempt
+@require_admin_token
+def reload_model():
+    """Reload the model artifacts now instead of waiting for the watcher"""
+    try:
+        reloaded = model_registry.reload(force=True)
+        return jsonify({'reloaded': reloaded, **model_registry.status()})
+    except MODEL_LOAD_ERRORS as e:
+        logger.error(f"Error in reload_model endpoint: {str(e)}")
+        return jsonify({'error': str(e), **model_registry.status()}), 400
+
 @app.route('/api/measurements', methods=['POST'])
 @require_api_key
 def add_measurement():
@@ -432,56 +3534,41 @@ def add_measurement():
         # Make prediction
         prediction, probabilities, confidence = predict_fault(signal_power, attenuation, distance)
         
-        # Store measurement in database
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-        INSERT INTO measurements 
-        (device_id, signal_power, attenuation, distance, fault_type, confidence)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ''', (request.device_id, signal_power, attenuation, distance, prediction, confidence))
-        
-        measurement_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        
-        # Check if notification should be sent
-        if should_send_notification(request.device_id, prediction, confidence):
-            # Get notification recipients
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('SELECT alert_email FROM devices WHERE id = ?', (request.device_id,))
-            result = cursor.fetchone()
-            conn.close()
-            
-            device_email = result[0] if result and result[0] else None
-            
-            # Combine global recipients with device-specific recipient
-            recipients = EMAIL_TO.copy()
-            if device_email and device_email not in recipients:
-                recipients.append(device_email)
-            
-            if recipients:
-                # Send notification in a separate thread to avoid blocking
-                notification_thread = threading.Thread(
-                    target=send_email_notification,
-                    args=(
-                        request.device_id, 
-                        request.device_name, 
-                        prediction, 
-                        confidence, 
-                        signal_power, 
-                        attenuation, 
-                        distance, 
-                        measurement_id,
-                        recipients
-                    )
-                )
-                notification_thread.start()
-                
-                # Update last notification time
-                last_notification_time[request.device_id] = time.time()
+        # Store measurement in database, with its incident and route correlation updates
+        faults = FaultRecorder(request.device, [(prediction, confidence, signal_power, attenuation, distance)])
+        measurement_id = store_measurements([
+            (request.device_id, None, signal_power, attenuation, distance, prediction, confidence)], faults.record)
+
+        publish_measurements(request.device_name, [{
+            'id': measurement_id,
+            'device_id': request.device_id,
+            'timestamp': utc_timestamp(),
+            'signal_power': signal_power,
+            'attenuation': attenuation,
+            'distance': distance,
+            'fault_type': prediction,
+            'confidence': confidence
+        }])
         
+        anomaly = detect_anomaly(request.device_id, signal_power, attenuation)
+        alert_debouncer.observe(request.device, prediction, confidence)
+        route_incident = faults.route_incident
+
+        # Check if notification should be sent; a debounced fault on an unconfirmed spike waits for the next reading
+        if route_incident:
+            if faults.route_created:
+                alert_route_incident(request.device, route_incident, confidence, signal_power, attenuation, distance,
+                                     measurement_id)
+            logger.info(f"Notification for device {request.device_id} folded into route incident {route_incident['id']}")
+        elif held_back_as_spike(request.device, prediction, anomaly):
+            logger.info(f"Notification for device {request.device_id} held back (isolated spike)")
+        else:
+            notify_fault(request.device_id, request.device_name, prediction, confidence,
+                         signal_power, attenuation, distance, measurement_id)
+        if anomaly and anomaly['drift']:
+            dispatch_drift_alerts(request.device_id, request.device_name, anomaly['drift'],
+                                  signal_power, attenuation, distance, measurement_id)
+
         return jsonify({
             'id': measurement_id,
             'device_id': request.device_id,
@@ -490,36 +3577,159 @@ def add_measurement():
             'attenuation': attenuation,
             'distance': distance,
             'fault_type': prediction,
-            'confidence': confidence
+            'confidence': confidence,
+            'anomaly': anomaly,
+            'incident_id': faults.incident_ids[0],
+            'route_incident_id': route_incident['id'] if route_incident else None
         })
-    
+
+    except WriteBehindFull as e:
+        return ingestion_backpressure(e)
     except Exception as e:
         logger.error(f"Error in add_measurement endpoint: {str(e)}")
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/measurements/batch', methods=['POST'])
+@csrf.exempt
+@require_api_key
+def add_measurements_batch():
+    """API endpoint for gateways to submit buffered measurements in bulk"""
+    try:
+        items = read_measurement_batch()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if not items:
+        return jsonify({'error': 'No measurements provided'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch exceeds maximum size of {MAX_BATCH_SIZE} measurements'}), 413
+
+    try:
+        # Validate each reading; invalid rows are reported but do not reject the batch
+        results = [None] * len(items)
+        accepted = []
+        for index, item in enumerate(items):
+            try:
+                accepted.append((index,) + parse_measurement(item))
+            except (ValueError, TypeError) as e:
+                results[index] = {'index': index, 'error': str(e)}
+
+        rows, faults = [], None
+        if accepted:
+            # Classify the whole batch in one vectorized pass
+            _, signal_powers, attenuations, distances, timestamps = zip(*accepted)
+            predictions, _, confidences = predict_fault_batch(signal_powers, attenuations, distances,
+                                                              timestamps=timestamps)
+            rows = list(zip([request.device_id] * len(accepted), timestamps, signal_powers, attenuations,
+                            distances, predictions, confidences.tolist()))
+
+        if rows:
+            # Store the whole batch in a single transaction, with its incident and route correlation updates
+            faults = FaultRecorder(request.device, [(row[5], row[6], row[2], row[3], row[4]) for row in rows])
+            first_id = store_measurements(rows, faults.record)
+            for offset, ((index, *_), row) in enumerate(zip(accepted, rows)):
+                results[index] = {
+                    'index': index,
+                    'id': first_id + offset,
+                    'fault_type': row[5],
+                    'confidence': row[6]
+                }
+
+            now = utc_timestamp()
+            publish_measurements(request.device_name, [{
+                'id': first_id + offset,
+                'device_id': device_id,
+                'timestamp': timestamp or now,
+                'signal_power': signal_power,
+                'attenuation': attenuation,
+                'distance': distance,
+                'fault_type': prediction,
+                'confidence': confidence
+            } for offset, (device_id, timestamp, signal_power, attenuation, distance, prediction, confidence)
+                in enumerate(rows)])
+
+        # Update the device's online state in reading order
+        anomalies = [detect_anomaly(request.device_id, row[2], row[3]) for row in rows]
+        for row in rows:
+            alert_debouncer.observe(request.device, row[5], row[6])
+        for (index, *_), incident_id in zip(accepted, faults.incident_ids if faults else []):
+            results[index]['incident_id'] = incident_id
+        for (index, *_), anomaly in zip(accepted, anomalies):
+            results[index]['anomaly'] = anomaly
+
+        # Evaluate notifications once per batch: a route incident stands in for the device's own alert,
+        # otherwise the most confident fault that is not held back as an isolated spike is used
+        notification_sent = False
+        candidates = [(row[6], offset) for offset, (row, anomaly) in enumerate(zip(rows, anomalies))
+                      if row[5] != 'No Fault' and not held_back_as_spike(request.device, row[5], anomaly)]
+        if faults and faults.route_incident:
+            offset = faults.route_offset
+            _, _, signal_power, attenuation, distance, _, confidence = rows[offset]
+            results[accepted[offset][0]]['route_incident_id'] = faults.route_incident['id']
+            if faults.route_created:
+                notification_sent = alert_route_incident(request.device, faults.route_incident, confidence,
+                                                         signal_power, attenuation, distance,
+                                                         results[accepted[offset][0]]['id'])
+        elif candidates:
+            confidence, offset = max(candidates)
+            _, _, signal_power, attenuation, distance, prediction, _ = rows[offset]
+            notification_sent = notify_fault(request.device_id, request.device_name, prediction, confidence,
+                                             signal_power, attenuation, distance, results[accepted[offset][0]]['id'])
+        for offset, anomaly in enumerate(anomalies):
+            if anomaly and anomaly['drift']:
+                _, _, signal_power, attenuation, distance, _, _ = rows[offset]
+                notification_sent = dispatch_drift_alerts(
+                    request.device_id, request.device_name, anomaly['drift'],
+                    signal_power, attenuation, distance, results[accepted[offset][0]]['id']) or notification_sent
+
+        return jsonify({
+            'device_id': request.device_id,
+            'accepted': len(rows),
+            'rejected': len(items) - len(rows),
+            'notification_sent': notification_sent,
+            'results': results
+        }), 200 if rows else 400
+
+    except WriteBehindFull as e:
+        return ingestion_backpressure(e)
+    except Exception as e:
+        logger.error(f"Error in add_measurements_batch endpoint: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/api/measurements', methods=['GET'])
 @require_api_key
 def get_measurements():
     """API endpoint for IoT devices to retrieve their measurements"""
     try:
         # Get query parameters
-        limit = request.args.get('limit', 100, type=int)
+        limit = page_size()
         offset = request.args.get('offset', 0, type=int)
+        conditions, params, since, until = measurement_filters()
+        conditions.insert(0, 'device_id = ?')
+        params.insert(0, request.device_id)
         
-        # Get measurements from database
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row  # Return results as dictionaries
-        cursor = conn.cursor()
+        # Keyset pagination: ?cursor= (empty for the first page) returns {items, next_cursor}
+        keyset = 'cursor' in request.args
+        if keyset:
+            offset = 0
+            if request.args['cursor']:
+                cursor_timestamp, cursor_id = decode_cursor(request.args['cursor'])
+                conditions.append('(timestamp, id) < (?, ?)')
+                params.extend((cursor_timestamp, cursor_id))
+                until = min(until or cursor_timestamp, cursor_timestamp)
         
-        cursor.execute('''
-        SELECT * FROM measurements
-        WHERE device_id = ?
-        ORDER BY timestamp DESC
+        # Get measurements from the main table and any sealed partitions in range
+        rows = query_measurements(get_db(), f'''
+        SELECT * FROM {{measurements}}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY timestamp DESC, id DESC
         LIMIT ? OFFSET ?
-        ''', (request.device_id, limit, offset))
+        ''', params, limit + 1 if keyset else limit, offset, since, until)
+        
+        if keyset:
+            return jsonify(cursor_page(rows, limit))
         
-        measurements = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        measurements = [dict(row) for row in rows]
         
         return jsonify(measurements)
     
@@ -536,12 +3746,10 @@ def dashboard():
 def devices():
     """Render the devices management page"""
     # Get all devices from database
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = get_db()
     cursor = conn.cursor()
     cursor.execute('SELECT id, name, created_at, alert_threshold, alert_email, last_alert_sent FROM devices')
     devices = [dict(row) for row in cursor.fetchall()]
-    conn.close()
     
     return render_template('devices.html', devices=devices)
 
@@ -552,6 +3760,7 @@ def new_device():
         name = request.form.get('name')
         alert_email = request.form.get('alert_email', '')
         alert_threshold = request.form.get('alert_threshold', 0.7)
+        alert_debounce = request.form.get('alert_debounce', '').strip() or None
         
         try:
             alert_threshold = float(alert_threshold)
@@ -560,20 +3769,27 @@ def new_device():
         
         if not name:
             return render_template('new_device_notification.html', error='Device name is required')
+
+        if alert_debounce:
+            try:
+                alert_debounce = json.dumps(parse_alert_debounce(alert_debounce))
+            except ValueError as e:
+                return render_template('new_device_notification.html', error=str(e))
         
         # Generate device ID and API key
         device_id = str(uuid.uuid4())
         api_key = generate_api_key()
         
         # Store device in database
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute('''
-        INSERT INTO devices (id, name, api_key, alert_threshold, alert_email)
-        VALUES (?, ?, ?, ?, ?)
-        ''', (device_id, name, api_key, alert_threshold, alert_email))
+        INSERT INTO devices (id, name, api_key, alert_threshold, alert_email, alert_debounce)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', (device_id, name, api_key, alert_threshold, alert_email, alert_debounce))
         conn.commit()
-        conn.close()
+        device_registry.invalidate(device_id)
+        event_broker.publish('stats', {'device_count': 1})
         
         return render_template('device_created_notification.html', 
                               device_id=device_id, 
@@ -587,40 +3803,45 @@ def new_device():
 @app.route('/devices/<device_id>/edit', methods=['GET', 'POST'])
 def edit_device(device_id):
     """Edit device settings"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = get_db()
     cursor = conn.cursor()
     
     if request.method == 'POST':
         name = request.form.get('name')
         alert_email = request.form.get('alert_email', '')
         alert_threshold = request.form.get('alert_threshold', 0.7)
+        alert_debounce = request.form.get('alert_debounce', '').strip() or None
         
         try:
             alert_threshold = float(alert_threshold)
         except ValueError:
             alert_threshold = 0.7
         
-        if not name:
+        error = None if name else 'Device name is required'
+        if not error and alert_debounce:
+            try:
+                alert_debounce = json.dumps(parse_alert_debounce(alert_debounce))
+            except ValueError as e:
+                error = str(e)
+        if error:
             cursor.execute('SELECT * FROM devices WHERE id = ?', (device_id,))
             device = dict(cursor.fetchone())
-            conn.close()
-            return render_template('edit_device.html', device=device, error='Device name is required')
+            return render_template('edit_device.html', device=device, error=error)
         
         # Update device in database
         cursor.execute('''
         UPDATE devices 
-        SET name = ?, alert_threshold = ?, alert_email = ?
+        SET name = ?, alert_threshold = ?, alert_email = ?, alert_debounce = ?
         WHERE id = ?
-        ''', (name, alert_threshold, alert_email, device_id))
+        ''', (name, alert_threshold, alert_email, alert_debounce, device_id))
         conn.commit()
+        device_registry.invalidate(device_id)
         
         return redirect(url_for('devices'))
     
     # GET request - show edit form
     cursor.execute('SELECT * FROM devices WHERE id = ?', (device_id,))
     device = cursor.fetchone()
-    conn.close()
     
     if not device:
         return redirect(url_for('devices'))
@@ -631,8 +3852,7 @@ def edit_device(device_id):
 def notifications_list():
     """View notification history"""
     # Get all notifications from database
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -644,7 +3864,6 @@ def notifications_list():
     ''')
     
     notifications = [dict(row) for row in cursor.fetchall()]
-    conn.close()
     
     return render_template('notifications.html', notifications=notifications)
 
@@ -653,23 +3872,32 @@ def get_recent_data():
     """Get recent measurements for dashboard"""
     try:
         # Get query parameters
-        limit = request.args.get('limit', 100, type=int)
+        limit = page_size()
+        conditions, params, since, until = measurement_filters('m.')
         
-        # Get measurements from database
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        # Keyset pagination: ?cursor= (empty for the first page) returns {items, next_cursor}
+        keyset = 'cursor' in request.args
+        if keyset and request.args['cursor']:
+            cursor_timestamp, cursor_id = decode_cursor(request.args['cursor'])
+            conditions.append('(m.timestamp, m.id) < (?, ?)')
+            params.extend((cursor_timestamp, cursor_id))
+            until = min(until or cursor_timestamp, cursor_timestamp)
+        where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
         
-        cursor.execute('''
+        # Get measurements from the main table and any sealed partitions in range
+        rows = query_measurements(get_db(), f'''
         SELECT m.*, d.name as device_name
-        FROM measurements m
+        FROM {{measurements}} m
         JOIN devices d ON m.device_id = d.id
-        ORDER BY m.timestamp DESC
-        LIMIT ?
-        ''', (limit,))
+        {where}
+        ORDER BY m.timestamp DESC, m.id DESC
+        LIMIT ? OFFSET ?
+        ''', params, limit + 1 if keyset else limit, 0, since, until)
         
-        measurements = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        if keyset:
+            return jsonify(cursor_page(rows, limit))
+        
+        measurements = [dict(row) for row in rows]
         
         return jsonify(measurements)
     
@@ -677,34 +3905,44 @@ def get_recent_data():
         logger.error(f"Error in get_recent_data endpoint: {str(e)}")
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/data/stream', methods=['GET'])
+def stream_data():
+    """Server-Sent Events stream of new measurements and statistic deltas for the dashboard"""
+    subscriber = event_broker.subscribe()
+
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    message = subscriber.get(timeout=STREAM_HEARTBEAT)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            event_broker.unsubscribe(subscriber)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/data/stats', methods=['GET'])
 def get_stats():
     """Get statistics for dashboard"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_db()
         cursor = conn.cursor()
         
-        # Get device count
-        cursor.execute('SELECT COUNT(*) as count FROM devices')
-        device_count = cursor.fetchone()['count']
-        
-        # Get measurement count
-        cursor.execute('SELECT COUNT(*) as count FROM measurements')
-        measurement_count = cursor.fetchone()['count']
+        # Get device, measurement and notification counts from the materialized totals
+        cursor.execute('SELECT name, value FROM stats_totals')
+        totals = {row['name']: row['value'] for row in cursor.fetchall()}
         
         # Get fault type distribution
-        cursor.execute('''
-        SELECT fault_type, COUNT(*) as count
-        FROM measurements
-        GROUP BY fault_type
-        ''')
+        cursor.execute('SELECT fault_type, count FROM stats_fault_totals WHERE count > 0')
         fault_distribution = {row['fault_type']: row['count'] for row in cursor.fetchall()}
         
-        # Get notification count
-        cursor.execute('SELECT COUNT(*) as count FROM notifications')
-        notification_count = cursor.fetchone()['count']
-        
         # Get recent alerts (last 24 hours)
         cursor.execute('''
         SELECT COUNT(*) as count FROM notifications
@@ -712,25 +3950,429 @@ def get_stats():
         ''')
         recent_alerts = cursor.fetchone()['count']
         
-        conn.close()
+        # Get open incidents and incidents opened in the last 24 hours
+        cursor.execute('''
+        SELECT
+            (SELECT COUNT(*) FROM incidents WHERE status = 'open') AS open_incidents,
+            (SELECT COUNT(*) FROM incidents WHERE opened_at > datetime('now', '-1 day')) AS recent_incidents
+        ''')
+        incidents = cursor.fetchone()
         
         return jsonify({
-            'device_count': device_count,
-            'measurement_count': measurement_count,
+            'device_count': totals.get('devices', 0),
+            'measurement_count': totals.get('measurements', 0),
             'fault_distribution': fault_distribution,
-            'notification_count': notification_count,
-            'recent_alerts': recent_alerts
+            'notification_count': totals.get('notifications', 0),
+            'recent_alerts': recent_alerts,
+            'open_incidents': incidents['open_incidents'],
+            'recent_incidents': incidents['recent_incidents']
         })
     
     except Exception as e:
         logger.error(f"Error in get_stats endpoint: {str(e)}")
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/data/stats/hourly', methods=['GET'])
+def get_hourly_stats():
+    """Get per-device hourly rollups for dashboard charts"""
+    try:
+        hours = min(request.args.get('hours', 24, type=int), 24 * 90)
+        device_id = request.args.get('device_id')
+        since = f'-{hours} hours'
+        
+        conn = get_db()
+        cursor = conn.cursor()
+        if device_id:
+            cursor.execute('''
+            SELECT * FROM stats_hourly
+            WHERE device_id = ? AND hour >= strftime('%Y-%m-%d %H:00:00', 'now', ?)
+            ORDER BY hour
+            ''', (device_id, since))
+        else:
+            cursor.execute('''
+            SELECT * FROM stats_hourly
+            WHERE hour >= strftime('%Y-%m-%d %H:00:00', 'now', ?)
+            ORDER BY hour
+            ''', (since,))
+        
+        rollups = []
+        for row in cursor.fetchall():
+            rollup = dict(row)
+            count = rollup['measurement_count']
+            rollup['avg_signal_power'] = rollup.pop('sum_signal_power') / count if count else None
+            rollup['avg_attenuation'] = rollup.pop('sum_attenuation') / count if count else None
+            rollups.append(rollup)
+        
+        return jsonify(rollups)
+    
+    except Exception as e:
+        logger.error(f"Error in get_hourly_stats endpoint: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/data/series', methods=['GET'])
+def get_series():
+    """Get a device's signal series as per-bucket min/max/avg/count, or LTTB-downsampled raw points"""
+    try:
+        device_id = request.args.get('device_id')
+        if not device_id:
+            raise ValueError('device_id is required')
+        since, until = series_range()
+        max_points = max(3, min(request.args.get('max_points', MAX_SERIES_POINTS, type=int), MAX_SERIES_POINTS))
+        conn = get_db()
+        
+        if request.args.get('downsample') == 'lttb':
+            metric = request.args.get('metric', 'signal_power')
+            if metric not in SERIES_METRICS:
+                raise ValueError(f"metric must be one of: {', '.join(SERIES_METRICS)}")
+            rows = [row for chunk in iter_measurements(conn, f'''
+            SELECT timestamp, CAST(strftime('%s', timestamp) AS INTEGER), {metric}
+            FROM {{measurements}}
+            WHERE device_id = ? AND timestamp >= ? AND timestamp < ?
+            ORDER BY timestamp, id
+            ''', (device_id, since, until), since, until) for row in chunk]
+            
+            x = np.array([row[1] for row in rows], dtype=float)
+            y = np.array([row[2] for row in rows], dtype=float)
+            points = [{'timestamp': rows[i][0], 'value': rows[i][2]} for i in lttb_indices(x, y, max_points)]
+            return jsonify({
+                'device_id': device_id,
+                'metric': metric,
+                'since': since,
+                'until': until,
+                'raw_count': len(rows),
+                'points': points
+            })
+        
+        bucket = request.args.get('bucket', 'hour')
+        if bucket not in SERIES_BUCKETS:
+            raise ValueError(f"bucket must be one of: {', '.join(SERIES_BUCKETS)}")
+        bucket_format, bucket_seconds, rollup_table = SERIES_BUCKETS[bucket]
+        span = (datetime.fromisoformat(until) - datetime.fromisoformat(since)).total_seconds()
+        if span / bucket_seconds > max_points:
+            raise ValueError('Too many buckets for this range; use a coarser bucket or a shorter range')
+        
+        # Raw rows, plus rollups of rows already removed by the retention job or sealed into partitions
+        sources = f'''
+            SELECT strftime('{bucket_format}', timestamp) AS bucket, COUNT(*) AS n,
+                   MIN(signal_power) AS min_sp, MAX(signal_power) AS max_sp, SUM(signal_power) AS sum_sp,
+                   MIN(attenuation) AS min_att, MAX(attenuation) AS max_att, SUM(attenuation) AS sum_att
+            FROM {{measurements}}
+            WHERE device_id = ? AND timestamp >= ? AND timestamp < ?
+            GROUP BY 1
+        '''
+        params = [device_id, since, until]
+        if rollup_table:
+            sources += f'''
+            UNION ALL
+            SELECT bucket, measurement_count, min_signal_power, max_signal_power, sum_signal_power,
+                   min_attenuation, max_attenuation, sum_attenuation
+            FROM {rollup_table}
+            WHERE device_id = ? AND bucket >= ? AND bucket < ?
+            '''
+            params += [device_id, since, until]
+        
+        sql = f'''
+        SELECT bucket, SUM(n) AS count,
+               MIN(min_sp) AS min_signal_power, MAX(max_sp) AS max_signal_power,
+               SUM(sum_sp) / SUM(n) AS avg_signal_power,
+               MIN(min_att) AS min_attenuation, MAX(max_att) AS max_attenuation,
+               SUM(sum_att) / SUM(n) AS avg_attenuation
+        FROM ({sources})
+        GROUP BY bucket
+        ORDER BY bucket
+        '''
+        if rollup_table:
+            buckets = conn.execute(sql.format(measurements='measurements'), params).fetchall()
+        else:
+            # No rollup covers sealed rows here; buckets never straddle a month, so segments just concatenate
+            buckets = [row for chunk in iter_measurements(conn, sql, params, since, until) for row in chunk]
+        
+        return jsonify({
+            'device_id': device_id,
+            'bucket': bucket,
+            'since': since,
+            'until': until,
+            'buckets': [dict(row) for row in buckets]
+        })
+    
+    except Exception as e:
+        logger.error(f"Error in get_series endpoint: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/data/export', methods=['GET'])
+def export_data():
+    """Stream measurement history as NDJSON or CSV, optionally gzipped"""
+    try:
+        export_format = request.args.get('format', 'ndjson').lower()
+        if export_format not in ('ndjson', 'csv'):
+            raise ValueError("format must be 'ndjson' or 'csv'")
+        
+        # Build filters: device_id, since/until (ISO 8601, until exclusive) and fault_type
+        conditions, params = [], []
+        since = parse_timestamp(request.args.get('since') or None)
+        until = parse_timestamp(request.args.get('until') or None)
+        if request.args.get('device_id'):
+            conditions.append('device_id = ?')
+            params.append(request.args['device_id'])
+        if since:
+            conditions.append('timestamp >= ?')
+            params.append(since)
+        if until:
+            conditions.append('timestamp < ?')
+            params.append(until)
+        if request.args.get('fault_type'):
+            if request.args['fault_type'] not in FAULT_TYPES:
+                raise ValueError(f"Unknown fault_type: {request.args['fault_type']}")
+            conditions.append('fault_type = ?')
+            params.append(request.args['fault_type'])
+        where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+        compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    
+    except Exception as e:
+        logger.error(f"Error in export_data endpoint: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    
+    # Read through the sealed partitions too, one month at a time
+    sql = f'''
+    SELECT {', '.join(EXPORT_COLUMNS)} FROM {{measurements}}
+    {where}
+    ORDER BY timestamp, id
+    '''
+    chunks = export_rows(sql, params, since, until)
+    if export_format == 'csv':
+        body, mimetype = format_csv(chunks), 'text/csv'
+    else:
+        body, mimetype = format_ndjson(chunks), 'application/x-ndjson'
+    
+    headers = {'Content-Disposition': f'attachment; filename=measurements.{export_format}'}
+    if compress:
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, mimetype=mimetype, headers=headers)
+
+@app.route('/api/routes', methods=['GET'])
+def list_routes():
+    """Fiber routes with their device counts"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT r.id, r.name, r.length_m, r.created_at, COUNT(rd.device_id) AS device_count
+        FROM routes r LEFT JOIN route_devices rd ON rd.route_id = r.id
+        GROUP BY r.id
+        ORDER BY r.name
+        ''')
+        return jsonify([dict(row) for row in cursor.fetchall()])
+    
+    except Exception as e:
+        logger.error(f"Error in list_routes endpoint: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/routes', methods=['POST'])
+@csrf.exempt
+@require_admin_token
+def create_route():
+    """Create a fiber route: {"name": ..., "length_m": ...}"""
+    try:
+        data = request.get_json() or {}
+        name = data.get('name')
+        length_m = float(data.get('length_m', 0))
+        if not name:
+            raise ValueError('Route name is required')
+        if not length_m > 0:
+            raise ValueError('length_m must be positive')
+        route_id = str(uuid.uuid4())
+        
+        conn = get_db()
+        conn.execute('INSERT INTO routes (id, name, length_m) VALUES (?, ?, ?)', (route_id, name, length_m))
+        conn.commit()
+        route_correlator.invalidate()
+        return jsonify({'id': route_id, 'name': name, 'length_m': length_m}), 201
+    
+    except Exception as e:
+        logger.error(f"Error in create_route endpoint: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/routes/<route_id>', methods=['GET'])
+def get_route(route_id):
+    """A route, its devices in position order, and its most recent located incidents"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, name, length_m, created_at FROM routes WHERE id = ?', (route_id,))
+        route = cursor.fetchone()
+        if not route:
+            return jsonify({'error': 'Route not found'}), 404
+        
+        cursor.execute('''
+        SELECT rd.device_id, d.name, rd.position_m, rd.direction
+        FROM route_devices rd JOIN devices d ON d.id = rd.device_id
+        WHERE rd.route_id = ?
+        ORDER BY rd.position_m
+        ''', (route_id,))
+        devices = [dict(row) for row in cursor.fetchall()]
+        
+        cursor.execute('''
+        SELECT * FROM route_incidents
+        WHERE route_id = ?
+        ORDER BY opened_at DESC, id DESC
+        LIMIT ?
+        ''', (route_id, page_size()))
+        incidents = [dict(row, devices=json.loads(row['devices'])) for row in cursor.fetchall()]
+        
+        return jsonify({**dict(route), 'devices': devices, 'incidents': incidents})
+    
+    except Exception as e:
+        logger.error(f"Error in get_route endpoint: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/routes/<route_id>/devices', methods=['POST'])
+@csrf.exempt
+@require_admin_token
+def place_route_devices(route_id):
+    """Place devices on a route: [{"device_id": ..., "position_m": ..., "direction": 1 or -1}, ...]"""
+    try:
+        data = request.get_json()
+        placements = data if isinstance(data, list) else [data]
+        
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('SELECT length_m FROM routes WHERE id = ?', (route_id,))
+        route = cursor.fetchone()
+        if not route:
+            return jsonify({'error': 'Route not found'}), 404
+        
+        rows = []
+        for placement in placements:
+            device_id = placement.get('device_id')
+            position_m = float(placement.get('position_m'))
+            direction = int(placement.get('direction', 1))
+            if not device_registry.get_by_id(device_id):
+                raise ValueError(f'Unknown device: {device_id}')
+            if not 0 <= position_m <= route['length_m']:
+                raise ValueError(f'position_m must be between 0 and {route["length_m"]}')
+            if direction not in (-1, 1):
+                raise ValueError('direction must be 1 or -1')
+            rows.append((device_id, route_id, position_m, direction))
+        
+        # A device sits on one route; placing it again moves it
+        cursor.executemany('''
+        INSERT INTO route_devices (device_id, route_id, position_m, direction) VALUES (?, ?, ?, ?)
+        ON CONFLICT (device_id) DO UPDATE SET
+            route_id = excluded.route_id, position_m = excluded.position_m, direction = excluded.direction
+        ''', rows)
+        conn.commit()
+        route_correlator.invalidate()
+        return jsonify({'route_id': route_id, 'placed': len(rows)})
+    
+    except Exception as e:
+        logger.error(f"Error in place_route_devices endpoint: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/routes/<route_id>/devices/<device_id>', methods=['DELETE'])
+@csrf.exempt
+@require_admin_token
+def remove_route_device(route_id, device_id):
+    """Take a device off a route"""
+    conn = get_db()
+    removed = conn.execute('DELETE FROM route_devices WHERE route_id = ? AND device_id = ?',
+                           (route_id, device_id)).rowcount
+    conn.commit()
+    route_correlator.invalidate()
+    return jsonify({'removed': removed}), 200 if removed else 404
+
+@app.route('/api/incidents', methods=['GET'])
+def list_incidents():
+    """Incidents, newest first, filtered by status, device_id and fault_type, paged with ?cursor="""
+    try:
+        conditions, params = [], []
+        for column in ('status', 'device_id', 'fault_type'):
+            if request.args.get(column):
+                conditions.append(f'i.{column} = ?')
+                params.append(request.args[column])
+        if request.args.get('status') not in (None, '', 'open', 'resolved'):
+            raise ValueError("status must be 'open' or 'resolved'")
+        if request.args.get('cursor'):
+            conditions.append('(i.opened_at, i.id) < (?, ?)')
+            params.extend(decode_cursor(request.args['cursor']))
+        where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+        limit = page_size()
+        
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+        SELECT i.*, d.name AS device_name
+        FROM incidents i LEFT JOIN devices d ON d.id = i.device_id
+        {where}
+        ORDER BY i.opened_at DESC, i.id DESC
+        LIMIT ?
+        ''', (*params, limit + 1))
+        return jsonify(cursor_page(cursor.fetchall(), limit, key='opened_at'))
+    
+    except Exception as e:
+        logger.error(f"Error in list_incidents endpoint: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/incidents/summary', methods=['GET'])
+def incidents_summary():
+    """Open incidents by fault type and device, plus 24 hour and 7 day resolution figures"""
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+        SELECT fault_type, COUNT(*) AS count FROM incidents
+        WHERE status = 'open'
+        GROUP BY fault_type
+        ''')
+        open_by_fault_type = {row['fault_type']: row['count'] for row in cursor.fetchall()}
+        
+        cursor.execute('''
+        SELECT i.device_id, d.name AS device_name, COUNT(*) AS open_incidents, MIN(i.opened_at) AS oldest_opened_at
+        FROM incidents i LEFT JOIN devices d ON d.id = i.device_id
+        WHERE i.status = 'open'
+        GROUP BY i.device_id
+        ORDER BY open_incidents DESC, oldest_opened_at
+        LIMIT 10
+        ''')
+        top_devices = [dict(row) for row in cursor.fetchall()]
+        
+        cursor.execute('''
+        SELECT
+            (SELECT COUNT(*) FROM incidents WHERE opened_at > datetime('now', '-1 day')) AS opened_24h,
+            (SELECT COUNT(*) FROM incidents
+             WHERE status = 'resolved' AND resolved_at > datetime('now', '-1 day')) AS resolved_24h,
+            (SELECT AVG(strftime('%s', resolved_at) - strftime('%s', opened_at)) FROM incidents
+             WHERE status = 'resolved' AND opened_at > datetime('now', '-7 day')) AS mean_time_to_resolve
+        ''')
+        recent = cursor.fetchone()
+        
+        return jsonify({
+            'open': sum(open_by_fault_type.values()),
+            'open_by_fault_type': open_by_fault_type,
+            'top_devices': top_devices,
+            'opened_24h': recent['opened_24h'],
+            'resolved_24h': recent['resolved_24h'],
+            'mean_time_to_resolve_seconds': recent['mean_time_to_resolve']
+        })
+    
+    except Exception as e:
+        logger.error(f"Error in incidents_summary endpoint: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/incidents/<int:incident_id>/resolve', methods=['POST'])
+@csrf.exempt
+@require_admin_token
+def resolve_incident(incident_id):
+    """Resolve an open incident by hand"""
+    resolved = incident_tracker.resolve(get_db(), incident_id)
+    return jsonify({'id': incident_id, 'resolved': resolved}), 200 if resolved else 404
+
 @app.route('/api/test-email', methods=['POST'])
 def test_email():
     """Test email configuration by sending a test email"""
     try:
-        if not EMAIL_ENABLED or not EMAIL_USERNAME or not EMAIL_PASSWORD:
+        if not EMAIL_ENABLED:
             return jsonify({'success': False, 'message': 'Email notifications are disabled or not configured'}), 400
         
         recipients = request.json.get('recipients', EMAIL_TO)
@@ -756,13 +4398,12 @@ def test_email():
         
         msg.attach(MIMEText(body, 'html'))
         
-        # Connect to server and send
-        server = smtplib.SMTP(EMAIL_SERVER, EMAIL_PORT)
-        if EMAIL_USE_TLS:
-            server.starttls()
-        server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
-        server.send_message(msg)
-        server.quit()
+        # Connect to server and send, using a fresh session to verify the configuration
+        smtp = SmtpSession()
+        try:
+            smtp.send(msg)
+        finally:
+            smtp.close()
         
         logger.info(f"Test email sent to {recipients}")
         
@@ -773,6 +4414,185 @@ def test_email():
         logger.error(f"Failed to send test email: {error_message}")
         return jsonify({'success': False, 'message': f'Failed to send test email: {error_message}'}), 500
 
+@app.cli.command('retention')
+@click.option('--days', type=int, default=None, help='Age in days of raw measurements to roll up (default RETENTION_DAYS)')
+@click.option('--dry-run', is_flag=True, help='Report what would be removed and reclaimed without changing anything')
+@click.option('--vacuum', is_flag=True, help='Run a full VACUUM afterwards, enabling incremental vacuum on older databases')
+def retention_command(days, dry_run, vacuum):
+    """Roll old raw measurements into hourly/daily rollups and reclaim their space"""
+    days = RETENTION_DAYS if days is None else days
+    if days <= 0:
+        raise click.UsageError('Set --days or RETENTION_DAYS to a positive number of days')
+    conn = get_db_connection()
+    cutoff = retention_cutoff(days)
+    if dry_run:
+        click.echo(json.dumps(retention_report(conn, cutoff), indent=2))
+    else:
+        click.echo(json.dumps(run_retention(conn, cutoff), indent=2))
+        if vacuum:
+            conn.execute('VACUUM')
+    conn.close()
+
+@app.cli.command('seal-partitions')
+@click.option('--month', default=None, help="Seal this month ('YYYY-MM') instead of every month past PARTITION_HOT_MONTHS")
+def seal_partitions_command(month):
+    """Move completed months of measurements into read-only partition files"""
+    if not PARTITION_DIR:
+        raise click.UsageError('Set PARTITION_DIR to enable partitioned storage')
+    conn = get_db_connection()
+    results = [seal_partition(conn, month)] if month else seal_partitions(conn)
+    click.echo(json.dumps(results, indent=2))
+    conn.close()
+
+@app.cli.command('archive-measurements')
+@click.argument('months', nargs=-1)
+@click.option('--archive-dir', default=None, help='Output directory (default ARCHIVE_DIR)')
+def archive_measurements_command(months, archive_dir):
+    """Write months ('YYYY-MM') as memory-mappable columnar archives; defaults to every sealed partition not yet archived"""
+    if not months:
+        months = [partition['month'] for partition in list_partitions()
+                  if not os.path.exists(archive_path(partition['month'], archive_dir))]
+    conn = get_db_connection()
+    for month in months:
+        click.echo(json.dumps(write_columnar_archive(conn, month, archive_dir)))
+    conn.close()
+
+@app.cli.command('score-archive')
+@click.argument('path')
+@click.option('--noise', default='hashed', type=click.Choice(CLASSIFIER_NOISE_MODES), help='Classifier noise mode')
+def score_archive_command(path, noise):
+    """Re-run the classifier over a columnar archive and compare with the stored fault types"""
+    archive = ColumnarArchive(path)
+    columns = archive.scan(('signal_power', 'attenuation', 'distance', 'timestamp', 'fault_code'))
+    predicted_counts = dict.fromkeys(FAULT_TYPES, 0)
+    changed = 0
+    started = time.perf_counter()
+    for start in range(0, len(archive), ARCHIVE_SCORE_CHUNK):
+        chunk = slice(start, start + ARCHIVE_SCORE_CHUNK)
+        predictions, _, _ = predict_fault_batch(columns['signal_power'][chunk], columns['attenuation'][chunk],
+                                                columns['distance'][chunk], noise, columns['timestamp'][chunk])
+        labels, counts = np.unique(predictions.astype(str), return_counts=True)
+        for label, count in zip(labels, counts):
+            predicted_counts[label] += int(count)
+        changed += int(np.count_nonzero(predictions != archive.fault_types(columns['fault_code'][chunk])))
+    elapsed = time.perf_counter() - started
+    click.echo(json.dumps({
+        'rows': len(archive),
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(len(archive) / elapsed) if elapsed else None,
+        'predicted': predicted_counts,
+        'changed': changed
+    }, indent=2))
+
+@app.cli.command('rescore')
+@click.option('--target', type=click.Choice(RESCORE_TARGETS), default='measurements',
+              help="Rewrite measurements in place, or store versioned results in measurement_scores")
+@click.option('--noise', default='hashed', type=click.Choice(CLASSIFIER_NOISE_MODES), help='Classifier noise mode')
+@click.option('--chunk-size', type=int, default=RESCORE_CHUNK_SIZE, help='Measurements per transaction')
+@click.option('--max-rows', type=int, default=None, help='Stop after this many measurements (resume later)')
+@click.option('--job', default=None, help='Checkpoint name (default: target and classifier version)')
+@click.option('--restart', is_flag=True, help='Ignore the saved checkpoint and start from the first measurement')
+def rescore_command(target, noise, chunk_size, max_rows, job, restart):
+    """Re-classify stored measurements with the current classifier"""
+    last_report = [0.0]
+
+    def progress(processed, written, elapsed):
+        if elapsed - last_report[0] >= 5:
+            last_report[0] = elapsed
+            click.echo(f'{processed} rows, {written} written, {processed / elapsed:.0f} rows/sec', err=True)
+
+    conn = get_db_connection()
+    result = rescore_measurements(conn, target, noise, job, restart, chunk_size, max_rows, progress)
+    conn.close()
+    click.echo(json.dumps(result, indent=2))
+
+@app.cli.command('convert-scaler')
+@click.option('--source', default=FEATURE_SCALER_PICKLE, help='StandardScaler pickle to convert')
+@click.option('--output', default=FEATURE_SCALER_PATH, help='npz file to write')
+def convert_scaler_command(source, output):
+    """
+    Convert the pickled feature scaler to a pickle-free .npz.
+
+    Reading the pickle needs joblib and scikit-learn, which nothing else in the
+    app uses: pip install -r requirements-models.txt
+    """
+    try:
+        arrays = read_scaler_pickle(source)
+    except ImportError as e:
+        raise click.ClickException(f'convert-scaler needs joblib and scikit-learn ({e}); '
+                                   'install them with pip install -r requirements-models.txt')
+    # Write next to the target and rename, so a watching worker never sees a partial file
+    tmp = output + '.tmp.npz'
+    np.savez(tmp, **arrays)
+    load_feature_scaler(tmp)
+    os.replace(tmp, output)
+    click.echo(json.dumps({'output': output, 'features': arrays['feature_names'].tolist()}))
+
+@app.cli.command('train-classifier')
+@click.option('--hidden', type=int, default=16, help='Hidden units (0 for a linear softmax model)')
+@click.option('--samples', type=int, default=200000, help='Synthetic training readings')
+@click.option('--epochs', type=int, default=20)
+@click.option('--output', default=MLP_WEIGHTS_PATH, help='Weights file to write')
+def train_classifier_command(hidden, samples, epochs, output):
+    """Fit the mlp backend's weights to the rule-based labels"""
+    mean, scale = load_feature_scaler(FEATURE_SCALER_PATH)
+    layers, accuracy = train_mlp(mean, scale, hidden, samples, epochs)
+    arrays = {'classes': np.array(FAULT_TYPES)}
+    for index, (weight, bias) in enumerate(layers):
+        arrays[f'W{index}'] = weight
+        arrays[f'b{index}'] = bias
+    tmp = output + '.tmp.npz'
+    np.savez(tmp, **arrays)
+    os.replace(tmp, output)
+    click.echo(json.dumps({'output': output, 'layers': [list(weight.shape) for weight, _ in layers],
+                           'training_accuracy': round(accuracy, 4)}))
+
+@app.cli.command('benchmark-classifier')
+@click.option('--rows', type=int, default=10000, help='Readings classified in one batch')
+@click.option('--single', type=int, default=1000, help='Readings classified one call at a time')
+def benchmark_classifier_command(rows, single):
+    """Compare per-row and batched latency of the classifier backends"""
+    rng = np.random.default_rng(0)
+    signal_power = rng.uniform(-60, -5, rows)
+    attenuation = rng.uniform(0, 3, rows)
+    distance = rng.uniform(0, 10000, rows)
+    timestamps = np.full(rows, np.datetime64('2024-01-01T12:00:00'))
+
+    backends = [RulesBackend()]
+    try:
+        backends.append(build_classifier_backend('mlp'))
+    except MODEL_LOAD_ERRORS as e:
+        click.echo(f'mlp backend unavailable: {str(e)}', err=True)
+
+    results = []
+    for backend in backends:
+        count = min(single, rows)
+        started = time.perf_counter()
+        for index in range(count):
+            backend.classify(signal_power[index:index + 1], attenuation[index:index + 1],
+                             distance[index:index + 1], timestamps[index:index + 1])
+        per_row = (time.perf_counter() - started) / count
+        started = time.perf_counter()
+        backend.classify(signal_power, attenuation, distance, timestamps)
+        batched = (time.perf_counter() - started) / rows
+        results.append({
+            'backend': backend.version(),
+            'per_row_us': round(per_row * 1e6, 2),
+            'batched_us_per_row': round(batched * 1e6, 3),
+            'speedup': round(per_row / batched, 1) if batched else None
+        })
+    click.echo(json.dumps(results, indent=2))
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute the materialized dashboard statistics"""
+    conn = get_db_connection()
+    conn.execute('BEGIN IMMEDIATE')
+    rebuild_stats(conn)
+    conn.commit()
+    conn.close()
+    logger.info("Dashboard statistics rebuilt")
+
 def generate_api_key():
     """Generate a secure API key"""
     # Create a random string
@@ -800,7 +4620,7 @@ def signup():
         
         try:
             # Connect to the database and insert user
-            conn = get_db_connection()
+            conn = get_db()
             cursor = conn.cursor()
             
             # Check if the email already exists in the database
@@ -823,8 +4643,6 @@ def signup():
             
         except sqlite3.Error as e:
             flash(f'Error: {e}', 'danger')  # Show the error if any SQLite error occurs
-        finally:
-            conn.close()  # Always close the database connection
 
     return render_template('signup.html', form=form)  # Pass the 'form' to the template
 from flask_wtf import FlaskForm
@@ -843,11 +4661,10 @@ def login():
         password = form.password.data
         
         # Query the database for the user
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM users WHERE email = ?', (email,))
         user = cursor.fetchone()
-        conn.close()
 
         if user and check_password_hash(user['password'], password):  # Check if password matches
             # User is authenticated
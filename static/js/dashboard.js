@@ -3,34 +3,113 @@ document.addEventListener('DOMContentLoaded', function() {
     let faultDistributionChart = null;
     let signalPowerChart = null;
     
+    // Latest statistics and measurements, kept current by the live stream
+    const MAX_RECENT = 20;
+    let currentStats = null;
+    let recentMeasurements = [];
+    
     // Load dashboard data
     loadDashboardData();
     
-    // Refresh data every 30 seconds
-    setInterval(loadDashboardData, 30000);
+    // Receive live updates, falling back to polling every 30 seconds
+    if (window.EventSource) {
+        connectLiveStream();
+    } else {
+        setInterval(loadDashboardData, 30000);
+    }
+    
+    function connectLiveStream() {
+        const stream = new EventSource('/api/data/stream');
+        let disconnected = false;
+        
+        stream.addEventListener('open', function() {
+            // Resync anything missed while the stream was down
+            if (disconnected) {
+                disconnected = false;
+                loadDashboardData();
+            }
+        });
+        
+        stream.addEventListener('error', function() {
+            disconnected = true;
+        });
+        
+        stream.addEventListener('measurements', function(event) {
+            addMeasurements(JSON.parse(event.data));
+        });
+        
+        stream.addEventListener('stats', function(event) {
+            applyStatsDelta(JSON.parse(event.data));
+        });
+    }
     
     async function loadDashboardData() {
         try {
             // Load statistics
             const statsResponse = await fetch('/api/data/stats');
             if (statsResponse.ok) {
-                const statsData = await statsResponse.json();
-                updateStats(statsData);
-                updateFaultDistributionChart(statsData.fault_distribution);
+                currentStats = await statsResponse.json();
+                updateStats(currentStats);
+                updateFaultDistributionChart(currentStats.fault_distribution);
             }
             
             // Load recent measurements
-            const measurementsResponse = await fetch('/api/data/recent?limit=20');
+            const measurementsResponse = await fetch(`/api/data/recent?limit=${MAX_RECENT}`);
             if (measurementsResponse.ok) {
-                const measurementsData = await measurementsResponse.json();
-                updateRecentMeasurements(measurementsData);
-                updateSignalPowerChart(measurementsData);
+                recentMeasurements = await measurementsResponse.json();
+                updateRecentMeasurements(recentMeasurements);
+                updateSignalPowerChart(recentMeasurements);
             }
         } catch (error) {
             console.error('Error loading dashboard data:', error);
         }
     }
     
+    function addMeasurements(measurements) {
+        // Newest first, as returned by /api/data/recent
+        measurements.sort((a, b) => b.id - a.id);
+        recentMeasurements = measurements.concat(recentMeasurements).slice(0, MAX_RECENT);
+        updateRecentMeasurements(recentMeasurements);
+        
+        if (!signalPowerChart) {
+            updateSignalPowerChart(recentMeasurements);
+            return;
+        }
+        
+        // Append the new points and drop the oldest ones
+        const chartData = signalPowerChart.data;
+        measurements.slice().reverse().forEach(m => {
+            chartData.labels.push(new Date(m.timestamp).toLocaleTimeString());
+            chartData.datasets[0].data.push(m.signal_power);
+        });
+        while (chartData.labels.length > MAX_RECENT) {
+            chartData.labels.shift();
+            chartData.datasets[0].data.shift();
+        }
+        signalPowerChart.update();
+    }
+    
+    function applyStatsDelta(delta) {
+        if (!currentStats) {
+            return;
+        }
+        
+        ['device_count', 'measurement_count', 'notification_count', 'recent_alerts'].forEach(key => {
+            if (delta[key]) {
+                currentStats[key] = (currentStats[key] || 0) + delta[key];
+            }
+        });
+        
+        if (delta.fault_distribution) {
+            Object.entries(delta.fault_distribution).forEach(([type, count]) => {
+                currentStats.fault_distribution[type] = (currentStats.fault_distribution[type] || 0) + count;
+            });
+            updateFaultDistributionChart(currentStats.fault_distribution);
+        }
+        
+        updateStats(currentStats);
+    }
+    
     function updateStats(data) {
         document.getElementById('deviceCount').textContent = data.device_count;
         document.getElementById('measurementCount').textContent = data.measurement_count;
@@ -48,13 +127,6 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     function updateFaultDistributionChart(faultDistribution) {
-        const ctx = document.getElementById('faultDistributionChart').getContext('2d');
-        
-        // Destroy previous chart if it exists
-        if (faultDistributionChart) {
-            faultDistributionChart.destroy();
-        }
-        
         // Prepare data for chart
         const labels = Object.keys(faultDistribution);
         const data = Object.values(faultDistribution);
@@ -67,6 +139,18 @@ document.addEventListener('DOMContentLoaded', function() {
             'Splice Loss': 'rgba(59, 130, 246, 0.7)'
         };
         
+        // Update the existing chart in place
+        if (faultDistributionChart) {
+            faultDistributionChart.data.labels = labels;
+            faultDistributionChart.data.datasets[0].data = data;
+            faultDistributionChart.data.datasets[0].backgroundColor =
+                labels.map(label => backgroundColors[label] || 'rgba(156, 163, 175, 0.7)');
+            faultDistributionChart.update();
+            return;
+        }
+        
+        const ctx = document.getElementById('faultDistributionChart').getContext('2d');
+        
         // Create chart
         faultDistributionChart = new Chart(ctx, {
             type: 'pie',
@@ -102,15 +186,8 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     function updateSignalPowerChart(measurements) {
-        const ctx = document.getElementById('signalPowerChart').getContext('2d');
-        
-        // Destroy previous chart if it exists
-        if (signalPowerChart) {
-            signalPowerChart.destroy();
-        }
-        
         // Sort measurements by timestamp
-        measurements.sort((a, b) => new Date(a.timestamp) - new Date(b.timestamp));
+        measurements = measurements.slice().sort((a, b) => new Date(a.timestamp) - new Date(b.timestamp));
         
         // Prepare data for chart
         const labels = measurements.map(m => {
@@ -120,6 +197,16 @@ document.addEventListener('DOMContentLoaded', function() {
         
         const signalPowerData = measurements.map(m => m.signal_power);
         
+        // Update the existing chart in place
+        if (signalPowerChart) {
+            signalPowerChart.data.labels = labels;
+            signalPowerChart.data.datasets[0].data = signalPowerData;
+            signalPowerChart.update();
+            return;
+        }
+        
+        const ctx = document.getElementById('signalPowerChart').getContext('2d');
+        
         // Create chart
         signalPowerChart = new Chart(ctx, {
             type: 'line',
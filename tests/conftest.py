@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# fiber reads its configuration at import time, so point it at a scratch database first
+TEST_DIR = tempfile.mkdtemp(prefix='fiber-tests-')
+os.environ.update({
+    'DB_PATH': os.path.join(TEST_DIR, 'fiber.db'),
+    'EMAIL_ENABLED': 'false',
+    'PARTITION_DIR': '',
+    'ANOMALY_DETECTION': 'false',
+    'ARCHIVE_DIR': os.path.join(TEST_DIR, 'archive'),
+    'QUERY_PLAN_CHECK': 'false',
+    'MODEL_RELOAD_INTERVAL': '0',
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fiber  # noqa: E402
+
+fiber.app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+
+
+@pytest.fixture
+def client():
+    return fiber.app.test_client()
+
+
+@pytest.fixture
+def db():
+    with fiber.db_connection() as conn:
+        yield conn
+
+
+@pytest.fixture
+def make_device(db):
+    """Register a device directly in the database and return its registry record"""
+    def make(alert_threshold=0.5, alert_email=None, alert_debounce=None):
+        device_id = str(uuid.uuid4())
+        db.execute('''
+        INSERT INTO devices (id, name, api_key, alert_threshold, alert_email, alert_debounce)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''', (device_id, f'device-{device_id[:8]}', uuid.uuid4().hex, alert_threshold, alert_email, alert_debounce))
+        db.commit()
+        return fiber.device_registry.get_by_id(device_id)
+    return make
+
+
+@pytest.fixture
+def scratch_db(monkeypatch, tmp_path):
+    """Point the app at an empty database of its own, for tests that must see every row"""
+    monkeypatch.setattr(fiber, 'DB_PATH', str(tmp_path / 'scratch.db'))
+    monkeypatch.setattr(fiber, 'db_pool', fiber.ConnectionPool(fiber.get_db_connection, fiber.DB_POOL_SIZE))
+    fiber.init_db()
+    yield
+    fiber.db_pool.close_all()
+
+
+@pytest.fixture
+def store_rows(db):
+    """Insert measurement rows as (device_id, timestamp, signal_power, attenuation, distance, fault_type, confidence)"""
+    def store(rows):
+        db.executemany('''
+        INSERT INTO measurements (device_id, timestamp, signal_power, attenuation, distance, fault_type, confidence)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        db.commit()
+    return store
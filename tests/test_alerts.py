@@ -0,0 +1,185 @@
+import time
+
+import pytest
+
+import fiber
+
+FIBER_BREAK = {'signal_power': -45.0, 'attenuation': 2.5, 'distance': 120.0}
+
+
+def device(alert_debounce=None, device_id='device-1'):
+    return {'id': device_id, 'alert_threshold': 0.5, 'alert_debounce': alert_debounce}
+
+
+@pytest.fixture
+def debouncer():
+    return fiber.AlertDebouncer(4, fiber.ALERT_DEBOUNCE_MAX_WINDOW)
+
+
+def test_debouncer_counts_votes_over_the_window(debouncer):
+    sensor = device('{"default": [2, 3], "Fiber Break": [1, 1]}')
+    assert debouncer.votes(sensor, 'High Loss') == (0, 2, 3)
+
+    for fault_type, confidence in (('High Loss', 0.9), ('No Fault', 0.9), ('High Loss', 0.9)):
+        debouncer.observe(sensor, fault_type, confidence)
+    assert debouncer.votes(sensor, 'High Loss') == (2, 2, 3)
+
+    # Readings below the alert threshold don't vote
+    debouncer.observe(sensor, 'High Loss', 0.3)
+    debouncer.observe(sensor, 'High Loss', 0.3)
+    assert debouncer.votes(sensor, 'High Loss') == (1, 2, 3)
+
+    debouncer.observe(sensor, 'Fiber Break', 0.9)
+    assert debouncer.votes(sensor, 'Fiber Break') == (1, 1, 1)
+    assert debouncer.votes(sensor, 'Drift') == (1, 1, 1)
+
+
+def test_debouncer_applies_per_device_rules(debouncer):
+    sensor = device('{"High Loss": [3, 5]}')
+    for _ in range(6):
+        debouncer.observe(sensor, 'High Loss', 0.9)
+    assert debouncer.votes(sensor, 'High Loss') == (5, 3, 5)
+    # Everything else keeps the default, which alerts on every faulty reading
+    assert debouncer.votes(sensor, 'Splice Loss') == (0, 1, 1)
+    assert debouncer.votes(device(device_id='device-2'), 'High Loss') == (0, 1, 1)
+
+
+def test_debouncer_reports_more_severe_alerts_in_cooldown(debouncer):
+    now = time.time()
+    debouncer.record_alert('device-1', 'Fiber Break', now)
+
+    assert debouncer.outranked_by('device-1', 'High Loss', now + 1) == 'Fiber Break'
+    assert debouncer.outranked_by('device-1', 'Fiber Break', now + 1) is None
+    assert debouncer.outranked_by('device-2', 'High Loss', now + 1) is None
+    later = now + fiber.notification_cooldown('Fiber Break') + 1
+    assert debouncer.outranked_by('device-1', 'High Loss', later) is None
+
+
+def test_spikes_hold_back_only_debounced_faults():
+    spike, debounced = {'spike': True}, device('{"default": [2, 3], "Fiber Break": [1, 1]}')
+    assert fiber.held_back_as_spike(debounced, 'High Loss', spike)
+    assert not fiber.held_back_as_spike(debounced, 'Fiber Break', spike)
+    assert not fiber.held_back_as_spike(debounced, 'High Loss', {'spike': False})
+    assert not fiber.held_back_as_spike(debounced, 'High Loss', None)
+    assert not fiber.held_back_as_spike(debounced, 'No Fault', spike)
+    assert not fiber.held_back_as_spike(device(), 'High Loss', spike)
+    assert fiber.held_back_as_spike(device('{"Fiber Break": [2, 3]}'), 'Fiber Break', spike)
+
+
+def test_ingestion_alerts_once_the_device_rule_is_met(client, make_device, monkeypatch):
+    monkeypatch.setattr(fiber, 'EMAIL_ENABLED', True)
+    monkeypatch.setattr(fiber, 'EMAIL_TO', ['ops@example.com'])
+    monkeypatch.setattr(fiber, 'cooldown_store', fiber.MemoryCooldownStore())
+    queued = []
+    monkeypatch.setattr(fiber.notification_dispatcher, 'enqueue', lambda alert: queued.append(alert) or True)
+    sensor = make_device(alert_debounce='{"High Loss": [2, 2]}')
+    high_loss = {'signal_power': -40.0, 'attenuation': 1.6, 'distance': 10.0}
+
+    for expected in (0, 1):
+        client.post('/api/measurements', json=high_loss, headers={'X-API-Key': sensor['api_key']})
+        assert len(queued) == expected
+
+    # Without a rule of its own, a device alerts on its first faulty reading
+    client.post('/api/measurements', json=high_loss, headers={'X-API-Key': make_device()['api_key']})
+    assert len(queued) == 2
+
+
+def fault(measurement_id, fault_type='High Loss', confidence=0.9):
+    return (fault_type, confidence, measurement_id, -45.0, 2.5)
+
+
+def healthy(measurement_id):
+    return ('No Fault', 0.9, measurement_id, -20.0, 0.4)
+
+
+def incident(db, incident_id):
+    return dict(db.execute('SELECT * FROM incidents WHERE id = ?', (incident_id,)).fetchone())
+
+
+def observe(tracker, db, sensor, readings):
+    incident_ids = tracker.observe(db, sensor, readings)
+    db.commit()
+    return incident_ids
+
+
+def test_incident_groups_faults_until_recovery(db, make_device):
+    tracker = fiber.IncidentTracker(2, 3600, 3600)
+    sensor = make_device()
+
+    first, second, low = observe(tracker, db, sensor, [fault(1), fault(2), fault(3, confidence=0.3)])
+    assert first is not None and first == second
+    assert low is None
+    assert observe(tracker, db, sensor, [fault(4)]) == [first]
+    row = incident(db, first)
+    assert (row['status'], row['measurement_count']) == ('open', 3)
+    assert (row['first_measurement_id'], row['last_measurement_id']) == (1, 4)
+
+    assert observe(tracker, db, sensor, [healthy(5)]) == [None]
+    assert incident(db, first)['status'] == 'open'
+    observe(tracker, db, sensor, [healthy(6)])
+    row = incident(db, first)
+    assert (row['status'], row['resolution']) == ('resolved', 'recovered')
+
+    # A reading below the alert threshold counts as a clear one
+    reopened, _, _ = observe(tracker, db, sensor, [fault(7), fault(8, confidence=0.3), healthy(9)])
+    assert reopened not in (None, first)
+    assert incident(db, reopened)['status'] == 'resolved'
+
+
+def test_incidents_are_tracked_per_fault_type(db, make_device):
+    tracker = fiber.IncidentTracker(2, 3600, 3600)
+    sensor = make_device()
+
+    loss, brk = observe(tracker, db, sensor, [fault(1), fault(2, 'Fiber Break')])
+    assert loss != brk
+    # Each fault type's reading counts as a clear reading for the other
+    observe(tracker, db, sensor, [fault(3, 'Fiber Break')])
+    assert incident(db, loss)['status'] == 'resolved'
+    assert incident(db, brk)['status'] == 'open'
+
+
+def test_silent_incidents_time_out(db, make_device):
+    tracker = fiber.IncidentTracker(2, 0, 0)
+    sensor, other = make_device(), make_device()
+
+    opened, = observe(tracker, db, sensor, [fault(1)])
+    time.sleep(0.01)
+    observe(tracker, db, other, [healthy(2)])
+
+    row = incident(db, opened)
+    assert (row['status'], row['resolution']) == ('resolved', 'timeout')
+
+
+def test_trackers_in_different_processes_share_incidents(db, make_device):
+    mine, theirs = fiber.IncidentTracker(2, 3600, 3600), fiber.IncidentTracker(2, 3600, 3600)
+    sensor = make_device()
+
+    opened, = observe(mine, db, sensor, [fault(1)])
+    assert observe(theirs, db, sensor, [fault(2)]) == [opened]
+    assert incident(db, opened)['measurement_count'] == 2
+
+    # Resolved elsewhere: the next fault opens a new incident instead of updating the closed one
+    assert theirs.resolve(db, opened)
+    reopened, = observe(mine, db, sensor, [fault(3)])
+    assert reopened != opened
+    assert incident(db, opened)['resolution'] == 'manual'
+
+
+def test_incident_api(client, make_device, monkeypatch):
+    sensor = make_device()
+    posted = [client.post('/api/measurements', json=FIBER_BREAK, headers={'X-API-Key': sensor['api_key']}).json
+              for _ in range(2)]
+    incident_id = posted[0]['incident_id']
+    assert incident_id is not None and posted[1]['incident_id'] == incident_id
+
+    page = client.get(f"/api/incidents?status=open&device_id={sensor['id']}").json
+    assert [(item['id'], item['measurement_count']) for item in page['items']] == [(incident_id, 2)]
+    assert client.get('/api/incidents?status=closed').status_code == 400
+
+    resolve = f'/api/incidents/{incident_id}/resolve'
+    assert client.post(resolve).status_code == 403
+    monkeypatch.setattr(fiber, 'ADMIN_TOKEN', 'secret')
+    assert client.post(resolve, headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    assert client.post(resolve, headers={'X-Admin-Token': 'secret'}).json == {'id': incident_id, 'resolved': True}
+    assert client.post(resolve, headers={'X-Admin-Token': 'secret'}).status_code == 404
+    assert client.get(f"/api/incidents?status=open&device_id={sensor['id']}").json['items'] == []
@@ -0,0 +1,98 @@
+import pytest
+
+import fiber
+
+HEALTHY = {'signal_power': -20.0, 'attenuation': 0.4, 'distance': 100.0}
+HIGH_LOSS = {'signal_power': -40.0, 'attenuation': 1.6, 'distance': 10.0}
+FIBER_BREAK = {'signal_power': -45.0, 'attenuation': 2.5, 'distance': 120.0}
+
+
+def warm_up(detector, device_id, readings=fiber.ANOMALY_WARMUP + 5):
+    for index in range(readings):
+        result = detector.update(device_id, -20.0 - 0.2 * (index % 2), 0.4 + 0.01 * (index % 2))
+    return result
+
+
+def test_isolated_spike_is_told_apart_from_a_change():
+    detector = fiber.AnomalyDetector(10)
+    assert not fiber.AnomalyDetector(10).update('d', -20.0, 0.4)['ready']
+    result = warm_up(detector, 'd')
+    assert result['ready'] and not result['spike'] and result['drift'] == []
+
+    assert detector.update('d', -45.0, 2.5)['spike']
+    assert not detector.update('d', -20.1, 0.4)['spike']
+    # The outlier stayed out of the baseline
+    assert detector.state('d')['signal_power']['mean'] == pytest.approx(-20.1, abs=0.2)
+
+    assert detector.update('d', -45.0, 2.5)['spike']
+    assert not detector.update('d', -45.0, 2.5)['spike']  # a second outlier soon after is a real change
+    assert detector.state('d')['signal_power']['mean'] == pytest.approx(-45.0)
+
+
+def test_slow_drift_raises_drift_alerts():
+    detector = fiber.AnomalyDetector(10)
+    warm_up(detector, 'd')
+    drift = []
+    for step in range(1, 60):
+        result = detector.update('d', -20.0 - 0.1 * step, 0.4 + 0.01 * step)
+        assert not result['spike']
+        drift += result['drift']
+    assert {'Signal Drift', 'Attenuation Drift'} <= set(drift)
+
+
+def test_capacity_evicts_the_least_recently_seen_device():
+    detector = fiber.AnomalyDetector(2)
+    for device_id in ('a', 'b', 'a', 'c'):
+        detector.update(device_id, -20.0, 0.4)
+    assert detector.state('b') is None
+    assert detector.state('a')['readings'] == 2
+    assert detector.state('c')['readings'] == 1
+
+
+@pytest.fixture
+def alerts(monkeypatch):
+    """Turn anomaly detection and email on, capturing the queued alerts"""
+    monkeypatch.setattr(fiber, 'ANOMALY_DETECTION', True)
+    monkeypatch.setattr(fiber, 'anomaly_detector', fiber.AnomalyDetector(10))
+    monkeypatch.setattr(fiber, 'EMAIL_ENABLED', True)
+    monkeypatch.setattr(fiber, 'EMAIL_TO', ['ops@example.com'])
+    monkeypatch.setattr(fiber, 'cooldown_store', fiber.MemoryCooldownStore())
+    queued = []
+    monkeypatch.setattr(fiber.notification_dispatcher, 'enqueue', lambda alert: queued.append(alert) or True)
+    return queued
+
+
+def post(client, device, reading):
+    response = client.post('/api/measurements', json=reading, headers={'X-API-Key': device['api_key']})
+    assert response.status_code == 200
+    return response.json
+
+
+def test_a_single_fiber_break_reading_alerts(client, make_device, alerts):
+    device = make_device()
+    client.post('/api/measurements/batch', json=[HEALTHY] * (fiber.ANOMALY_WARMUP + 5),
+                headers={'X-API-Key': device['api_key']})
+
+    assert post(client, device, FIBER_BREAK)['fault_type'] == 'Fiber Break'
+    assert fiber.anomaly_detector.state(device['id'])['consecutive_outliers'] == 1
+    assert [alert['fault_type'] for alert in alerts] == ['Fiber Break']
+
+
+def test_other_faults_on_a_spike_wait_for_the_next_reading(client, make_device, alerts):
+    device = make_device(alert_debounce='{"High Loss": [2, 3]}')
+    client.post('/api/measurements/batch', json=[HEALTHY] * (fiber.ANOMALY_WARMUP + 5),
+                headers={'X-API-Key': device['api_key']})
+
+    post(client, device, HIGH_LOSS)
+    assert alerts == []
+    post(client, device, HIGH_LOSS)
+    # The sustained shift also trips the drift detectors, which alert on their own
+    assert alerts[0]['fault_type'] == 'High Loss'
+
+
+def test_slot_tables_must_reset_their_slots():
+    class Partial(fiber.DeviceSlotTable):
+        pass
+
+    with pytest.raises(TypeError):
+        Partial(4)
@@ -0,0 +1,209 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import fiber
+
+# (signal_power, attenuation, distance) -> the rule that must fire, including the rule boundaries
+READINGS = [
+    ((-45.0, 2.5, 120.0), 'Fiber Break'),
+    ((-40.5, 1.6, 10.0), 'Fiber Break'),
+    ((-45.0, 1.5, 10.0), 'No Fault'),
+    ((-40.0, 1.6, 10.0), 'High Loss'),
+    ((-35.0, 1.1, 10.0), 'High Loss'),
+    ((-30.0, 1.6, 10.0), 'No Fault'),
+    ((-25.0, 1.0, 10.0), 'Splice Loss'),
+    ((-30.0, 1.5, 10.0), 'Splice Loss'),
+    ((-25.0, 0.5, 10.0), 'No Fault'),
+    ((-20.0, 0.4, 100.0), 'No Fault'),
+]
+
+
+def test_batch_classification_applies_the_rules():
+    signal_power, attenuation, distance = np.array([reading for reading, _ in READINGS]).T
+    predictions, probabilities, confidences = fiber.predict_fault_batch(signal_power, attenuation, distance)
+
+    assert list(predictions) == [label for _, label in READINGS]
+    assert probabilities.shape == (len(READINGS), len(fiber.FAULT_TYPES))
+    assert np.allclose(probabilities.sum(axis=1), 1.0)
+    assert np.array_equal(confidences, probabilities.max(axis=1))
+
+
+def test_single_prediction_matches_the_batch():
+    for reading, label in READINGS:
+        prediction, probabilities, confidence = fiber.predict_fault(*reading)
+        assert prediction == label
+        assert list(probabilities) == list(fiber.FAULT_TYPES)
+        assert confidence == probabilities[label]
+
+
+def columns(readings):
+    return np.array(readings, dtype=np.float64).T.copy()
+
+
+def test_noise_off_returns_the_rule_probabilities():
+    signal_power, attenuation, distance = columns([reading for reading, _ in READINGS])
+    _, probabilities, _ = fiber.predict_fault_batch(signal_power, attenuation, distance, 'off')
+
+    rules = [fiber.FAULT_TYPES.index(label) for _, label in READINGS]
+    expected = fiber.RULE_PROBABILITIES[rules]
+    assert np.allclose(probabilities, expected / expected.sum(axis=1, keepdims=True))
+
+
+def test_hashed_noise_is_a_function_of_the_reading():
+    readings = [reading for reading, _ in READINGS]
+    first = fiber.predict_fault_batch(*columns(readings), 'hashed')
+    # Same readings in another order and batch size
+    second = fiber.predict_fault_batch(*columns(readings[::-1]), 'hashed')
+
+    assert np.array_equal(first[1], second[1][::-1])
+    assert not np.allclose(first[1], fiber.predict_fault_batch(*columns(readings), 'off')[1])
+    assert fiber.predict_fault(0.0, -0.0, 1.0, 'hashed')[2] == fiber.predict_fault(-0.0, 0.0, 1.0, 'hashed')[2]
+    assert fiber.is_classifier_deterministic('hashed') and fiber.is_classifier_deterministic('off')
+    assert not fiber.is_classifier_deterministic('seeded')
+
+
+def test_seeded_noise_repeats_from_the_seed(monkeypatch):
+    readings = columns([reading for reading, _ in READINGS])
+    runs = []
+    for _ in range(2):
+        monkeypatch.setattr(fiber, 'classifier_rng', np.random.default_rng(fiber.CLASSIFIER_SEED))
+        runs.append(fiber.predict_fault_batch(*readings, 'seeded')[1])
+    assert np.array_equal(runs[0], runs[1])
+
+
+def cache_inputs():
+    rng = np.random.default_rng(7)
+    # Readings at the 0.01 reporting resolution, repeated, plus finer ones that must bypass the cache
+    coarse = np.round(rng.uniform([-50, 0, 0], [-10, 3, 500], size=(200, 3)), 2)
+    fine = rng.uniform([-50, 0, 0], [-10, 3, 500], size=(50, 3))
+    # Rounds to a High Loss reading at the cache resolution, but is a Fiber Break itself
+    return columns(np.concatenate([coarse, coarse, fine, [[-40.004, 1.6, 1.0]]]))
+
+
+def test_cached_classifications_are_identical_to_uncached(monkeypatch):
+    readings = cache_inputs()
+    for noise in ('hashed', 'off'):
+        monkeypatch.setattr(fiber, 'classification_cache', fiber.ClassificationCache(1000))
+        expected = fiber.classify_rules(*readings, noise)
+        for _ in range(2):
+            cached = fiber.classify_cached(fiber.RulesBackend(), *readings, noise)
+            assert list(cached[0]) == list(expected[0])
+            assert cached[1].tobytes() == expected[1].tobytes()
+            assert cached[2].tobytes() == expected[2].tobytes()
+        assert cached[0][-1] == 'Fiber Break'
+
+        stats = fiber.classification_cache.stats()
+        assert stats['hits'] == 400
+        assert stats['bypassed'] == 2 * 51
+
+
+def test_cache_keys_include_the_noise_mode(monkeypatch):
+    monkeypatch.setattr(fiber, 'classification_cache', fiber.ClassificationCache(1000))
+    readings = columns([(-45.0, 2.5, 120.0)])
+    hashed = fiber.classify_cached(fiber.RulesBackend(), *readings, 'hashed')
+    off = fiber.classify_cached(fiber.RulesBackend(), *readings, 'off')
+
+    assert fiber.classification_cache.stats()['hits'] == 0
+    assert hashed[1].tobytes() != off[1].tobytes()
+    rules = fiber.RulesBackend()
+    assert fiber.classification_cache_enabled('hashed', rules) and not fiber.classification_cache_enabled('random', rules)
+
+
+# Stand-in for the pickled StandardScaler, whose loader needs joblib
+MEAN = np.array([-30.0, 1.5, 250.0, 11.5, 16.0, 3.0])
+SCALE = np.array([15.0, 0.9, 150.0, 7.0, 9.0, 2.0])
+
+
+def save_weights(path, layers, classes=fiber.FAULT_TYPES):
+    arrays = {'classes': np.array(classes)}
+    for index, (weight, bias) in enumerate(layers):
+        arrays[f'W{index}'] = weight
+        arrays[f'b{index}'] = bias
+    np.savez(path, **arrays)
+
+
+def test_mlp_backend_learns_the_rules(monkeypatch, tmp_path):
+    layers, accuracy = fiber.train_mlp(MEAN, SCALE, hidden=16, samples=20000, epochs=15)
+    assert accuracy > 0.9
+
+    save_weights(tmp_path / 'mlp.npz', layers)
+    monkeypatch.setattr(fiber, 'load_feature_scaler', lambda path: (MEAN, SCALE))
+    backend = fiber.MlpBackend.load('scaler.pkl', tmp_path / 'mlp.npz')
+    assert backend.version().startswith('mlp-')
+    assert backend.version() == fiber.MlpBackend.load('scaler.pkl', tmp_path / 'mlp.npz').version()
+
+    signal_power, attenuation, distance = columns([(-45.0, 2.5, 120.0), (-20.0, 0.4, 100.0)])
+    labels, probabilities, confidences = backend.classify(signal_power, attenuation, distance,
+                                                          ['2026-01-01T10:00:00', '2026-01-01T22:00:00'])
+    assert list(labels) == ['Fiber Break', 'No Fault']
+    assert np.allclose(probabilities.sum(axis=1), 1.0)
+    assert np.array_equal(confidences, probabilities.max(axis=1))
+
+
+def test_mlp_backend_rejects_mismatched_weights(monkeypatch, tmp_path):
+    monkeypatch.setattr(fiber, 'load_feature_scaler', lambda path: (MEAN, SCALE))
+    layers = [(np.zeros((6, 4)), np.zeros(4))]
+    save_weights(tmp_path / 'reordered.npz', layers, fiber.FAULT_TYPES[::-1])
+    save_weights(tmp_path / 'narrow.npz', [(np.zeros((6, 3)), np.zeros(3))])
+
+    for name in ('reordered.npz', 'narrow.npz'):
+        with pytest.raises(ValueError):
+            fiber.MlpBackend.load('scaler.pkl', tmp_path / name)
+
+
+def test_shipped_mlp_artifacts_load_without_pickle():
+    backend = fiber.build_classifier_backend('mlp')
+    signal_power, attenuation, distance = columns([(-45.0, 2.5, 120.0), (-20.0, 0.4, 100.0), (-25.0, 1.0, 10.0)])
+    labels, _, _ = backend.classify(signal_power, attenuation, distance, ['2026-01-01T10:00:00'] * 3)
+
+    assert list(labels) == ['Fiber Break', 'No Fault', 'Splice Loss']
+    # Time features make its output depend on more than the reading triple
+    assert not fiber.classification_cache_enabled(None, backend)
+
+
+@pytest.fixture
+def model_dir(monkeypatch, tmp_path):
+    for name in ('feature_scaler.npz', 'fault_mlp.npz'):
+        shutil.copy(os.path.join(fiber.MODEL_DIR, name), tmp_path / name)
+    monkeypatch.setattr(fiber, 'FEATURE_SCALER_PATH', str(tmp_path / 'feature_scaler.npz'))
+    monkeypatch.setattr(fiber, 'MLP_WEIGHTS_PATH', str(tmp_path / 'fault_mlp.npz'))
+    return tmp_path
+
+
+def replace_weights(path, layers, mtime):
+    save_weights(path, layers)
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_registry_hot_reloads_changed_weights(model_dir):
+    registry = fiber.ModelRegistry('mlp', 0)
+    registry.load()
+    shipped = registry.backend
+    assert shipped.name == 'mlp'
+    assert not registry.reload()
+
+    layers, _ = fiber.train_mlp(shipped.mean, shipped.scale, hidden=0, samples=2000, epochs=1)
+    replace_weights(model_dir / 'fault_mlp.npz', layers, 10 ** 18)
+    assert registry.reload()
+    assert registry.backend is not shipped
+    assert registry.backend.version() != shipped.version()
+
+    # A broken replacement leaves the last good model serving and is not retried until it changes
+    serving = registry.backend
+    (model_dir / 'fault_mlp.npz').write_bytes(b'not a model')
+    with pytest.raises(fiber.MODEL_LOAD_ERRORS):
+        registry.reload()
+    assert registry.backend is serving
+    assert registry.status()['last_error']
+    assert not registry.reload()
+
+
+def test_registry_falls_back_to_rules(model_dir):
+    os.remove(model_dir / 'feature_scaler.npz')
+    registry = fiber.ModelRegistry('mlp', 0)
+    registry.load()
+    assert registry.backend.name == 'rules'
+    assert registry.status()['configured'] == 'mlp'
@@ -0,0 +1,39 @@
+import sqlite3
+
+import pytest
+
+import fiber
+
+
+def test_connections_use_wal_and_busy_timeout(db):
+    assert db.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert db.execute('PRAGMA busy_timeout').fetchone()[0] == fiber.DB_BUSY_TIMEOUT * 1000
+
+
+def test_pool_reuses_released_connections():
+    pool = fiber.ConnectionPool(fiber.get_db_connection, 1)
+    first = pool.acquire()
+    pool.release(first)
+    assert pool.acquire() is first
+
+    second = pool.acquire()
+    pool.release(first)
+    pool.release(second)  # over the pool size, so closed
+    with pytest.raises(sqlite3.ProgrammingError):
+        second.execute('SELECT 1')
+    pool.close_all()
+
+
+def test_released_connections_lose_open_transactions(make_device):
+    make_device()
+    pool = fiber.ConnectionPool(fiber.get_db_connection, 1)
+    conn = pool.acquire()
+    conn.execute('DELETE FROM devices')
+    assert conn.in_transaction
+    pool.release(conn)
+
+    conn = pool.acquire()
+    assert not conn.in_transaction
+    assert conn.execute('SELECT COUNT(*) FROM devices').fetchone()[0] > 0
+    pool.release(conn)
+    pool.close_all()
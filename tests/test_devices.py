@@ -0,0 +1,37 @@
+import fiber
+
+
+def rename(db, device, name):
+    db.execute('UPDATE devices SET name = ? WHERE id = ?', (name, device['id']))
+    db.commit()
+
+
+def test_registry_serves_cached_records_until_invalidated(make_device, db):
+    device = make_device()
+    registry = fiber.DeviceRegistry(ttl=3600)
+    assert registry.get_by_api_key(device['api_key']) == device
+
+    rename(db, device, 'renamed')
+    assert registry.get_by_api_key(device['api_key'])['name'] == device['name']
+    assert registry.get_by_id(device['id'])['name'] == device['name']
+
+    registry.invalidate(device['id'])
+    assert registry.get_by_api_key(device['api_key'])['name'] == 'renamed'
+
+
+def test_registry_entries_expire(make_device, db):
+    device = make_device()
+    registry = fiber.DeviceRegistry(ttl=0)
+    registry.get_by_id(device['id'])
+    rename(db, device, 'renamed')
+    assert registry.get_by_id(device['id'])['name'] == 'renamed'
+
+
+def test_unknown_keys_are_not_cached(make_device, db):
+    registry = fiber.DeviceRegistry(ttl=3600)
+    assert registry.get_by_api_key('issued-later') is None
+
+    device = make_device()
+    db.execute("UPDATE devices SET api_key = 'issued-later' WHERE id = ?", (device['id'],))
+    db.commit()
+    assert registry.get_by_api_key('issued-later')['id'] == device['id']
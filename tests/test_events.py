@@ -0,0 +1,42 @@
+import json
+
+import fiber
+
+
+def parse(message):
+    event, data = message.rstrip('\n').split('\n')
+    assert event.startswith('event: ') and data.startswith('data: ')
+    return event[len('event: '):], json.loads(data[len('data: '):])
+
+
+def test_batch_publishes_measurements_and_stat_deltas(client, make_device, monkeypatch):
+    monkeypatch.setattr(fiber, 'event_broker', fiber.EventBroker(10))
+    subscriber = fiber.event_broker.subscribe()
+    device = make_device()
+    items = [
+        {'signal_power': -20.0, 'attenuation': 0.4, 'distance': 100.0},
+        {'signal_power': -45.0, 'attenuation': 2.5, 'distance': 120.0},
+    ]
+    response = client.post('/api/measurements/batch', json=items, headers={'X-API-Key': device['api_key']})
+    assert response.status_code == 200
+
+    event, measurements = parse(subscriber.get_nowait())
+    assert event == 'measurements'
+    assert [m['fault_type'] for m in measurements] == ['No Fault', 'Fiber Break']
+    assert {m['device_name'] for m in measurements} == {device['name']}
+
+    event, stats = parse(subscriber.get_nowait())
+    assert event == 'stats'
+    assert stats == {'measurement_count': 2, 'fault_distribution': {'No Fault': 1, 'Fiber Break': 1}}
+    assert subscriber.empty()
+
+
+def test_slow_subscriber_is_disconnected():
+    broker = fiber.EventBroker(2)
+    slow = broker.subscribe()
+    for n in range(3):
+        broker.publish('tick', {'n': n})
+
+    assert slow.get_nowait() is None
+    assert slow.empty()
+    assert not broker.has_subscribers()
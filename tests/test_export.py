@@ -0,0 +1,49 @@
+import csv
+import gzip
+import io
+import json
+
+import fiber
+
+READINGS = [
+    {'signal_power': -20.0, 'attenuation': 0.4, 'distance': 1.0, 'timestamp': '2026-02-01T10:00:00Z'},
+    {'signal_power': -45.0, 'attenuation': 2.5, 'distance': 2.0, 'timestamp': '2026-02-01T11:00:00Z'},
+    {'signal_power': -20.0, 'attenuation': 0.4, 'distance': 3.0, 'timestamp': '2026-02-01T12:00:00Z'},
+]
+
+
+def exported(client, device, **params):
+    query = '&'.join(f'{key}={value}' for key, value in dict(params, device_id=device['id']).items())
+    return client.get(f'/api/data/export?{query}')
+
+
+def test_ndjson_export_streams_rows_in_order(client, make_device, monkeypatch):
+    monkeypatch.setattr(fiber, 'EXPORT_CHUNK_SIZE', 2)
+    device = make_device()
+    client.post('/api/measurements/batch', json=READINGS[::-1], headers={'X-API-Key': device['api_key']})
+
+    response = exported(client, device)
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['distance'] for row in rows] == [1.0, 2.0, 3.0]
+    assert list(rows[0]) == list(fiber.EXPORT_COLUMNS)
+
+
+def test_filters_and_csv(client, make_device):
+    device = make_device()
+    client.post('/api/measurements/batch', json=READINGS, headers={'X-API-Key': device['api_key']})
+
+    response = exported(client, device, format='csv', since='2026-02-01T10:30:00Z', until='2026-02-01T12:00:00Z')
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [(row['distance'], row['fault_type']) for row in rows] == [('2.0', 'Fiber Break')]
+
+    response = exported(client, device, fault_type='No Fault', gzip=1)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    lines = gzip.decompress(response.get_data()).decode().splitlines()
+    assert [json.loads(line)['distance'] for line in lines] == [1.0, 3.0]
+
+
+def test_invalid_options_are_rejected(client, make_device):
+    device = make_device()
+    assert exported(client, device, format='xml').status_code == 400
+    assert exported(client, device, fault_type='Melted').status_code == 400
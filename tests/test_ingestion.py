@@ -0,0 +1,213 @@
+import json
+import sqlite3
+import threading
+
+import pytest
+
+import fiber
+
+HEALTHY = {'signal_power': -20.0, 'attenuation': 0.4, 'distance': 100.0}
+
+
+def headers(device):
+    return {'X-API-Key': device['api_key']}
+
+
+def test_single_measurement_is_classified_and_stored(client, make_device, db):
+    device = make_device()
+    response = client.post('/api/measurements', json=HEALTHY, headers=headers(device))
+
+    assert response.status_code == 200
+    assert response.json['fault_type'] == 'No Fault'
+    row = db.execute('SELECT device_id, fault_type FROM measurements WHERE id = ?', (response.json['id'],)).fetchone()
+    assert tuple(row) == (device['id'], 'No Fault')
+
+
+def test_measurement_requires_known_api_key(client):
+    assert client.post('/api/measurements', json=HEALTHY).status_code == 401
+    assert client.post('/api/measurements', json=HEALTHY, headers={'X-API-Key': 'nope'}).status_code == 401
+
+
+def test_batch_reports_invalid_rows_without_rejecting_the_batch(client, make_device, db):
+    device = make_device()
+    items = [
+        dict(HEALTHY, timestamp='2026-01-01T10:00:00Z'),
+        {'signal_power': -20.0, 'attenuation': 0.4},
+        'not an object',
+        {'signal_power': 'loud', 'attenuation': 0.4, 'distance': 1.0},
+        {'signal_power': -45.0, 'attenuation': 2.5, 'distance': 120.0},
+    ]
+    response = client.post('/api/measurements/batch', json=items, headers=headers(device))
+
+    assert response.status_code == 200
+    body = response.json
+    assert (body['accepted'], body['rejected']) == (2, 3)
+    results = body['results']
+    assert [result['index'] for result in results] == [0, 1, 2, 3, 4]
+    assert results[1]['error'] == 'Missing required field: distance'
+    assert 'error' in results[2] and 'error' in results[3]
+    assert results[4]['id'] == results[0]['id'] + 1
+    assert results[4]['fault_type'] == 'Fiber Break'
+
+    rows = db.execute('SELECT timestamp, fault_type FROM measurements WHERE device_id = ? ORDER BY id',
+                      (device['id'],)).fetchall()
+    assert [tuple(row) for row in rows][0] == ('2026-01-01 10:00:00', 'No Fault')
+    assert len(rows) == 2
+
+
+def test_batch_accepts_ndjson(client, make_device):
+    device = make_device()
+    body = '\n'.join(json.dumps(dict(HEALTHY, signal_power=-20.0 - index)) for index in range(3)) + '\n\n'
+    response = client.post('/api/measurements/batch', data=body, content_type='application/x-ndjson',
+                           headers=headers(device))
+
+    assert response.status_code == 200
+    assert response.json['accepted'] == 3
+
+
+def test_batch_rejections(client, make_device, monkeypatch):
+    device = make_device()
+    assert client.post('/api/measurements/batch', json=[], headers=headers(device)).status_code == 400
+    assert client.post('/api/measurements/batch', json={'readings': []}, headers=headers(device)).status_code == 400
+    response = client.post('/api/measurements/batch', json=[{'distance': 1}], headers=headers(device))
+    assert response.status_code == 400 and response.json['accepted'] == 0
+
+    monkeypatch.setattr(fiber, 'MAX_BATCH_SIZE', 2)
+    assert client.post('/api/measurements/batch', json=[HEALTHY] * 3, headers=headers(device)).status_code == 413
+
+
+@pytest.fixture
+def writer():
+    buffer = fiber.WriteBehindBuffer(capacity=100, batch_size=50, flush_interval=0.1, synchronous='NORMAL')
+    yield buffer
+    buffer.flush(timeout=10)
+
+
+def reading(device, signal_power=-20.0):
+    return (device['id'], None, signal_power, 0.4, 100.0, 'No Fault', 0.9)
+
+
+def hold_writer(buffer, device):
+    """Park the writer inside a transaction; returns the Event that lets it go"""
+    entered, gate = threading.Event(), threading.Event()
+
+    def hold(conn, first_id):
+        entered.set()
+        gate.wait(10)
+
+    buffer.submit([reading(device)], hold)
+    assert entered.wait(10)
+    return gate
+
+
+def test_write_behind_group_commits_concurrent_submissions(writer, make_device, db):
+    device = make_device()
+    futures = [writer.submit([reading(device, -20.0 - index), reading(device, -30.0 - index)]) for index in range(10)]
+    first_ids = [future.result(timeout=10) for future in futures]
+
+    assert writer.commits < 10
+    assert writer.rows_written == 20
+    for index, first_id in enumerate(first_ids):
+        rows = db.execute('SELECT signal_power FROM measurements WHERE id IN (?, ?) ORDER BY id',
+                          (first_id, first_id + 1)).fetchall()
+        assert [row[0] for row in rows] == [-20.0 - index, -30.0 - index]
+
+
+def test_write_behind_retries_a_failed_group_one_submission_at_a_time(writer, make_device, db):
+    device = make_device()
+    # The next three submissions queue up while the writer is busy, so they form one group
+    gate = hold_writer(writer, device)
+    good = writer.submit([reading(device, -21.0)])
+    bad = writer.submit([(device['id'], None, None, 0.4, 100.0, 'No Fault', 0.9)])  # signal_power is NOT NULL
+    also_good = writer.submit([reading(device, -22.0)])
+    gate.set()
+
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result(timeout=10)
+    for future, signal_power in ((good, -21.0), (also_good, -22.0)):
+        row = db.execute('SELECT signal_power FROM measurements WHERE id = ?', (future.result(timeout=10),)).fetchone()
+        assert row[0] == signal_power
+
+
+def test_write_behind_after_insert_shares_the_transaction(writer, make_device, db):
+    device = make_device()
+
+    def fail(conn, first_id):
+        conn.execute('UPDATE measurements SET fault_type = ? WHERE id = ?', ('Fiber Break', first_id))
+        raise RuntimeError('hook failed')
+
+    with pytest.raises(RuntimeError):
+        writer.submit([reading(device)], fail).result(timeout=10)
+    assert db.execute('SELECT COUNT(*) FROM measurements WHERE device_id = ?', (device['id'],)).fetchone()[0] == 0
+
+
+def test_write_behind_settles_hooks_of_a_retried_group(writer, make_device, db):
+    device = make_device()
+    outcomes = []
+
+    def relabel(conn, first_id):
+        conn.execute('UPDATE measurements SET fault_type = ? WHERE id = ?', ('Fiber Break', first_id))
+        return outcomes.append
+
+    gate = hold_writer(writer, device)
+    good = writer.submit([reading(device)], relabel)
+    bad = writer.submit([(device['id'], None, None, 0.4, 100.0, 'No Fault', 0.9)])
+    gate.set()
+
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result(timeout=10)
+    # The hook ran in the failed group and again in its retry; only the retry committed
+    assert outcomes == [False, True]
+    row = db.execute('SELECT fault_type FROM measurements WHERE id = ?', (good.result(timeout=10),)).fetchone()
+    assert row[0] == 'Fiber Break'
+
+
+def test_write_behind_retry_records_incidents_once(writer, make_device, db, monkeypatch):
+    monkeypatch.setattr(fiber, 'incident_tracker', fiber.IncidentTracker(2, 3600, 3600))
+    device = make_device()
+    fault = fiber.FaultRecorder(device, [('Fiber Break', 0.9, -45.0, 2.5, 120.0)])
+    writer.submit([(device['id'], None, -45.0, 2.5, 120.0, 'Fiber Break', 0.9)], fault.record).result(timeout=10)
+    incident_id, = fault.incident_ids
+
+    # One healthy reading in a group that fails, then in its retry, is still only one
+    gate = hold_writer(writer, device)
+    healthy = fiber.FaultRecorder(device, [('No Fault', 0.9, -20.0, 0.4, 100.0)])
+    writer.submit([reading(device)], healthy.record)
+    bad = writer.submit([(device['id'], None, None, 0.4, 100.0, 'No Fault', 0.9)])
+    gate.set()
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result(timeout=10)
+    writer.flush(timeout=10)
+
+    row = db.execute('SELECT status, measurement_count FROM incidents WHERE id = ?', (incident_id,)).fetchone()
+    assert tuple(row) == ('open', 1)
+    fiber.incident_tracker.observe(db, device, [('No Fault', 0.9, None, -20.0, 0.4)])
+    db.commit()
+    assert db.execute('SELECT status FROM incidents WHERE id = ?', (incident_id,)).fetchone()[0] == 'resolved'
+
+
+def test_write_behind_backpressure_and_shutdown(make_device):
+    device = make_device()
+    buffer = fiber.WriteBehindBuffer(capacity=3, batch_size=50, flush_interval=0.1, synchronous='NORMAL')
+    gate = hold_writer(buffer, device)
+    queued = buffer.submit([reading(device)] * 3)
+    with pytest.raises(fiber.WriteBehindFull, match='full'):
+        buffer.submit([reading(device)])
+    assert buffer.stats()['rejected'] == 1
+
+    gate.set()
+    buffer.flush(timeout=10)
+    assert queued.done() and queued.exception() is None
+    with pytest.raises(fiber.WriteBehindFull, match='shutting down'):
+        buffer.submit([reading(device)])
+
+
+def test_write_behind_ingestion_reports_committed_ids(client, make_device, writer, monkeypatch, db):
+    monkeypatch.setattr(fiber, 'WRITE_BEHIND', True)
+    monkeypatch.setattr(fiber, 'write_behind', writer)
+    device = make_device()
+    response = client.post('/api/measurements/batch', json=[HEALTHY, HEALTHY], headers=headers(device))
+
+    ids = [result['id'] for result in response.json['results']]
+    assert ids[1] == ids[0] + 1
+    assert db.execute('SELECT COUNT(*) FROM measurements WHERE device_id = ?', (device['id'],)).fetchone()[0] == 2
@@ -0,0 +1,96 @@
+import sqlite3
+
+import pytest
+
+import fiber
+
+
+@pytest.fixture
+def legacy_db(monkeypatch, tmp_path):
+    """A database with only the original tables, as deployments had before migrations existed"""
+    monkeypatch.setattr(fiber, 'DB_PATH', str(tmp_path / 'legacy.db'))
+    migrations = fiber.SCHEMA_MIGRATIONS
+    monkeypatch.setattr(fiber, 'SCHEMA_MIGRATIONS', [])
+    fiber.init_db()
+    monkeypatch.setattr(fiber, 'SCHEMA_MIGRATIONS', migrations)
+
+    conn = fiber.get_db_connection()
+    conn.execute("INSERT INTO devices (id, name, api_key) VALUES ('d1', 'legacy', 'key')")
+    conn.executemany('''
+    INSERT INTO measurements (device_id, timestamp, signal_power, attenuation, distance, fault_type, confidence)
+    VALUES ('d1', ?, ?, 0.4, 100.0, ?, 0.9)
+    ''', [('2026-01-01 10:00:00', -20.0, 'No Fault'), ('2026-01-01 10:30:00', -45.0, 'Fiber Break')])
+    conn.execute('''
+    INSERT INTO notifications (device_id, measurement_id, timestamp, fault_type, recipients, status)
+    VALUES ('d1', 2, '2026-01-01 10:30:00', 'Fiber Break', 'ops@example.com', 'sent')
+    ''')
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def test_migrates_from_version_zero(legacy_db):
+    assert version(legacy_db) == 0
+    fiber.migrate_db(legacy_db)
+
+    assert version(legacy_db) == len(fiber.SCHEMA_MIGRATIONS)
+    indexes = {row[0] for row in legacy_db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {'idx_measurements_device_timestamp', 'idx_devices_api_key'} <= indexes
+    assert legacy_db.execute('SELECT COUNT(*) FROM measurements').fetchone()[0] == 2
+
+    totals = dict(legacy_db.execute('SELECT name, value FROM stats_totals').fetchall())
+    assert totals == {'devices': 1, 'measurements': 2, 'notifications': 1}
+    faults = dict(legacy_db.execute('SELECT fault_type, count FROM stats_fault_totals').fetchall())
+    assert faults == {'No Fault': 1, 'Fiber Break': 1}
+
+
+def test_migrated_triggers_keep_stats_current(legacy_db):
+    fiber.migrate_db(legacy_db)
+    legacy_db.execute('''
+    INSERT INTO measurements (device_id, timestamp, signal_power, attenuation, distance, fault_type, confidence)
+    VALUES ('d1', '2026-01-01 11:00:00', -21.0, 0.4, 100.0, 'No Fault', 0.9)
+    ''')
+    legacy_db.commit()
+
+    assert legacy_db.execute("SELECT value FROM stats_totals WHERE name = 'measurements'").fetchone()[0] == 3
+    hourly = legacy_db.execute("SELECT measurement_count FROM stats_hourly WHERE hour = '2026-01-01 11:00:00'").fetchone()
+    assert hourly[0] == 1
+
+
+def test_migrations_are_idempotent(legacy_db):
+    fiber.migrate_db(legacy_db)
+    schema = legacy_db.execute('SELECT sql FROM sqlite_master ORDER BY name').fetchall()
+    fiber.migrate_db(legacy_db)
+
+    assert version(legacy_db) == len(fiber.SCHEMA_MIGRATIONS)
+    assert legacy_db.execute('SELECT sql FROM sqlite_master ORDER BY name').fetchall() == schema
+    assert legacy_db.execute("SELECT value FROM stats_totals WHERE name = 'measurements'").fetchone()[0] == 2
+
+
+def test_failed_migration_rolls_back_its_version(legacy_db, monkeypatch):
+    migrations = fiber.SCHEMA_MIGRATIONS
+    monkeypatch.setattr(fiber, 'SCHEMA_MIGRATIONS', migrations + [[
+        'CREATE TABLE half_done (id INTEGER)',
+        'CREATE TABLE broken (',
+    ]])
+
+    with pytest.raises(sqlite3.OperationalError):
+        fiber.migrate_db(legacy_db)
+    assert version(legacy_db) == len(migrations)
+    assert not legacy_db.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone()
+
+
+def test_hot_queries_use_indexes(db):
+    assert fiber.check_query_plans(db) == 0
+
+
+def test_query_plan_check_reports_full_scans(db, monkeypatch):
+    monkeypatch.setattr(fiber, 'HOT_QUERIES', {
+        'by_distance': ('SELECT id FROM measurements WHERE distance = ?', (1.0,)),
+        'sorted': ('SELECT id FROM measurements WHERE device_id = ? ORDER BY confidence', ('d1',)),
+    })
+    assert fiber.check_query_plans(db) == 2
@@ -0,0 +1,205 @@
+import email
+import socket
+import threading
+import time
+
+import pytest
+from aiosmtpd.controller import Controller
+
+import fiber
+
+
+class Mailbox:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, email.message_from_bytes(envelope.content)))
+        return '250 Message accepted for delivery'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_settings(monkeypatch):
+    monkeypatch.setattr(fiber, 'EMAIL_ENABLED', True)
+    monkeypatch.setattr(fiber, 'EMAIL_SERVER', '127.0.0.1')
+    monkeypatch.setattr(fiber, 'EMAIL_USE_TLS', False)
+    monkeypatch.setattr(fiber, 'EMAIL_USERNAME', '')
+    monkeypatch.setattr(fiber, 'EMAIL_PASSWORD', '')
+    monkeypatch.setattr(fiber, 'SMTP_TIMEOUT', 5)
+
+
+@pytest.fixture
+def mailbox(smtp_settings, monkeypatch):
+    port = free_port()
+    handler = Mailbox()
+    controller = Controller(handler, hostname='127.0.0.1', port=port)
+    controller.start()
+    monkeypatch.setattr(fiber, 'EMAIL_PORT', port)
+    yield handler
+    controller.stop()
+
+
+def make_alert(device, measurement_id, recipients, fault_type='Fiber Break'):
+    return {
+        'device_id': device['id'],
+        'device_name': device['name'],
+        'fault_type': fault_type,
+        'confidence': 0.9,
+        'signal_power': -45.0,
+        'attenuation': 2.5,
+        'distance': 100.0,
+        'measurement_id': measurement_id,
+        'recipients': recipients,
+        'detected_at': '2026-01-01 00:00:00'
+    }
+
+
+def notification_statuses(db, device):
+    rows = db.execute('SELECT measurement_id, status FROM notifications WHERE device_id = ? ORDER BY measurement_id',
+                      (device['id'],)).fetchall()
+    return [tuple(row) for row in rows]
+
+
+def test_dispatcher_coalesces_alerts_per_recipient_list(mailbox, make_device, db):
+    device = make_device()
+    dispatcher = fiber.NotificationDispatcher(queue_size=10, coalesce_window=0.5, max_digest=50)
+    for measurement_id in (1, 2, 3):
+        assert dispatcher.enqueue(make_alert(device, measurement_id, ['ops@example.com']))
+    assert dispatcher.enqueue(make_alert(device, 4, ['field@example.com'], 'High Loss'))
+    dispatcher.flush(timeout=10)
+
+    assert len(mailbox.messages) == 2
+    subjects = {tuple(recipients): message['Subject'] for recipients, message in mailbox.messages}
+    assert subjects[('ops@example.com',)].endswith('3 Faults Detected on 1 Devices')
+    assert subjects[('field@example.com',)].endswith(f"High Loss Detected on {device['name']}")
+    assert notification_statuses(db, device) == [(1, 'sent'), (2, 'sent'), (3, 'sent'), (4, 'sent')]
+
+
+def test_digest_body_lists_every_alert(mailbox, make_device):
+    devices = [make_device() for _ in range(3)]
+    alerts = [make_alert(device, index, ['ops@example.com']) for index, device in enumerate(devices)]
+    alerts[1]['signal_power'] = -41.25
+    alerts[2]['incident'] = {'route_id': 'r1', 'route_name': 'trunk', 'location_m': 1000.0, 'spread_m': 40.0,
+                             'segment_start_device': devices[0]['id'], 'segment_end_device': devices[2]['id'],
+                             'devices': [devices[0]['id'], devices[2]['id']]}
+    dispatcher = fiber.NotificationDispatcher(queue_size=10, coalesce_window=0.5, max_digest=50)
+    for alert in alerts:
+        assert dispatcher.enqueue(alert)
+    dispatcher.flush(timeout=10)
+
+    assert len(mailbox.messages) == 1
+    _, message = mailbox.messages[0]
+    body = message.get_payload()[0].get_payload(decode=True).decode()
+    for device in devices:
+        assert f"{device['name']} ({device['id']})" in body
+    assert body.count('<h3>Alert Details:</h3>') == 3
+    # Every alert keeps its own readings, including the one that carries a route location
+    assert body.count('<h3>Measurements:</h3>') == 3
+    assert body.count('<h3>Location:</h3>') == 1
+    assert '-41.25 dB' in body and body.count('-45.0 dB') == 2
+    assert 'trunk (r1)' in body and '1000 m' in body
+
+
+def test_dispatcher_caps_digest_size(mailbox, make_device):
+    device = make_device()
+    dispatcher = fiber.NotificationDispatcher(queue_size=10, coalesce_window=0.5, max_digest=2)
+    for measurement_id in range(5):
+        dispatcher.enqueue(make_alert(device, measurement_id, ['ops@example.com']))
+    dispatcher.flush(timeout=10)
+
+    assert len(mailbox.messages) == 3
+
+
+def test_dispatcher_records_failures_when_smtp_is_down(smtp_settings, monkeypatch, make_device, db):
+    monkeypatch.setattr(fiber, 'EMAIL_PORT', free_port())
+    device = make_device()
+    dispatcher = fiber.NotificationDispatcher(queue_size=10, coalesce_window=0.1, max_digest=50)
+    dispatcher.enqueue(make_alert(device, 7, ['ops@example.com']))
+    dispatcher.flush(timeout=10)
+
+    assert notification_statuses(db, device) == [(7, 'failed')]
+
+
+def test_enqueue_drops_when_full(smtp_settings, make_device):
+    device = make_device()
+    dispatcher = fiber.NotificationDispatcher(queue_size=1, coalesce_window=0.1, max_digest=50)
+    dispatcher._ensure_worker = lambda: None  # nothing drains the queue
+    assert dispatcher.enqueue(make_alert(device, 1, ['ops@example.com']))
+    assert not dispatcher.enqueue(make_alert(device, 2, ['ops@example.com']))
+
+
+def test_enqueue_refuses_when_email_disabled(make_device):
+    dispatcher = fiber.NotificationDispatcher(queue_size=10, coalesce_window=0.1, max_digest=50)
+    assert not dispatcher.enqueue(make_alert(make_device(), 1, ['ops@example.com']))
+
+
+@pytest.fixture(params=['sqlite', 'memory'])
+def cooldown_store(request):
+    return fiber.SqliteCooldownStore() if request.param == 'sqlite' else fiber.MemoryCooldownStore()
+
+
+def test_cooldown_is_claimed_once_under_contention(cooldown_store, make_device):
+    device_id = make_device()['id']
+    now = time.time()
+    barrier = threading.Barrier(8)
+    claims = []
+
+    def claim():
+        barrier.wait()
+        claims.append(cooldown_store.try_acquire(device_id, 'Fiber Break', now, 60))
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert claims.count(True) == 1
+    assert not cooldown_store.try_acquire(device_id, 'Fiber Break', now + 30, 60)
+    assert cooldown_store.try_acquire(device_id, 'High Loss', now + 30, 60)
+    assert cooldown_store.try_acquire(device_id, 'Fiber Break', now + 61, 60)
+
+
+def test_cooldown_release_keeps_newer_claims(cooldown_store, make_device):
+    device_id = make_device()['id']
+    assert cooldown_store.try_acquire(device_id, 'Fiber Break', 100.0, 60)
+    cooldown_store.release(device_id, 'Fiber Break', 100.0)
+    assert cooldown_store.try_acquire(device_id, 'Fiber Break', 101.0, 60)
+
+    cooldown_store.release(device_id, 'Fiber Break', 100.0)
+    assert not cooldown_store.try_acquire(device_id, 'Fiber Break', 102.0, 60)
+
+
+def test_cooldown_reset_forgets_only_that_device(cooldown_store, make_device):
+    device_id, other_id = make_device()['id'], make_device()['id']
+    for claimant in (device_id, other_id):
+        for fault_type in ('Fiber Break', 'High Loss'):
+            assert cooldown_store.try_acquire(claimant, fault_type, 100.0, 60)
+
+    cooldown_store.reset(device_id)
+    assert cooldown_store.try_acquire(device_id, 'Fiber Break', 101.0, 60)
+    assert cooldown_store.try_acquire(device_id, 'High Loss', 101.0, 60)
+    assert not cooldown_store.try_acquire(other_id, 'Fiber Break', 101.0, 60)
+
+
+def test_dropped_notification_gives_cooldown_back(monkeypatch, make_device):
+    device = make_device()
+    monkeypatch.setattr(fiber, 'EMAIL_ENABLED', True)
+    monkeypatch.setattr(fiber, 'EMAIL_TO', ['ops@example.com'])
+    monkeypatch.setattr(fiber, 'cooldown_store', fiber.MemoryCooldownStore())
+    accepted = iter([False, True, True])
+    monkeypatch.setattr(fiber.notification_dispatcher, 'enqueue', lambda alert: next(accepted))
+    fiber.alert_debouncer.observe(device, 'Fiber Break', 0.9)
+
+    def notify():
+        return fiber.notify_fault(device['id'], device['name'], 'Fiber Break', 0.9, -45.0, 2.5, 100.0, 1)
+
+    assert not notify()
+    assert notify()
+    assert not notify()  # now within the cooldown
@@ -0,0 +1,54 @@
+import fiber
+
+
+def post_readings(client, device, count):
+    items = [{'signal_power': -20.0, 'attenuation': 0.4, 'distance': float(n),
+              'timestamp': f'2026-01-01T10:00:{n // 2:02d}Z'} for n in range(count)]
+    response = client.post('/api/measurements/batch', json=items, headers={'X-API-Key': device['api_key']})
+    assert response.json['accepted'] == count
+
+
+def walk(client, url, headers=None):
+    pages, cursor = [], ''
+    while cursor is not None:
+        body = client.get(f'{url}?limit=4&cursor={cursor}', headers=headers).json
+        pages.append(body['items'])
+        cursor = body['next_cursor']
+    return pages
+
+
+def test_cursor_pages_cover_every_row_once(client, make_device):
+    device = make_device()
+    post_readings(client, device, 10)
+
+    pages = walk(client, '/api/measurements', {'X-API-Key': device['api_key']})
+    assert [len(page) for page in pages] == [4, 4, 2]
+    rows = [(row['timestamp'], row['id']) for page in pages for row in page]
+    # Rows share timestamps in pairs; the id tie-break keeps the order total
+    assert rows == sorted(rows, reverse=True)
+    assert len(set(rows)) == 10
+
+
+def test_recent_data_cursor_includes_device_name(client, make_device):
+    device = make_device()
+    post_readings(client, device, 5)
+
+    rows = [row for page in walk(client, '/api/data/recent') for row in page]
+    # The database is shared with other tests, so only this device's rows are counted
+    assert len([row for row in rows if row['device_name'] == device['name']]) == 5
+    assert all(row['device_name'] for row in rows)
+
+
+def test_invalid_cursor_is_rejected(client, make_device):
+    device = make_device()
+    response = client.get('/api/measurements?cursor=not-a-cursor', headers={'X-API-Key': device['api_key']})
+    assert response.status_code == 400
+
+
+def test_page_size_is_capped(client, make_device, monkeypatch):
+    monkeypatch.setattr(fiber, 'MAX_PAGE_SIZE', 3)
+    device = make_device()
+    post_readings(client, device, 5)
+
+    response = client.get('/api/measurements?limit=100', headers={'X-API-Key': device['api_key']})
+    assert len(response.json) == 3
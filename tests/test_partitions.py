@@ -0,0 +1,141 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+import fiber
+
+# Sealing moves every old month, so these tests get a database of their own
+pytestmark = pytest.mark.usefixtures('scratch_db')
+
+
+@pytest.fixture
+def partition_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(fiber, 'PARTITION_DIR', str(tmp_path / 'partitions'))
+    monkeypatch.setitem(fiber._partition_cache, 'mtime', None)
+    # The tests seal explicitly; keep the background worker from sealing underneath them
+    monkeypatch.setattr(fiber.retention_worker, 'start', lambda: None)
+    return tmp_path / 'partitions'
+
+
+@pytest.fixture
+def history(make_device, store_rows):
+    """A device with ten readings in each of two old months and five recent ones"""
+    device = make_device()
+    recent = datetime.now(timezone.utc) - timedelta(hours=1)
+    timestamps = [f'2020-{month:02d}-15 10:{minute:02d}:00' for month in (1, 2) for minute in range(0, 50, 5)]
+    timestamps += [(recent + timedelta(minutes=minute)).strftime('%Y-%m-%d %H:%M:%S') for minute in range(5)]
+    store_rows([(device['id'], timestamp, -20.0 - index, 0.4, 100.0, 'No Fault', 0.9)
+                for index, timestamp in enumerate(timestamps)])
+    return device
+
+
+def export(client, device):
+    response = client.get(f"/api/data/export?device_id={device['id']}")
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def listing(client, device):
+    items, cursor = [], ''
+    while cursor is not None:
+        page = client.get(f'/api/measurements?limit=7&cursor={cursor}', headers={'X-API-Key': device['api_key']}).json
+        items += page['items']
+        cursor = page['next_cursor']
+    return [item['id'] for item in items]
+
+
+def series(client, device, **args):
+    query = '&'.join(f'{key}={value}' for key, value in args.items())
+    response = client.get(f"/api/data/series?device_id={device['id']}&{query}")
+    assert response.status_code == 200
+    return response.json
+
+
+def test_sealing_keeps_reads_complete(client, db, history, partition_dir, store_rows):
+    before_export = export(client, history)
+    before_listing = listing(client, history)
+    lttb = {'downsample': 'lttb', 'since': '2019-12-01T00:00:00Z', 'max_points': 10}
+    before_lttb = series(client, history, **lttb)['raw_count']
+
+    results = fiber.seal_partitions(db)
+
+    assert {'2020-01', '2020-02'} <= {result['month'] for result in results}
+    assert sorted(os.listdir(partition_dir))[:2] == ['measurements_2020_01.db', 'measurements_2020_02.db']
+    remaining = db.execute('SELECT COUNT(*) FROM measurements WHERE device_id = ?', (history['id'],)).fetchone()[0]
+    assert remaining == 5
+    assert export(client, history) == before_export
+    assert listing(client, history) == before_listing
+    assert before_lttb == 25
+    assert series(client, history, **lttb)['raw_count'] == 25
+
+    # A late row for a sealed month is read alongside the partition until it is sealed in too
+    store_rows([(history['id'], '2020-01-15 10:07:00', -99.0, 0.4, 100.0, 'No Fault', 0.9)])
+    rows = export(client, history)
+    assert len(rows) == 26
+    assert [row['timestamp'] for row in rows] == sorted(row['timestamp'] for row in rows)
+    minutes = series(client, history, bucket='minute', since='2020-01-15T00:00:00Z', until='2020-01-16T00:00:00Z')
+    assert sum(bucket['count'] for bucket in minutes['buckets']) == 11
+    days = series(client, history, bucket='day', since='2020-01-01T00:00:00Z', until='2020-03-01T00:00:00Z')
+    assert [bucket['count'] for bucket in days['buckets']] == [11, 10]
+
+    fiber.seal_partitions(db)
+    assert export(client, history) == rows
+
+
+def test_unfinished_partition_files_are_not_listed(partition_dir):
+    partition_dir.mkdir()
+    (partition_dir / 'measurements_2020_03.db.tmp').write_bytes(b'')
+    (partition_dir / 'measurements_2020_04.db').write_bytes(b'')
+
+    assert [partition['month'] for partition in fiber.list_partitions()] == ['2020-04']
+
+
+def test_rows_still_in_the_main_table_while_sealing_are_read_once(client, db, history, partition_dir):
+    before = export(client, history)
+    fiber.seal_partitions(db)
+    # Mid-seal, a month's rows are in its partition and not yet retired from the main table
+    sealed = [row for row in before if row['timestamp'] < '2020-02-01']
+    db.executemany('''
+    INSERT INTO measurements (id, device_id, timestamp, signal_power, attenuation, distance, fault_type, confidence)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [(row['id'], row['device_id'], row['timestamp'], row['signal_power'], row['attenuation'], row['distance'],
+           row['fault_type'], row['confidence']) for row in sealed])
+    db.commit()
+
+    assert export(client, history) == before
+
+
+def test_columnar_archive_round_trip(db, history, partition_dir, tmp_path):
+    fiber.seal_partitions(db)
+    result = fiber.write_columnar_archive(db, '2020-01', archive_dir=str(tmp_path / 'archive'))
+    archive = fiber.ColumnarArchive(result['path'])
+
+    sealed = [row for chunk in fiber.iter_measurements(db, '''
+    SELECT id, timestamp, signal_power FROM {measurements}
+    WHERE device_id = ? ORDER BY timestamp, id
+    ''', (history['id'],), '2020-01-01 00:00:00', '2020-02-01 00:00:00') for row in chunk]
+    assert len(sealed) == 10
+
+    scan = archive.scan(['id', 'timestamp', 'signal_power'], device_id=history['id'])
+    assert scan['id'].tolist() == [row[0] for row in sealed]
+    assert scan['timestamp'].tolist() == [fiber.to_epoch(row[1]) for row in sealed]
+    assert np.array_equal(scan['signal_power'], [row[2] for row in sealed])
+    assert archive.devices[history['id']]['count'] == 10
+
+    since = fiber.to_epoch('2020-01-15 10:20:00')
+    assert len(archive.scan(['id'], device_id=history['id'], since=since)['id']) == 6
+    assert len(archive.scan(['id'], device_id='missing')['id']) == 0
+
+
+def test_failed_columnar_archive_leaves_the_connection_usable(db, history, partition_dir, tmp_path, monkeypatch):
+    fiber.seal_partitions(db)
+    monkeypatch.setitem(fiber.ARCHIVE_COLUMNS, 'broken', 'not a dtype')
+
+    with pytest.raises(TypeError):
+        fiber.write_columnar_archive(db, '2020-01', archive_dir=str(tmp_path / 'archive'))
+    assert not db.in_transaction
+    assert 'sealed' not in [row[1] for row in db.execute('PRAGMA database_list')]
+    assert os.listdir(tmp_path / 'archive') == []
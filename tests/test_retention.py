@@ -0,0 +1,64 @@
+import pytest
+
+import fiber
+
+pytestmark = pytest.mark.usefixtures('scratch_db')
+
+CUTOFF = '2021-01-01 00:00:00'
+READINGS = [  # (hour, minute, signal_power, attenuation) in January 2020
+    (10, 0, -20.0, 0.4), (10, 20, -45.0, 2.5), (10, 40, -22.0, 0.5),
+    (11, 0, -21.0, 0.4), (11, 30, -46.0, 2.6),
+]
+
+
+@pytest.fixture
+def old_device(client, make_device):
+    device = make_device()
+    items = [{'signal_power': signal_power, 'attenuation': attenuation, 'distance': 120.0,
+              'timestamp': f'2020-01-05T{hour:02d}:{minute:02d}:00Z'}
+             for hour, minute, signal_power, attenuation in READINGS]
+    assert client.post('/api/measurements/batch', json=items,
+                       headers={'X-API-Key': device['api_key']}).json['accepted'] == len(READINGS)
+    return device
+
+
+def series(client, device, bucket):
+    body = client.get(f"/api/data/series?device_id={device['id']}&bucket={bucket}"
+                      '&since=2020-01-01T00:00:00Z&until=2020-02-01T00:00:00Z').json
+    return body['buckets']
+
+
+def test_rollups_preserve_series_and_totals(client, old_device, db):
+    before = {bucket: series(client, old_device, bucket) for bucket in ('hour', 'day')}
+    totals = client.get('/api/data/stats').json['measurement_count']
+    assert fiber.retention_report(db, CUTOFF)['eligible_rows'] == len(READINGS)
+
+    result = fiber.run_retention(db, CUTOFF, batch_size=2, pause=0)
+
+    assert result['rolled_up_rows'] == len(READINGS)
+    assert db.execute('SELECT COUNT(*) FROM measurements').fetchone()[0] == 0
+    hourly = db.execute('''
+    SELECT bucket, fault_type, measurement_count FROM measurement_rollups_hourly
+    WHERE device_id = ? ORDER BY bucket, fault_type
+    ''', (old_device['id'],)).fetchall()
+    assert [tuple(row) for row in hourly] == [
+        ('2020-01-05 10:00:00', 'Fiber Break', 1), ('2020-01-05 10:00:00', 'No Fault', 2),
+        ('2020-01-05 11:00:00', 'Fiber Break', 1), ('2020-01-05 11:00:00', 'No Fault', 1),
+    ]
+    for bucket in ('hour', 'day'):
+        after = series(client, old_device, bucket)
+        assert [b['count'] for b in after] == [b['count'] for b in before[bucket]]
+        for old, new in zip(before[bucket], after):
+            for key in old:
+                assert new[key] == pytest.approx(old[key])
+    assert client.get('/api/data/stats').json['measurement_count'] == totals
+
+
+def test_rebuilt_stats_include_rollups(client, old_device, db):
+    fiber.run_retention(db, CUTOFF, pause=0)
+    totals = client.get('/api/data/stats').json
+    fiber.rebuild_stats(db)
+    db.commit()
+    rebuilt = client.get('/api/data/stats').json
+    assert rebuilt['measurement_count'] == totals['measurement_count']
+    assert rebuilt['fault_distribution'] == totals['fault_distribution']
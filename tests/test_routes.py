@@ -0,0 +1,83 @@
+import pytest
+
+import fiber
+
+FIBER_BREAK = {'signal_power': -45.0, 'attenuation': 2.5, 'distance': 1000.0}
+ADMIN = {'X-Admin-Token': 'secret'}
+
+
+@pytest.fixture
+def route(client, make_device, monkeypatch):
+    """A 3 km route with one device at each end, both looking inwards"""
+    monkeypatch.setattr(fiber, 'ADMIN_TOKEN', 'secret')
+    west, east = make_device(), make_device()
+    route = client.post('/api/routes', json={'name': 'trunk', 'length_m': 3000}, headers=ADMIN).json
+    placements = [{'device_id': west['id'], 'position_m': 0}, {'device_id': east['id'], 'position_m': 3000,
+                                                               'direction': -1}]
+    assert client.post(f"/api/routes/{route['id']}/devices", json=placements, headers=ADMIN).json['placed'] == 2
+    return route, west, east
+
+
+def test_correlator_locates_a_fault_seen_by_two_devices(route, db):
+    (route, west, east), now = route, 1000.0
+    correlator = fiber.RouteCorrelator(window=300, radius=250, min_devices=2, ttl=0)
+
+    assert correlator.observe(db, west['id'], 'High Loss', 1400.0, now) is None
+    incident, created = correlator.observe(db, east['id'], 'Fiber Break', 1560.0, now + 1)
+    assert created
+    assert incident['route_id'] == route['id']
+    assert incident['fault_type'] == 'Fiber Break'  # the most severe report wins
+    assert (incident['location_m'], incident['spread_m']) == (1420.0, 40.0)
+    assert (incident['segment_start_device'], incident['segment_end_device']) == (west['id'], east['id'])
+
+    # A later report of the same fault refines the incident rather than opening another
+    again, created = correlator.observe(db, west['id'], 'High Loss', 1410.0, now + 2)
+    assert again is incident and not created
+    assert correlator.observe(db, west['id'], 'High Loss', 100.0, now + 3) is None
+    # Reports older than the window no longer count
+    assert correlator.observe(db, east['id'], 'Fiber Break', 2900.0, now + 400) is None
+
+
+def test_route_incident_replaces_the_device_alerts(client, route, monkeypatch):
+    route, west, east = route
+    monkeypatch.setattr(fiber, 'EMAIL_ENABLED', True)
+    monkeypatch.setattr(fiber, 'EMAIL_TO', ['ops@example.com'])
+    monkeypatch.setattr(fiber, 'cooldown_store', fiber.MemoryCooldownStore())
+    queued = []
+    monkeypatch.setattr(fiber.notification_dispatcher, 'enqueue', lambda alert: queued.append(alert) or True)
+
+    first = client.post('/api/measurements', json=FIBER_BREAK, headers={'X-API-Key': west['api_key']}).json
+    # Measured from the far end, the same break is 2 km away
+    second = client.post('/api/measurements', json=dict(FIBER_BREAK, distance=2000.0),
+                         headers={'X-API-Key': east['api_key']}).json
+
+    assert first['route_incident_id'] is None
+    assert second['route_incident_id'] is not None
+    # The west device alerted on its own; the east report raised the route alert in place of its own
+    assert [alert['device_id'] for alert in queued] == [west['id'], east['id']]
+    assert queued[0].get('incident') is None
+    assert queued[1]['incident']['location_m'] == 1000.0
+
+    incidents = client.get(f"/api/routes/{route['id']}").json['incidents']
+    assert [(incident['id'], incident['devices']) for incident in incidents] == [
+        (second['route_incident_id'], sorted([west['id'], east['id']]))]
+
+
+def test_rolled_back_route_incident_is_created_again(route, db):
+    route, west, east = route
+    west_break = fiber.FaultRecorder(west, [('Fiber Break', 0.9, -45.0, 2.5, 1000.0)])
+    west_break.record(db, 1)(True)
+    db.commit()
+
+    east_break = fiber.FaultRecorder(east, [('Fiber Break', 0.9, -45.0, 2.5, 2000.0)])
+    settle = east_break.record(db, 2)
+    assert east_break.route_created
+    db.rollback()
+    settle(False)
+
+    # The retry inserts the incident again and still counts as the one that raises the alert
+    east_break.record(db, 2)(True)
+    db.commit()
+    assert east_break.route_created
+    rows = db.execute('SELECT id FROM route_incidents WHERE route_id = ?', (route['id'],)).fetchall()
+    assert [row[0] for row in rows] == [east_break.route_incident['id']]
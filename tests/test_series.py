@@ -0,0 +1,48 @@
+import numpy as np
+
+import fiber
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    y[437] = 25.0
+    keep = fiber.lttb_indices(x, y, 50)
+
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert np.all(np.diff(keep) > 0)
+    assert 437 in keep
+    assert np.array_equal(fiber.lttb_indices(x[:10], y[:10], 50), np.arange(10))
+
+
+def post_hour(client, device, hour, readings):
+    items = [{'signal_power': signal_power, 'attenuation': 0.4, 'distance': 1.0,
+              'timestamp': f'2026-03-01T{hour:02d}:{minute:02d}:00Z'}
+             for minute, signal_power in enumerate(readings)]
+    client.post('/api/measurements/batch', json=items, headers={'X-API-Key': device['api_key']})
+
+
+def test_bucketed_series(client, make_device):
+    device = make_device()
+    post_hour(client, device, 10, [-20.0, -22.0, -24.0])
+    post_hour(client, device, 11, [-18.0])
+
+    body = client.get(f"/api/data/series?device_id={device['id']}&bucket=hour"
+                      '&since=2026-03-01T00:00:00Z&until=2026-03-02T00:00:00Z').json
+    buckets = [(b['count'], b['min_signal_power'], b['max_signal_power'], b['avg_signal_power'])
+               for b in body['buckets']]
+    assert buckets == [(3, -24.0, -20.0, -22.0), (1, -18.0, -18.0, -18.0)]
+
+
+def test_lttb_series_and_bucket_cap(client, make_device):
+    device = make_device()
+    post_hour(client, device, 10, [-20.0 - n % 7 for n in range(40)])
+    query = f"/api/data/series?device_id={device['id']}&since=2026-03-01T00:00:00Z&until=2026-03-02T00:00:00Z"
+
+    body = client.get(query + '&downsample=lttb&metric=signal_power&max_points=10').json
+    assert body['raw_count'] == 40
+    assert len(body['points']) == 10
+    assert body['points'][0]['timestamp'] == '2026-03-01 10:00:00'
+
+    assert client.get(query + '&bucket=minute&max_points=100').status_code == 400
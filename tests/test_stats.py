@@ -0,0 +1,52 @@
+import fiber
+
+READINGS = [
+    {'signal_power': -20.0, 'attenuation': 0.4, 'distance': 100.0},
+    {'signal_power': -18.0, 'attenuation': 0.6, 'distance': 100.0},
+    {'signal_power': -45.0, 'attenuation': 2.5, 'distance': 120.0},
+]
+
+
+def base_counts(db):
+    return {
+        'device_count': db.execute('SELECT COUNT(*) FROM devices').fetchone()[0],
+        'measurement_count': db.execute('SELECT COUNT(*) FROM measurements').fetchone()[0],
+        'notification_count': db.execute('SELECT COUNT(*) FROM notifications').fetchone()[0],
+        'fault_distribution': dict(db.execute('SELECT fault_type, COUNT(*) FROM measurements GROUP BY 1').fetchall()),
+    }
+
+
+def test_stats_track_every_write(client, make_device, db):
+    device = make_device()
+    client.post('/api/measurements/batch', json=READINGS, headers={'X-API-Key': device['api_key']})
+
+    stats = client.get('/api/data/stats').json
+    assert {key: stats[key] for key in base_counts(db)} == base_counts(db)
+
+    db.execute('DELETE FROM devices WHERE id = ?', (make_device()['id'],))
+    db.commit()
+    assert client.get('/api/data/stats').json['device_count'] == base_counts(db)['device_count']
+
+
+def test_hourly_rollups_average_each_hour(client, make_device):
+    device = make_device()
+    client.post('/api/measurements/batch', json=READINGS, headers={'X-API-Key': device['api_key']})
+
+    rollups = client.get(f"/api/data/stats/hourly?device_id={device['id']}").json
+    by_fault = {rollup['fault_type']: rollup for rollup in rollups}
+    assert by_fault['No Fault']['measurement_count'] == 2
+    assert by_fault['No Fault']['avg_signal_power'] == -19.0
+    assert by_fault['No Fault']['avg_attenuation'] == 0.5
+    assert by_fault['Fiber Break']['measurement_count'] == 1
+
+
+def test_rebuild_matches_incremental_stats(client, make_device, db):
+    device = make_device()
+    client.post('/api/measurements/batch', json=READINGS, headers={'X-API-Key': device['api_key']})
+    snapshot = [db.execute(f'SELECT * FROM {table} ORDER BY 1, 2').fetchall()
+                for table in ('stats_totals', 'stats_fault_totals')]
+
+    fiber.rebuild_stats(db)
+    db.commit()
+    assert [db.execute(f'SELECT * FROM {table} ORDER BY 1, 2').fetchall()
+            for table in ('stats_totals', 'stats_fault_totals')] == snapshot